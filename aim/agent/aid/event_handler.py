@@ -100,7 +100,7 @@ class EventHandler(EventHandlerBase):
     def _connect(self):
         self.us_path = self.conf_manager.get_option('unix_socket_path',
                                                     group='aim')
-        LOG.info("Connect to socket %s" % self.us_path)
+        LOG.info("Connect to socket %s", self.us_path)
         try:
             os.unlink(self.us_path)
         except OSError:
@@ -127,7 +127,7 @@ class EventHandler(EventHandlerBase):
             except Exception as e:
                 LOG.debug(traceback.format_exc())
                 LOG.error("An error as occurred in the event listener "
-                          "thread: %s" % e)
+                          "thread: %s", e)
                 self.recovery_retries = utils.exponential_backoff(
                     SOCKET_RECONNECT_MAX_WAIT,
                     tentative=self.recovery_retries)
@@ -140,7 +140,7 @@ class EventHandler(EventHandlerBase):
     def _recv_loop(self):
         event = self.sock.recv(PAYLOAD_MAX_LEN)
         event = event.decode('utf-8')
-        LOG.debug("Received event %s" % event)
+        LOG.debug("Received event %s", event)
         if event.lower() in EVENTS:
             self._put_event(event)
 
@@ -164,7 +164,7 @@ class EventHandler(EventHandlerBase):
         try:
             EventHandler.q.put_nowait(event)
         except queue.Full:
-            LOG.warning("Event queue is full, discard %s event" % event)
+            LOG.warning("Event queue is full, discard %s event", event)
         except AttributeError:
             LOG.warning("Event queue not initialized, cannot set event")
 
@@ -181,7 +181,7 @@ class EventSender(SenderBase):
                                                         group='aim')
             self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
             self.sock.connect(self.us_path)
-            LOG.info("Connected to %s" % self.us_path)
+            LOG.info("Connected to %s", self.us_path)
             self.recovery_retries = None
             return self
         except Exception:
@@ -196,12 +196,12 @@ class EventSender(SenderBase):
         self._send(EVENT_RECONCILE)
 
     def _send(self, event):
-        LOG.debug("Sending %s event" % event)
+        LOG.debug("Sending %s event", event)
         try:
             self.sock.send(event.encode('utf-8'))
         except Exception as e:
             LOG.debug(traceback.format_exc())
             LOG.error("An error as occurred in the event sender "
-                      "thread: %s" % str(e))
+                      "thread: %s", str(e))
             self.sock.close()
             self.initialize(self.conf_manager)
@@ -57,7 +57,7 @@ def main(klass):
     try:
         agent = klass(aim_cfg.CONF)
     except (RuntimeError, ValueError) as e:
-        LOG.error("%s Agent terminated!" % e)
+        LOG.error("%s Agent terminated!", e)
         sys.exit(1)
 
     signal.signal(signal.SIGTERM, agent._handle_sigterm)
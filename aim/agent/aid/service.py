@@ -49,6 +49,11 @@ DAEMON_LOOP_MAX_RETRIES = 5
 HB_LOOP_MAX_WAIT = 60
 HB_LOOP_MAX_RETRY = 10
 DEFAULT_VNODES_HASHRING = 40
+ASSIGNMENT_MODE_LOAD = 'load'
+# Approximate size in bytes of a serialized hash tree node
+TREE_NODE_SIZE = 512
+# How often the shared snapshot of the tenant costs is refreshed
+TENANT_COST_REFRESH_INTERVAL = 300
 
 logging.register_options(aim_cfg.CONF)
 
@@ -121,6 +126,11 @@ class AID(object):
         self._spawn_heartbeat_loop()
         self.events = event_handler.EventHandler().initialize(
             self.conf_manager)
+        # Consistent hash ring is kept across serving cycles, only agent
+        # membership and weight deltas are applied to it
+        self.ring = None
+        self._last_assignment = None
+        self._costs_refreshed = 0
         self.max_down_time = 4 * self.report_interval
         self.daemon_loop_time = time.time()
 
@@ -173,7 +183,7 @@ class AID(object):
                 pair[DESIRED].serve(aim_ctx, tenants)
                 pair[CURRENT].serve(aim_ctx, tenants)
             LOG.info("AID %s is currently serving: "
-                     "%s" % (self.agent.id, tenants))
+                     "%s", self.agent.id, tenants)
 
         LOG.info("Start reconciliation cycle.")
         # REVISIT(ivar) Might be wise to wait here upon tenant serving to allow
@@ -210,8 +220,8 @@ class AID(object):
             # All the universes agree on this tenant cleanup
             for pair in self.multiverse:
                 for universe in list(pair.values()):
-                    LOG.info("%s removing tenant from AID %s" %
-                             (universe.name, tenant))
+                    LOG.info("%s removing tenant from AID %s",
+                             universe.name, tenant)
                     universe.cleanup_state(aim_ctx, tenant)
         self.daemon_loop_time = time.time()
 
@@ -236,7 +246,7 @@ class AID(object):
                                   notify_exceeding_timeout=False)
 
     def _send_heartbeat(self, aim_ctx):
-        LOG.info("Sending Heartbeat for agent %s" % self.agent_id)
+        LOG.info("Sending Heartbeat for agent %s", self.agent_id)
         self.agent = self.manager.update(aim_ctx, self.agent)
 
     def get_vnodes_value(self, aim_ctx):
@@ -275,7 +285,7 @@ class AID(object):
                 max_version = max(agents, key=lambda x: x.version).version
                 if self._major_vercompare(self.agent.version, max_version) < 0:
                     LOG.error("Agent version is outdated: Current %s Required "
-                              "%s" % (self.agent.version, max_version))
+                              "%s", self.agent.version, max_version)
                     return []
                 # Purge outdated agents
                 agents = [x for x in agents if
@@ -284,8 +294,13 @@ class AID(object):
                 agents = [self.agent]
             result = self._tenant_assignation_algorithm(aim_ctx, agents)
             # Store result in DB
+            if set(result) != set(self.agent.hash_trees or []):
+                if not self.tree_manager.update_agent_trees(
+                        aim_ctx, self.agent.id, result):
+                    self.agent.hash_trees = result
+                    self.agent = self.manager.create(aim_ctx, self.agent,
+                                                     overwrite=True)
             self.agent.hash_trees = result
-            self.manager.create(aim_ctx, self.agent, overwrite=True)
             return result
 
     def _tenant_assignation_algorithm(self, aim_ctx, agents):
@@ -300,16 +315,71 @@ class AID(object):
             return result
         # TODO(ivar): In future, for better resource usage, each agent
         # could have a weight value in the DB definition
-        LOG.info("Vnodes value %s" % self.get_vnodes_value(aim_ctx))
-        ring = hashring.ConsistentHashRing(
-            dict([(x.id, None) for x in agents]),
-            vnodes=self.get_vnodes_value(aim_ctx))
+        ring = self._get_hashring(aim_ctx, dict([(x.id, None)
+                                                 for x in agents]))
         # retrieve tenants
-        for tenant in self.tree_manager.get_roots(aim_ctx):
-            allocations = ring.assign_key(tenant)
-            if self.agent_id in allocations:
-                result.append(tenant)
-        return result
+        tenants = self.tree_manager.get_roots(aim_ctx)
+        load_mode = (aim_cfg.CONF.aim.tenant_assignment_mode ==
+                     ASSIGNMENT_MODE_LOAD)
+        costs = {}
+        if load_mode:
+            # All the agents assign tenants from the same stored costs, only
+            # one of them takes the snapshot.
+            if self.agent_id == min(x.id for x in agents):
+                self._refresh_tenant_costs(aim_ctx, tenants)
+            costs = self.tree_manager.get_roots_cost(aim_ctx)
+        # Unchanged ring, root set and costs, skip reassignment
+        roots_version = (ring.version, frozenset(tenants),
+                         frozenset(costs.items()))
+        if self._last_assignment and (self._last_assignment[0] ==
+                                      roots_version):
+            return list(self._last_assignment[1])
+        if load_mode:
+            # Tenants newer than the snapshot cost the minimum
+            allocations = ring.assign_keys_with_load(
+                dict((x, costs.get(x, 1)) for x in tenants),
+                load_factor=aim_cfg.CONF.aim.tenant_assignment_load_factor)
+            result = [x for x in tenants if self.agent_id in allocations[x]]
+        else:
+            for tenant in tenants:
+                allocations = ring.assign_key(tenant)
+                if self.agent_id in allocations:
+                    result.append(tenant)
+        self._last_assignment = (roots_version, result)
+        return list(result)
+
+    def _refresh_tenant_costs(self, aim_ctx, tenants):
+        now = time.time()
+        if now - self._costs_refreshed < TENANT_COST_REFRESH_INTERVAL:
+            return
+        self._costs_refreshed = now
+        if self.tree_manager.set_roots_cost(
+                aim_ctx, self._get_tenant_costs(aim_ctx, tenants)):
+            LOG.info("Tenant costs snapshot updated by agent %s",
+                     self.agent_id)
+
+    def _get_tenant_costs(self, aim_ctx, tenants):
+        # Only the stored tree size is used. Pending action logs come and go
+        # by the second and would move tenants around on every snapshot.
+        sizes = self.tree_manager.get_roots_load(aim_ctx)
+        costs = {}
+        for tenant in tenants:
+            cost = 1 + sizes.get(tenant, 0) // TREE_NODE_SIZE
+            # Round down to a power of 2, so that small fluctuations don't
+            # change the snapshot and move tenants around.
+            costs[tenant] = 1 << (cost.bit_length() - 1)
+        return costs
+
+    def _get_hashring(self, aim_ctx, nodes):
+        vnodes = self.get_vnodes_value(aim_ctx)
+        if self.ring is None or self.ring.vnodes != vnodes:
+            LOG.info("Building hash ring with vnodes value %s", vnodes)
+            self.ring = hashring.ConsistentHashRing(nodes, vnodes=vnodes)
+            self._last_assignment = None
+        elif self.ring.update_nodes(nodes):
+            LOG.info("Hash ring membership changed: %s",
+                     list(self.ring.nodes.keys()))
+        return self.ring
 
     def _major_vercompare(self, x, y):
         return (semantic_version.Version(x).major -
@@ -344,7 +414,7 @@ def main():
     try:
         agent = AID(aim_cfg.CONF)
     except (RuntimeError, ValueError) as e:
-        LOG.error("%s Agent terminated!" % e)
+        LOG.error("%s Agent terminated!", e)
         sys.exit(1)
 
     signal.signal(signal.SIGTERM, agent._handle_sigterm)
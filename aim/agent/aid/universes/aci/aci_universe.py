@@ -16,6 +16,7 @@
 import collections
 import random
 import requests.exceptions as rexc
+import threading
 import time
 import traceback
 
@@ -33,6 +34,7 @@ from aim import aim_manager
 from aim.api import infra as api_infra
 from aim.api import resource
 from aim.api import status
+from aim.common import ratelimit
 from aim.common import utils
 from aim import config as aim_cfg
 from aim import context as aim_ctx
@@ -61,23 +63,30 @@ ac_context = None
 
 
 def supports_remoteIPContainer(apic_session):
-    # this method does a Rest Call to check if hostprotRemoteIpContainer mo is
-    # supported in the APIC. It updates the DB with the status
-    aim_context = aim_ctx.AimContext(store=api.get_store())
-    manager = aim_manager.AimManager()
+    # this method checks if hostprotRemoteIpContainer mo is supported in the
+    # APIC. It updates the DB with the status
+    mo_name = 'hostprotRemoteIpContainer'
+
+    def update(results):
+        if results.get(mo_name):
+            # Update table ver check var to True
+            aim_context = aim_ctx.AimContext(store=api.get_store())
+            support_mo_mgr = aim_infra_model.ACISupportedMoManager(
+                aim_context, aim_manager.AimManager())
+            support_mo_mgr.set_support_status('remoteipcont', True)
+        else:
+            LOG.info("RemoteIpContainer mo not supported in this aci "
+                     "version")
+
     try:
-        mo_name = 'hostprotRemoteIpContainer'
-        apic_session.GET('/mo/uni/tn-common.json?'
-                         'target-subtree-class=%s' % mo_name)
-    except cexc.ApicResponseNotOk as e:
-        if int(e.err_status) == 400 and int(e.err_code) == 12:
-            LOG.info("RemoteIpContainer mo not supported in this aci version")
-    else:
-        # Update table ver check var to True
-        support_mo_mgr = aim_infra_model.ACISupportedMoManager(aim_context,
-                                                               manager)
-        support_mo_mgr.set_support_status('remoteipcont',
-                                          True)
+        results = aci_tenant.get_capabilities(
+            apic_session,
+            {mo_name: aci_tenant.probe_url(
+                '/mo/uni/tn-common.json?target-subtree-class=%s' % mo_name)},
+            on_refresh=update)
+    except cexc.ApicResponseNotOk:
+        return
+    update(results)
 
 
 class WebSocketSessionLoginFailed(exceptions.AimException):
@@ -95,6 +104,158 @@ class WebSocketUnsubscriptionFailed(exceptions.AimException):
                "with error %(code)s: %(text)s")
 
 
+class TenantEventQueue(object):
+    """Events of a single tenant manager
+
+    Filled by the WebSocketEventDispatcher, drained by the tenant manager
+    which can block on it until something happens.
+    """
+
+    def __init__(self):
+        self._events = collections.deque()
+        self._cond = threading.Condition()
+        self._woken = False
+
+    def put(self, events):
+        with self._cond:
+            self._events.extend(events)
+            self._cond.notify_all()
+
+    def notify(self):
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    def has_events(self):
+        return bool(self._events)
+
+    def get_all(self):
+        with self._cond:
+            result = list(self._events)
+            self._events.clear()
+            return result
+
+    def wait(self, timeout):
+        """Wait for events or notifications
+
+        :param timeout: max seconds to wait
+        :return: True if there are events to process
+        """
+        with self._cond:
+            if not self._events and not self._woken:
+                self._cond.wait(timeout)
+            self._woken = False
+            return bool(self._events)
+
+
+class WebSocketEventDispatcher(utils.AIMThread):
+    """Single consumer of the WebSocket session events
+
+    Drains the events received by the acitoolkit session and routes them
+    to per tenant queues based on the subscription URL. Tenant managers
+    block on their own queue instead of polling the session.
+    """
+
+    def __init__(self, ac_context, max_wait=1):
+        super(WebSocketEventDispatcher, self).__init__()
+        self.ac_context = ac_context
+        self.max_wait = max_wait
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._event_q_missing = False
+
+    def register(self, urls):
+        with self._lock:
+            queue = self._queues.get(urls[0])
+            if queue is None:
+                queue = TenantEventQueue()
+                for url in urls:
+                    self._queues[url] = queue
+            return queue
+
+    def unregister(self, urls):
+        with self._lock:
+            queue = None
+            for url in urls:
+                queue = self._queues.pop(url, None) or queue
+        if queue:
+            # Wake up the waiting tenant manager
+            queue.notify()
+
+    def get_queue(self, urls):
+        return self._queues.get(urls[0])
+
+    def has_event(self, urls):
+        queue = self.get_queue(urls)
+        return queue.has_events() if queue else False
+
+    def get_event_data(self, urls):
+        queue = self.get_queue(urls)
+        return queue.get_all() if queue else []
+
+    def wait_for_events(self, urls, timeout):
+        queue = self.get_queue(urls)
+        if not queue:
+            time.sleep(min(timeout, self.max_wait))
+            return False
+        return queue.wait(timeout)
+
+    def notify(self, urls):
+        queue = self.get_queue(urls)
+        if queue:
+            queue.notify()
+
+    def run(self):
+        LOG.info("Starting WebSocket event dispatcher")
+        while not self._stop:
+            try:
+                if not self._dispatch():
+                    self._wait_for_session_events(self.max_wait)
+            except Exception as e:
+                LOG.error(traceback.format_exc())
+                LOG.error("An exception has occurred in the WebSocket event "
+                          "dispatcher: %s", str(e))
+                time.sleep(self.max_wait)
+
+    def _dispatch(self):
+        """Route pending session events to the tenant queues
+
+        :return: True if any event was dispatched
+        """
+        session = self.ac_context.session
+        with self._lock:
+            queues = list(self._queues.items())
+        dispatched = False
+        for url, queue in queues:
+            events = []
+            while session.has_events(url):
+                events.append(session.get_event(url)['imdata'][0])
+            if events:
+                queue.put(events)
+                dispatched = True
+        return dispatched
+
+    def _wait_for_session_events(self, timeout):
+        # Block on the session's raw event queue, so that events are
+        # dispatched as soon as they are received. The queue is private to
+        # acitoolkit, fall back to polling if it can't be found.
+        subscription_thread = getattr(self.ac_context.session,
+                                      'subscription_thread', None)
+        event_q = getattr(subscription_thread, '_event_q', None)
+        not_empty = getattr(event_q, 'not_empty', None)
+        if not_empty is None:
+            if subscription_thread is not None and not self._event_q_missing:
+                self._event_q_missing = True
+                LOG.warning("The acitoolkit subscription thread has no "
+                            "event queue to wait on, WebSocket events will "
+                            "be polled every %s seconds", timeout)
+            time.sleep(timeout)
+            return
+        with not_empty:
+            if not event_q.qsize():
+                not_empty.wait(timeout)
+
+
 class ApicClientsContext(object):
     """Placeholder for apic clients session"""
     EMPTY_URLS = ["empty/url"]
@@ -115,8 +276,19 @@ class ApicClientsContext(object):
         self.need_recovery = False
         self.recovery_max_backoff = 600
         self.manager = aim_manager
+        self.dispatcher = None
+        self.governor = None
+        if (aim_cfg.CONF.aim.apic_request_rate or
+                aim_cfg.CONF.aim.apic_max_requests_in_flight):
+            # Shared by all the REST calls made through aci_session
+            self.governor = ratelimit.RequestGovernor(
+                rate=aim_cfg.CONF.aim.apic_request_rate,
+                burst=aim_cfg.CONF.aim.apic_request_burst,
+                max_in_flight=aim_cfg.CONF.aim.apic_max_requests_in_flight)
         self.establish_sessions()
         supports_remoteIPContainer(self.aci_session)
+        if aim_cfg.CONF.aim.websocket_event_dispatcher:
+            self.dispatcher = WebSocketEventDispatcher(self).start()
 
     def _spawn_monitors(self):
         self.login_thread = None
@@ -307,6 +479,9 @@ class ApicClientsContext(object):
                 'signature_verification_algorithm', group='apic'),
             sign_hash=self.apic_config.get_option(
                 'signature_hash_type', group='apic'))
+        if self.governor:
+            self.aci_session._do_request = self.governor.wrap(
+                self.aci_session._do_request)
 
     def _ws_config_callback(self, new_conf):
         # If any of the WS related configurations changed, reload fresh values
@@ -343,6 +518,8 @@ class ApicClientsContext(object):
             raise WebSocketSubscriptionFailed(urls=urls,
                                               code=400,
                                               text="Empty URLS")
+        if self.dispatcher:
+            self.dispatcher.register(urls)
         resp = self._subscribe(urls)
         if resp is not None:
             if resp.ok:
@@ -357,6 +534,8 @@ class ApicClientsContext(object):
     def unsubscribe(self, urls):
         if urls == self.EMPTY_URLS:
             return
+        if self.dispatcher:
+            self.dispatcher.unregister(urls)
         resp = self._unsubscribe(urls)
         if resp is not None and not resp.ok:
             if resp.status_code in [405, 598, 500]:
@@ -369,6 +548,8 @@ class ApicClientsContext(object):
         self.session.refresh_subscriptions(urls=urls)
 
     def get_event_data(self, urls):
+        if self.dispatcher:
+            return self.dispatcher.get_event_data(urls)
         result = []
         for url in urls:
             # Aggregate similar events
@@ -380,8 +561,27 @@ class ApicClientsContext(object):
     def has_event(self, urls):
         if urls == self.EMPTY_URLS:
             return False
+        if self.dispatcher:
+            return self.dispatcher.has_event(urls)
         return any(self.session.has_events(url) for url in urls)
 
+    def wait_for_events(self, urls, timeout):
+        """Block until events for the given urls are available
+
+        Only blocks on events when the event dispatcher is enabled, sleeps
+        for the whole timeout otherwise.
+        :return: True if events are available
+        """
+        if self.dispatcher and urls != self.EMPTY_URLS:
+            return self.dispatcher.wait_for_events(urls, timeout)
+        time.sleep(timeout)
+        return self.has_event(urls)
+
+    def notify(self, urls):
+        """Wake up whoever is waiting for events on the given urls"""
+        if self.dispatcher:
+            self.dispatcher.notify(urls)
+
     def _thread_monitor(self, flag):
         login_thread_name = 'login_thread'
         subscription_thread_name = 'subscription_thread'
@@ -417,13 +617,13 @@ class ApicClientsContext(object):
                                 LOG.debug(
                                     "Monitor for thread %s tried to reconnect "
                                     "web socket, but something went wrong. "
-                                    "Will retry %s more times: %s" %
-                                    (name,
-                                     max_retries - name_to_retry[name].get(),
-                                     str(e)))
+                                    "Will retry %s more times: %s",
+                                    name,
+                                    max_retries - name_to_retry[name].get(),
+                                    str(e))
                                 continue
                     elif thd:
-                        LOG.debug("Thread %s is in good shape" % name)
+                        LOG.debug("Thread %s is in good shape", name)
                         name_to_retry[name] = None
 
                 if self.need_recovery:
@@ -448,7 +648,7 @@ class ApicClientsContext(object):
                     else:
                         # This should never happen
                         LOG.error('There is no such apic_assign_obj exist '
-                                  'for %s!' % self.session.ipaddr)
+                                  'for %s!', self.session.ipaddr)
 
                 time.sleep(self.monitor_sleep_time)
                 # for testing purposes
@@ -600,8 +800,8 @@ class AciUniverse(base.HashTreeStoredUniverse):
                     serving_tenant_copy[removed].kill()
                 except Exception as e:
                     LOG.debug(traceback.format_exc())
-                    LOG.error('Killing manager failed for tenant %s: %s' %
-                              (removed, str(e)))
+                    LOG.error('Killing manager failed for tenant %s: %s',
+                              removed, str(e))
                     continue
             for added in tenants:
                 if added in serving_tenant_copy:
@@ -611,11 +811,11 @@ class AciUniverse(base.HashTreeStoredUniverse):
                         serving_tenants[added] = serving_tenant_copy[
                             added]
                     except KeyError:
-                        LOG.debug("%s not found in %s during serving copy" %
-                                  (added, serving_tenant_copy))
+                        LOG.debug("%s not found in %s during serving copy",
+                                  added, serving_tenant_copy)
                 if (added not in serving_tenants or
                         serving_tenants[added].is_dead()):
-                    LOG.debug("Adding new tenant %s" % added)
+                    LOG.debug("Adding new tenant %s", added)
                     # Start thread or replace broken one
                     # Checking the 'dead' state helps those cases in which
                     # a kill successfully happened but then  the state was
@@ -663,14 +863,14 @@ class AciUniverse(base.HashTreeStoredUniverse):
         # Reset can only be called during reconciliation. serving_tenants
         # can't be modified meanwhile
         global serving_tenants
-        LOG.warning('Reset called for roots %s' % tenants)
+        LOG.warning('Reset called for roots %s', tenants)
         for root in tenants:
             if root in serving_tenants:
                 try:
                     serving_tenants[root].kill()
                 except Exception:
                     LOG.error(traceback.format_exc())
-                    LOG.error('Failed to reset tenant %s' % root)
+                    LOG.error('Failed to reset tenant %s', root)
 
     def _filter_resources(self, context, resources_by_tenant):
         """Filter unsynced resources
@@ -746,8 +946,8 @@ class AciUniverse(base.HashTreeStoredUniverse):
                 serving_tenants[tenant]
             except KeyError:
                 LOG.warning("Tenant %s is not being served anymore. "
-                            "Currently served tenants: %s" % (
-                                tenant, list(serving_tenants.keys())))
+                            "Currently served tenants: %s",
+                            tenant, list(serving_tenants.keys()))
             else:
                 serving_tenants[tenant].push_aim_resources(conf)
 
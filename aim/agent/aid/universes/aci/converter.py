@@ -1512,6 +1512,52 @@ for item in reverse_resource_map[resource.L3OutInterfaceBgpPeerP]:
         item['resource'] = 'bgpAsP__Peer'
 
 
+# Attributes whose name differs from the automatic conversion, the source
+# object is looked at as if they were named as their alias.
+ACI_TO_AIM_ALIASES = {'nameAlias': 'displayName'}
+AIM_TO_ACI_ALIASES = {'display_name': 'name_alias'}
+
+
+class ConversionPlan(object):
+    """Conversion steps of one ACI type or AIM class, compiled once"""
+
+    def __init__(self, helpers, to_aim, aliases, compiled=True):
+        # Custom converters get the whole source object, so aliases can only
+        # be resolved on the fly when every helper is a compiled plan.
+        self.rename = not compiled or any(
+            'converter' in h or
+            any(a in h.get('exceptions', {}) for a in aliases.values())
+            for h in helpers)
+        plan_aliases = None if self.rename else aliases
+        self.helpers = []
+        for helper in helpers:
+            if helper.get('converter'):
+                func = helper['converter']
+            elif compiled:
+                func = utils.DefaultConversionPlan(helper, to_aim=to_aim,
+                                                   aliases=plan_aliases)
+            else:
+                func = utils.default_converter
+            self.helpers.append((helper, func))
+
+
+def compile_plans(mapping, to_aim, compiled=True):
+    aliases = ACI_TO_AIM_ALIASES if to_aim else AIM_TO_ACI_ALIASES
+    return dict((otype, ConversionPlan(helpers, to_aim, aliases,
+                                       compiled=compiled))
+                for otype, helpers in mapping.items())
+
+
+aci_to_aim_plans = compile_plans(resource_map, True)
+aim_to_aci_plans = compile_plans(reverse_resource_map, False)
+
+
+def conversion_context():
+    """Settings, other than the objects, that conversion results depend on"""
+    return (apic_client.ManagedObjectClass.scope,
+            aim_cfg.CONF.aim.disable_micro_segmentation)
+
+
 class BaseConverter(object):
 
     def __init__(self):
@@ -1545,19 +1591,19 @@ class AciToAimModelConverter(BaseConverter):
         result = []
         for object in aci_objects:
             try:
-                if list(object.keys())[0] not in resource_map:
+                aci_type = next(iter(object))
+                plan = aci_to_aim_plans.get(aci_type)
+                if plan is None:
                     # Ignore unmanaged object
                     continue
-                resource = object[list(object.keys())[0]]['attributes']
+                resource = object[aci_type]['attributes']
                 # Change nameAlias to allow automatic conversion
-                if 'nameAlias' in resource:
-                    resource['displayName'] = resource['nameAlias']
-                    del resource['nameAlias']
-                for helper in resource_map[list(object.keys())[0]]:
-                    # Use the custom converter, fallback to the default one
-                    converted = (
-                        helper.get('converter') or self._default_converter)(
-                        resource, list(object.keys())[0], helper,
+                rename = plan.rename and 'nameAlias' in resource
+                if rename:
+                    resource['displayName'] = resource.pop('nameAlias')
+                for helper, func in plan.helpers:
+                    converted = func(
+                        resource, aci_type, helper,
                         ['dn'], helper['resource'].identity_attributes,
                         to_aim=True)
                     if resource.get('status') == DELETED_STATUS:
@@ -1567,16 +1613,15 @@ class AciToAimModelConverter(BaseConverter):
                             x.__dict__['_status'] = 'deleted'
                     result.extend(converted)
                 # Change displayName back to original
-                if 'displayName' in resource:
-                    resource['nameAlias'] = resource['displayName']
-                    del resource['displayName']
+                if rename:
+                    resource['nameAlias'] = resource.pop('displayName')
             except Exception as e:
                 LOG.warning("Could not convert object"
-                            "%s with error %s" % (object, str(e)))
+                            "%s with error %s", object, str(e))
                 LOG.debug(traceback.format_exc())
         squashed = self._squash(result)
         if aci_objects:
-            LOG.debug("Converted: %s into: %s" % (aci_objects, squashed))
+            LOG.debug("Converted: %s into: %s", aci_objects, squashed)
         return squashed
 
     def _squash(self, converted_list):
@@ -1626,23 +1671,23 @@ class AimToAciModelConverter(BaseConverter):
         for object in in_objects:
             try:
                 klass = type(object)
-                if klass not in reverse_resource_map:
+                plan = aim_to_aci_plans.get(klass)
+                if plan is None:
                     # Ignore unmanaged object
                     continue
                 is_pre = getattr(object, 'pre_existing', False)
                 is_mon = getattr(object, 'monitored', False)
-                if 'display_name' in object.__dict__:
-                    object.__dict__['name_alias'] = object.display_name
-                    del object.__dict__['display_name']
-                for helper in reverse_resource_map[klass]:
+                rename = plan.rename and 'display_name' in object.__dict__
+                if rename:
+                    object.__dict__['name_alias'] = object.__dict__.pop(
+                        'display_name')
+                for helper, func in plan.helpers:
                     if is_pre and not helper.get('convert_pre_existing',
                                                  False):
                         continue
                     if is_mon and not helper.get('convert_monitored', True):
                         continue
-                    # Use the custom converter, fallback to the default one
-                    converted = (
-                        helper.get('converter') or self._default_converter)(
+                    converted = func(
                         object.__dict__, klass, helper,
                         klass.identity_attributes,
                         ['dn'], to_aim=False)
@@ -1654,17 +1699,17 @@ class AimToAciModelConverter(BaseConverter):
                         else:
                             result.append(c)
                 # Set name alias back to original
-                if 'name_alias' in object.__dict__:
-                    object.__dict__['display_name'] = object.name_alias
-                    del object.__dict__['name_alias']
+                if rename:
+                    object.__dict__['display_name'] = object.__dict__.pop(
+                        'name_alias')
             except Exception as e:
                 LOG.warning("Could not convert object"
-                            "%s with error %s" % (object.__dict__, str(e)))
+                            "%s with error %s", object.__dict__, str(e))
                 LOG.debug(traceback.format_exc())
 
         squashed = self._squash(result)
         if aim_objects:
-            LOG.debug("Converted: %s into: %s" % (aim_objects, squashed))
+            LOG.debug("Converted: %s into: %s", aim_objects, squashed)
         return squashed
 
     def _squash(self, converted_list):
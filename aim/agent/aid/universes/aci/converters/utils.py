@@ -19,6 +19,8 @@ from oslo_log import log as logging
 
 from apicapi import apic_client
 
+from aim.common import utils as aim_utils
+
 LOG = logging.getLogger(__name__)
 IGNORE = object()
 
@@ -85,6 +87,17 @@ def default_attribute_converter(object_dict, attribute,
     return object_dict[attribute]
 
 
+_RESOURCE_ATTRIBUTES = {}
+
+
+def _resource_attributes(klass):
+    try:
+        return _RESOURCE_ATTRIBUTES[klass]
+    except KeyError:
+        return _RESOURCE_ATTRIBUTES.setdefault(klass,
+                                               frozenset(klass.attributes()))
+
+
 def default_to_resource(converted, helper, to_aim=True):
     klass = helper['resource']
     default_skip = ['preExisting', 'monitored', 'Error', 'Pending',
@@ -92,10 +105,11 @@ def default_to_resource(converted, helper, to_aim=True):
     skip = helper.get('skip', [])
     if to_aim:
         # APIC to AIM
+        attributes = _resource_attributes(klass)
         return klass(
             _set_default=False,
             **dict([(k, v) for k, v in list(converted.items()) if k in
-                    klass.attributes() and k not in skip]))
+                    attributes and k not in skip]))
     else:
         for s in default_skip + skip:
             converted.pop(s, None)
@@ -150,18 +164,15 @@ def default_identity_converter(object_dict, otype, helper,
     to the resource class 'identity_attributes'
     """
     if to_aim:
-        dn_mgr = apic_client.DNManager()
         aci_type = aci_mo_type or otype
-        mos_and_rns = dn_mgr.aci_decompose_with_type(object_dict['dn'],
-                                                     aci_type)
-        return dn_mgr.filter_rns(mos_and_rns)
+        return aim_utils.get_dn_identity(object_dict['dn'], aci_type)
     else:
         attr = [object_dict[x] for x in otype.identity_attributes]
         if extra_attributes:
             attr.extend(extra_attributes)
         mo_type = aci_mo_type or helper['resource']
         try:
-            return [apic_client.ManagedObjectClass(mo_type).dn(*attr)]
+            return [aim_utils.get_aci_dn(mo_type, *attr)]
         except Exception as e:
             LOG.error('Failed to make DN for %s with %s: %s',
                       mo_type, attr, e)
@@ -227,6 +238,76 @@ def default_converter(object_dict, otype, helper,
         return [result] if result else []
 
 
+class DefaultConversionPlan(object):
+    """Specialized default_converter for one resource_map entry
+
+    Produces the same result as default_converter, but everything that only
+    depends on the mapping entry (converters, exceptions, the name of each
+    attribute on the other side, the DN template) is worked out once instead
+    of for every converted object. Instances are used in place of the
+    'converter' of the entry.
+
+    :param helper: Mapping help from the (reverse_)resource_map
+    :param to_aim: Boolean indicating whether the plan converts
+                   ACI/AIM (True) or AIM/ACI (False)
+    :param aliases: dictionary of attributes of the source object that must be
+                    treated as if they had a different name
+    """
+
+    _SKIP = object()
+
+    def __init__(self, helper, to_aim=True, aliases=None):
+        self.helper = helper
+        self.to_aim = to_aim
+        self.aliases = aliases or {}
+        self.identity_converter = (helper.get('identity_converter') or
+                                   default_identity_converter)
+        self.to_resource = helper.get('to_resource') or default_to_resource
+        self.exceptions = helper.get('exceptions', {})
+        # attribute -> (other attribute name, attribute converter)
+        self._attributes = {}
+
+    def _compile_attribute(self, attribute):
+        name = self.aliases.get(attribute, attribute)
+        if name in self.exceptions:
+            info = self.exceptions[name]
+            other = info.get('other',
+                             convert_attribute(name, to_aim=self.to_aim))
+            conv = info.get('converter') or default_attribute_converter
+            return other, conv
+        return convert_attribute(name, to_aim=self.to_aim), None
+
+    def __call__(self, object_dict, otype, helper, source_identity_attributes,
+                 destination_identity_attributes, to_aim=True):
+        res_dict = {}
+        identity = self.identity_converter(object_dict, otype, self.helper,
+                                           to_aim=self.to_aim)
+        for index, part in enumerate(destination_identity_attributes):
+            res_dict[part] = identity[index]
+        attributes = self._attributes
+        for attribute in object_dict:
+            if attribute in source_identity_attributes:
+                continue
+            try:
+                other, conv = attributes[attribute]
+            except KeyError:
+                other, conv = attributes.setdefault(
+                    attribute, self._compile_attribute(attribute))
+            if conv is None:
+                # Identity was already converted
+                if other not in destination_identity_attributes:
+                    res_dict[other] = object_dict[attribute]
+                continue
+            converted = conv(object_dict, attribute, to_aim=self.to_aim)
+            if not isinstance(converted, dict):
+                converted = {other: converted}
+            for other_k, other_v in converted.items():
+                if other_k not in destination_identity_attributes:
+                    res_dict[other_k] = other_v
+        result = self.to_resource(res_dict, self.helper, to_aim=self.to_aim)
+        return [result] if result else []
+
+
 def child_list(aim_attr, aci_attr, aci_mo=None):
     def func(object_dict, otype, helper, source_identity_attributes,
              destination_identity_attributes, to_aim=True):
@@ -13,10 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import copy
-from six.moves import queue as Queue
+import heapq
+import itertools
+import six
+import threading
 import time
 import traceback
+import weakref
 
 from acitoolkit import acitoolkit
 from apicapi import apic_client
@@ -25,12 +30,17 @@ from oslo_config import cfg
 from oslo_log import log as logging
 
 from aim.agent.aid import event_handler
+from aim import aim_manager
 from aim.agent.aid.universes.aci import converter
 from aim.agent.aid.universes.aci import error
 from aim.agent.aid.universes import base_universe
 from aim.agent.aid.universes import constants as lcon
 from aim.common.hashtree import structured_tree
+from aim.common import ratelimit
 from aim.common import utils
+from aim import context as aim_ctx
+from aim.db import api
+from aim.db import infra_model
 from aim import exceptions as aim_exceptions
 from aim import tree_manager
 
@@ -49,6 +59,9 @@ CHILDREN_MOS_UNI = None
 CHILDREN_MOS_TOPOLOGY = None
 SUPPORTS_ANNOTATIONS = None
 RESET_INTERVAL = 3600
+PROBE_WORKERS = 8
+# APIC version by APIC session
+_apic_versions = weakref.WeakKeyDictionary()
 DEFAULT_WS_TO = '60'
 BASELINE_WS_TO = '900'
 
@@ -57,6 +70,303 @@ class ScheduledReset(Exception):
     pass
 
 
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Get the worker pool serving the tenant managers
+
+    :return: the TenantWorkerPool, None when every tenant manager should
+    run in its own thread.
+    """
+    global _worker_pool
+    workers = cfg.CONF.aim.aci_tenant_workers
+    if not workers:
+        return None
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = TenantWorkerPool(workers)
+        return _worker_pool
+
+
+class ObjectBacklog(object):
+    """Requests waiting to be pushed to APIC
+
+    Requests are kept in arrival order and indexed by operation and DN,
+    so that queuing an object already waiting for the same operation
+    replaces it in place.
+    """
+
+    def __init__(self):
+        self.queue = collections.deque()
+        self._index = {}
+
+    def _key(self, op, item):
+        if op == base_universe.CREATE:
+            return op, item.dn
+        if op == base_universe.DELETE:
+            # Delete items are in ACI format
+            return op, list(item.values())[0]['attributes']['dn']
+
+    def empty(self):
+        return not self.queue
+
+    def put(self, resources):
+        """Queue a request, squashing it against the pending ones
+
+        :param resources: a dictionary with "create" and "delete" resources
+        """
+        request = dict((op, []) for op in resources)
+        for op, items in list(resources.items()):
+            for item in items:
+                key = self._key(op, item)
+                pending = self._index.get(key) if key else None
+                if pending:
+                    # Replace old with new
+                    pending[0][op][pending[1]] = item
+                    continue
+                if key:
+                    self._index[key] = (request, len(request[op]))
+                request[op].append(item)
+        if any(request.values()):
+            self.queue.append(request)
+
+    def get(self):
+        request = self.queue.popleft()
+        for op, items in list(request.items()):
+            for item in items:
+                self._index.pop(self._key(op, item), None)
+        return request
+
+    get_nowait = get
+
+
+class TenantWorkerPool(object):
+    """Fixed size pool of threads running the tenant managers
+
+    Tenant managers are scheduled as tasks: each run executes a single step
+    of the manager and returns the delay before the next one. A manager is
+    never run by two workers at the same time.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._tasks = []
+        self._due = {}
+        self._running = set()
+        self._woken = set()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = [utils.spawn_thread(self._work)
+                         for _ in range(workers)]
+
+    def __len__(self):
+        return len(self._due) + len(self._running)
+
+    def schedule(self, task, delay=0):
+        """Schedule a task to run within delay seconds
+
+        A task already scheduled earlier is left untouched, a task currently
+        running is rescheduled right away when it completes.
+        """
+        with self._cond:
+            if task in self._running:
+                if not delay:
+                    self._woken.add(task)
+                return
+            due = time.time() + delay
+            if task in self._due and self._due[task] <= due:
+                return
+            self._due[task] = due
+            heapq.heappush(self._tasks, (due, next(self._counter), task))
+            self._cond.notify()
+
+    def unschedule(self, task):
+        with self._cond:
+            self._due.pop(task, None)
+            self._woken.discard(task)
+
+    def _next_task(self):
+        with self._cond:
+            while True:
+                # Discard rescheduled or unscheduled entries
+                while self._tasks and (
+                        self._due.get(self._tasks[0][2]) !=
+                        self._tasks[0][0]):
+                    heapq.heappop(self._tasks)
+                if not self._tasks:
+                    self._cond.wait()
+                    continue
+                due, _, task = self._tasks[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._tasks)
+                del self._due[task]
+                self._running.add(task)
+                return task
+
+    def _work(self):
+        while True:
+            task = self._next_task()
+            delay = None
+            try:
+                delay = task._run_task()
+            except Exception as e:
+                LOG.error(traceback.format_exc())
+                LOG.error("An exception has occurred in tenant worker: "
+                          "%s", str(e))
+            with self._cond:
+                self._running.discard(task)
+                if task in self._woken:
+                    self._woken.discard(task)
+                    delay = 0 if delay is not None else None
+            if delay is not None:
+                self.schedule(task, delay)
+
+
+def get_apic_version(apic_session, refresh=False):
+    """APIC controller version, None if it can't be retrieved
+
+    The version is cached per session, unless refresh is set.
+    """
+    if not refresh:
+        version = _apic_versions.get(apic_session)
+        if version:
+            return version
+    try:
+        firmware = apic_session.GET('/node/class/firmwareCtrlrRunning.json')
+        version = firmware[0]['firmwareCtrlrRunning']['attributes'][
+            'version']
+    except Exception as e:
+        LOG.debug("Failed to retrieve APIC version: %s", str(e))
+        return None
+    if not isinstance(version, six.string_types):
+        return None
+    _apic_versions[apic_session] = version
+    return version
+
+
+def _get_support_manager():
+    # New context, sessions are not thread safe.
+    return infra_model.ACISupportedMoManager(
+        aim_ctx.AimContext(store=api.get_store()), aim_manager.AimManager())
+
+
+def _run_probes(apic_session, probes):
+    results = {}
+    failures = []
+    pending = collections.deque(probes.items())
+
+    def probe():
+        while True:
+            try:
+                name, func = pending.popleft()
+            except IndexError:
+                return
+            try:
+                results[name] = func(apic_session)
+            except Exception as e:
+                failures.append(e)
+
+    threads = [utils.spawn_thread(probe)
+               for _ in range(min(PROBE_WORKERS, len(probes)))]
+    for thd in threads:
+        thd.join()
+    if failures:
+        raise failures[0]
+    return results
+
+
+def _refresh_probes(apic_session, version, probes, on_refresh=None):
+    try:
+        # The cached version is checked again off the critical path, APIC
+        # could have been upgraded since.
+        version = get_apic_version(apic_session, refresh=True) or version
+        results = _run_probes(apic_session, probes)
+        _get_support_manager().set_probe_results(version, results)
+        if on_refresh:
+            on_refresh(results)
+    except Exception as e:
+        LOG.warning("Failed to refresh APIC capabilities: %s", str(e))
+
+
+def get_capabilities(apic_session, probes, on_refresh=None):
+    """Run capability probes against APIC
+
+    Results are persisted in the ACICapabilityProbe table keyed by APIC
+    version. Persisted results are returned right away and refreshed in
+    background, the others are probed in parallel.
+
+    :param probes: dictionary of probe name -> function(apic_session)
+    returning whether the capability is supported
+    :param on_refresh: called with all the results once the background
+    refresh is done
+    :return: dictionary of probe name -> supported
+    """
+    version = get_apic_version(apic_session)
+    known = {}
+    if version:
+        try:
+            known = _get_support_manager().get_probe_results(version)
+        except Exception as e:
+            LOG.warning("Failed to retrieve APIC capabilities: %s", str(e))
+        known = dict((x, y) for x, y in list(known.items()) if x in probes)
+    missing = _run_probes(
+        apic_session,
+        dict((x, y) for x, y in list(probes.items()) if x not in known))
+    results = dict(known)
+    results.update(missing)
+    if version and missing:
+        try:
+            _get_support_manager().set_probe_results(version, missing)
+        except Exception as e:
+            LOG.warning("Failed to store APIC capabilities: %s", str(e))
+    if version and known:
+
+        def refreshed(new):
+            if on_refresh:
+                merged = dict(results)
+                merged.update(new)
+                on_refresh(merged)
+
+        utils.spawn_thread(_refresh_probes, apic_session, version,
+                           dict((x, probes[x]) for x in known),
+                           on_refresh=refreshed)
+    return results
+
+
+def probe_url(url):
+    """Probe verifying that APIC supports the class queried by url"""
+    def probe(apic_session):
+        try:
+            apic_session.GET(url)
+        except apic_exc.ApicResponseNotOk as e:
+            if int(e.err_status) == 400 and int(e.err_code) == 12:
+                return False
+            raise e
+        return True
+    return probe
+
+
+def _get_supported_mos(apic_session, mos, url_fmt, on_refresh):
+    names = []
+    for mo in mos:
+        if mo in apic_client.ManagedObjectClass.supported_mos:
+            names.append(apic_client.ManagedObjectClass(mo).klass_name)
+        else:
+            names.append(mo)
+
+    def supported(results):
+        return set(x for x in names if results.get(x))
+
+    return supported(get_capabilities(
+        apic_session, dict((x, probe_url(url_fmt % x)) for x in names),
+        on_refresh=lambda x: on_refresh(supported(x))))
+
+
 def get_children_mos(apic_session, root):
     root_type = 'uni'
     try:
@@ -67,45 +377,45 @@ def get_children_mos(apic_session, root):
     global CHILDREN_MOS_TOPOLOGY
     if root_type in ['uni']:
         if CHILDREN_MOS_UNI is None:
-            CHILDREN_MOS_UNI = set()
-            for mo in CHILDREN_LIST:
-                if mo in apic_client.ManagedObjectClass.supported_mos:
-                    mo_name = apic_client.ManagedObjectClass(mo).klass_name
-                else:
-                    mo_name = mo
-                try:
-                    # Verify class support
-                    apic_session.GET('/mo/uni/tn-common.json?'
-                                     'target-subtree-class=%s' % mo_name)
-                except apic_exc.ApicResponseNotOk as e:
-                    if int(e.err_status) == 400 and int(e.err_code) == 12:
-                        continue
-                    raise e
-                CHILDREN_MOS_UNI.add(mo_name)
+
+            def update(supported):
+                global CHILDREN_MOS_UNI
+                CHILDREN_MOS_UNI = supported
+
+            # Verify class support
+            update(_get_supported_mos(
+                apic_session, CHILDREN_LIST,
+                '/mo/uni/tn-common.json?target-subtree-class=%s', update))
         return CHILDREN_MOS_UNI
     elif root_type in ['topology']:
         if CHILDREN_MOS_TOPOLOGY is None:
-            CHILDREN_MOS_TOPOLOGY = set()
-            for mo in TOPOLOGY_CHILDREN_LIST:
-                if mo in apic_client.ManagedObjectClass.supported_mos:
-                    mo_name = apic_client.ManagedObjectClass(mo).klass_name
-                else:
-                    mo_name = mo
-                try:
-                    apic_session.GET('/node/class/%s.json?' % mo_name)
-                except apic_exc.ApicResponseNotOk as e:
-                    if int(e.err_status) == 400 and int(e.err_code) == 12:
-                        continue
-                    raise e
-                CHILDREN_MOS_TOPOLOGY.add(mo_name)
+
+            def update(supported):
+                global CHILDREN_MOS_TOPOLOGY
+                CHILDREN_MOS_TOPOLOGY = supported
+
+            update(_get_supported_mos(
+                apic_session, TOPOLOGY_CHILDREN_LIST, '/node/class/%s.json?',
+                update))
         return CHILDREN_MOS_TOPOLOGY
 
 
+def _probe_annotations(apic_session):
+    tn = apic_session.GET('/mo/uni/tn-common.json')
+    return 'annotation' in tn[0]['fvTenant']['attributes']
+
+
 def supports_annotations(apic_session):
     global SUPPORTS_ANNOTATIONS
     if SUPPORTS_ANNOTATIONS is None:
-        tn = apic_session.GET('/mo/uni/tn-common.json')
-        SUPPORTS_ANNOTATIONS = 'annotation' in tn[0]['fvTenant']['attributes']
+
+        def update(results):
+            global SUPPORTS_ANNOTATIONS
+            SUPPORTS_ANNOTATIONS = results['annotation']
+
+        update(get_capabilities(apic_session,
+                                {'annotation': _probe_annotations},
+                                on_refresh=update))
     return SUPPORTS_ANNOTATIONS
 
 
@@ -217,8 +527,7 @@ class OwnershipManager(object):
             for obj in to_push:
                 if not list(obj.keys())[0].startswith(TAG_KEY):
                     dn = list(obj.values())[0]['attributes']['dn']
-                    mo = apic_client.DNManager().aci_decompose_dn_guess(
-                        dn, list(obj.keys())[0])
+                    mo = utils.decompose_dn_guess(dn, list(obj.keys())[0])
                     dn += '/tag-%s' % self.tag_key
                     tags.append({"%s__%s" % (TAG_KEY, mo[0]):
                                  {"attributes": {"dn": dn}}})
@@ -236,10 +545,10 @@ class OwnershipManager(object):
                 if self.use_annotation:
                     dn = list(obj.values())[0]['attributes']['dn']
                     if dn.endswith('/tag-%s' % self.tag_key):
-                        dec = apic_client.DNManager().aci_decompose_dn_guess(
+                        dec = utils.decompose_dn_guess(
                             dn, list(obj.keys())[0])
                         parent_dec = dec[1][:-1]
-                        parent_dn = apic_client.DNManager().build(parent_dec)
+                        parent_dn = utils.build_dn(parent_dec)
                         parent_type = parent_dec[-1][0]
                         to_update.append(
                             {parent_type: {'attributes': {'dn': parent_dn,
@@ -294,16 +603,13 @@ class OwnershipManager(object):
                     type, dn) and check_parent:
                 # Check for parent ownership
                 try:
-                    decomposed = (
-                        apic_client.DNManager().aci_decompose_dn_guess(
-                            dn, type))
+                    decomposed = utils.decompose_dn_guess(dn, type)
                 except apic_client.DNManager.InvalidNameFormat:
-                    LOG.debug("Type %s with DN %s is not supported." %
-                              (type, dn))
+                    LOG.debug("Type %s with DN %s is not supported.",
+                              type, dn)
                     return False
                 # Check for parent ownership
-                return self.is_owned_dn(apic_client.DNManager().build(
-                    decomposed[1][:-1]))
+                return self.is_owned_dn(utils.build_dn(decomposed[1][:-1]))
             else:
                 return owned
 
@@ -321,7 +627,7 @@ class AciTenantManager(utils.AIMThread):
                  creation_succeeded=None, creation_failed=None,
                  aim_system_id=None, get_resources=None, *args, **kwargs):
         super(AciTenantManager, self).__init__(*args, **kwargs)
-        LOG.info("Init manager for tenant %s" % tenant_name)
+        LOG.info("Init manager for tenant %s", tenant_name)
         self.get_resources = get_resources
         self.apic_config = apic_config
         # Each tenant has its own sessions
@@ -342,6 +648,14 @@ class AciTenantManager(utils.AIMThread):
         self._monitored_state = structured_tree.StructuredHashTree()
         self.polling_yield = self.apic_config.get_option(
             'aci_tenant_polling_yield', 'aim')
+        self.push_batch_size = self.apic_config.get_option(
+            'aci_push_batch_size', 'aim') or 1
+        self.event_coalescing_window = self.apic_config.get_option(
+            'aci_event_coalescing_window', 'aim') or 0
+        self._reset_pending_events()
+        # Counters of the events received from APIC, and of those
+        # suppressed because superseded by a later event on the same DN
+        self.event_stats = {'received': 0, 'suppressed': 0}
         self.to_aim_converter = converter.AciToAimModelConverter()
         self.to_aci_converter = converter.AimToAciModelConverter()
         self._reset_object_backlog()
@@ -363,19 +677,39 @@ class AciTenantManager(utils.AIMThread):
         self.num_loop_runs = float('inf')
         self.ownership_mgr = OwnershipManager(self.ac_context.aci_session,
                                               apic_config, aim_system_id)
+        # Worker pool running this manager, if any
+        self._pool = None
         # Initialize tenant tree
 
     def _reset_object_backlog(self):
-        self.object_backlog = Queue.Queue()
+        self.object_backlog = ObjectBacklog()
+
+    def start(self):
+        self._pool = get_worker_pool()
+        if not self._pool:
+            return super(AciTenantManager, self).start()
+        LOG.debug("Scheduling manager for tenant %s on worker pool",
+                  self.tenant_name)
+        self._pool.schedule(self)
+        return self
 
     def kill(self, *args, **kwargs):
         try:
             self._unsubscribe_tenant(kill=True)
         except Exception as e:
             LOG.warning("Failed to unsubscribe tenant during kill "
-                        "procedure: %s %s" % (self.tenant_name, str(e)))
+                        "procedure: %s %s", self.tenant_name, str(e))
         finally:
             super(AciTenantManager, self).kill(*args, **kwargs)
+            if self._pool:
+                self._stop = True
+                self._pool.unschedule(self)
+
+    @property
+    def dead(self):
+        if self._pool:
+            return self._stop
+        return super(AciTenantManager, self).dead
 
     def is_dead(self):
         # Wrapping the greenlet property for easier testing
@@ -400,20 +734,20 @@ class AciTenantManager(utils.AIMThread):
             root_key=self._monitored_state.root_key)
 
     def run(self):
-        LOG.debug("Starting main loop for tenant %s" % self.tenant_name)
+        LOG.debug("Starting main loop for tenant %s", self.tenant_name)
         try:
-            while not self._stop:
-                self._main_loop()
+            with ratelimit.request_owner(self.tenant_name):
+                while not self._stop:
+                    self._main_loop()
         except Exception as e:
             LOG.error(traceback.format_exc())
-            LOG.error("Exiting thread for tenant %s: %s" %
-                      (self.tenant_name, str(e)))
+            LOG.error("Exiting thread for tenant %s: %s",
+                      self.tenant_name, str(e))
             try:
                 self._unsubscribe_tenant()
             except Exception as e:
                 LOG.error("An exception has occurred while exiting thread "
-                          "for tenant %s: %s" % (self.tenant_name,
-                                                 str(e)))
+                          "for tenant %s: %s", self.tenant_name, str(e))
             finally:
                 # We need to make sure that this thread dies upon
                 # GreenletExit
@@ -423,24 +757,19 @@ class AciTenantManager(utils.AIMThread):
         try:
             # tenant subscription is redone upon exception
             self._subscribe_tenant()
-            LOG.debug("Starting event loop for tenant %s" % self.tenant_name)
+            LOG.debug("Starting event loop for tenant %s", self.tenant_name)
             last_time = 0
             epsilon = 0.5
             while not self._stop and self.num_loop_runs > 0:
                 start = time.time()
-                if start > self.scheduled_reset:
-                    raise ScheduledReset()
-                if start > self.refresh_time:
-                    self.ac_context.refresh_subscriptions(
-                        urls=self.tenant.urls)
-                    self.refresh_time = self._schedule_websocket_refresh()
+                self._check_schedule(start)
                 self._event_loop()
                 curr_time = time.time() - start
                 if abs(curr_time - last_time) > epsilon:
                     # Only log significant differences
                     LOG.debug("Event loop for tenant %s completed in %s "
-                              "seconds" % (self.tenant_name,
-                                           time.time() - start))
+                              "seconds", self.tenant_name,
+                              time.time() - start)
                     last_time = curr_time
                 if not last_time:
                     last_time = curr_time
@@ -448,28 +777,73 @@ class AciTenantManager(utils.AIMThread):
                 self.num_loop_runs -= 1
                 self.recovery_retries = None
         except ScheduledReset:
-            LOG.info("Scheduled tree reset for root %s" % self.tenant_name)
-            try:
-                self._unsubscribe_tenant()
-            except Exception as e:
-                LOG.info("Exception has occurred while unsubscribing tenant %s"
-                         ", error: %s" % (self.tenant_name, str(e)))
+            self._scheduled_reset()
         except Exception as e:
-            LOG.error("An exception has occurred in thread serving tenant "
-                      "%s, error: %s" % (self.tenant_name, str(e)))
-            LOG.error(traceback.format_exc())
-            try:
-                self._unsubscribe_tenant()
-            except Exception as e:
-                LOG.info("Exception has occurred while unsubscribing tenant %s"
-                         ", error: %s" % (self.tenant_name, str(e)))
+            self._handle_failure(e)
             self.recovery_retries = utils.exponential_backoff(
                 TENANT_FAILURE_MAX_WAIT, tentative=self.recovery_retries)
-            if self.recovery_retries.get() >= self.max_retries:
-                LOG.error("Exceeded max recovery retries for tenant %s. "
-                          "Destroying the manager." %
-                          self.tenant_name)
-                self.kill()
+            self._check_recovery_retries()
+
+    def _run_task(self):
+        """Run a single step of the manager on the worker pool
+
+        :return: seconds before the next step, None if the manager is done
+        """
+        if self._stop:
+            return None
+        try:
+            with ratelimit.request_owner(self.tenant_name):
+                if not self._warm:
+                    # tenant subscription is redone upon exception
+                    self._subscribe_tenant()
+                else:
+                    self._check_schedule(time.time())
+                    self._event_loop()
+            self.recovery_retries = None
+            return self.polling_yield
+        except ScheduledReset:
+            self._scheduled_reset()
+            return 0
+        except Exception as e:
+            self._handle_failure(e)
+            self.recovery_retries = self.recovery_retries or utils.Counter()
+            delay = utils.get_backoff_time(TENANT_FAILURE_MAX_WAIT,
+                                           self.recovery_retries.get())
+            self.recovery_retries.increment()
+            self._check_recovery_retries()
+            return None if self._stop else delay
+
+    def _check_schedule(self, now):
+        if now > self.scheduled_reset:
+            raise ScheduledReset()
+        if now > self.refresh_time:
+            self.ac_context.refresh_subscriptions(urls=self.tenant.urls)
+            self.refresh_time = self._schedule_websocket_refresh()
+
+    def _scheduled_reset(self):
+        LOG.info("Scheduled tree reset for root %s", self.tenant_name)
+        try:
+            self._unsubscribe_tenant()
+        except Exception as e:
+            LOG.info("Exception has occurred while unsubscribing tenant %s"
+                     ", error: %s", self.tenant_name, str(e))
+
+    def _handle_failure(self, e):
+        LOG.error("An exception has occurred in thread serving tenant "
+                  "%s, error: %s", self.tenant_name, str(e))
+        LOG.error(traceback.format_exc())
+        try:
+            self._unsubscribe_tenant()
+        except Exception as e:
+            LOG.info("Exception has occurred while unsubscribing tenant %s"
+                     ", error: %s", self.tenant_name, str(e))
+
+    def _check_recovery_retries(self):
+        if self.recovery_retries.get() >= self.max_retries:
+            LOG.error("Exceeded max recovery retries for tenant %s. "
+                      "Destroying the manager.",
+                      self.tenant_name)
+            self.kill()
 
     def _event_loop(self):
         start_time = time.time()
@@ -478,9 +852,17 @@ class AciTenantManager(utils.AIMThread):
         # iteration.
         self._push_aim_resources()
         if self.ac_context.has_event(self.tenant.urls):
+            self._coalesce_events(
+                self.ac_context.get_event_data(self.tenant.urls))
+        if self._pending_events and (
+                not self._warm or not self.event_coalescing_window or
+                time.time() - self._pending_since >=
+                self.event_coalescing_window):
             with utils.get_rlock(lcon.ACI_TREE_LOCK_NAME_PREFIX +
                                  self.tenant_name):
-                events = self.ac_context.get_event_data(self.tenant.urls)
+                events = list(self._pending_events.values())
+                self._reset_pending_events()
+                resync = False
                 for event in events:
                     # REVISIT(ivar): remove vmmDomP once websocket ACI bug is
                     # fixed
@@ -488,21 +870,17 @@ class AciTenantManager(utils.AIMThread):
                                                   'vmmDomP'] and not
                             event[list(event.keys())[0]]['attributes'].get(
                                 STATUS_FIELD)):
-                        LOG.info("Resetting Tree %s" % self.tenant_name)
+                        LOG.info("Resetting Tree %s", self.tenant_name)
                         # REVISIT(ivar): on subscription to VMMPolicy objects,
                         # aci doesn't return the root object itself because of
                         # a bug. Let's craft a fake root to work around this
                         # problem
                         if self.tenant_name.startswith('vmmp-'):
-                            LOG.debug('Faking vmmProvP %s' % self.tenant_name)
+                            LOG.debug('Faking vmmProvP %s', self.tenant_name)
                             events.append({'vmmProvP': {
                                 'attributes': {'dn': self.tenant.dn}}})
-                        # This is a full resync, trees need to be reset
-                        self._state = structured_tree.StructuredHashTree()
-                        self._operational_state = (
-                            structured_tree.StructuredHashTree())
-                        self._monitored_state = (
-                            structured_tree.StructuredHashTree())
+                        # This is a full resync, trees need to be rebuilt
+                        resync = True
                         self.tag_set = set()
                         break
                 # REVISIT(ivar): there's already a debug log in acitoolkit
@@ -516,8 +894,67 @@ class AciTenantManager(utils.AIMThread):
                 events = self._fill_events(events)
                 # Manage Tags
                 events = self.ownership_mgr.filter_ownership(events)
-                self._event_to_tree(events)
-        time.sleep(max(0, self.polling_yield - (time.time() - start_time)))
+                if resync:
+                    self._resync_trees(events)
+                else:
+                    self._event_to_tree(events)
+        self._wait_for_events(start_time)
+
+    def _reset_pending_events(self):
+        self._pending_events = collections.OrderedDict()
+        self._pending_since = None
+
+    def _coalesce_events(self, events):
+        """Add events to the pending ones, keeping one event per DN
+
+        A full object or a deletion replaces the pending event with the same
+        DN, while a modification is merged into it, preserving its status.
+        Events carrying children are never coalesced.
+        """
+        if not self._pending_events:
+            self._pending_since = time.time()
+        suppressed = 0
+        for event in events:
+            resource = list(event.values())[0]
+            attributes = resource.get('attributes', {})
+            dn = attributes.get('dn')
+            if not dn or resource.get(CHILDREN_FIELD):
+                self._pending_events[object()] = event
+                continue
+            previous = self._pending_events.pop(dn, None)
+            if previous is not None:
+                suppressed += 1
+                status = (attributes.get(STATUS_FIELD) or '').lower()
+                if status == converter.MODIFIED_STATUS:
+                    changes = dict(attributes)
+                    changes.pop(STATUS_FIELD)
+                    list(previous.values())[0]['attributes'].update(changes)
+                    event = previous
+            self._pending_events[dn] = event
+        self.event_stats['received'] += len(events)
+        self.event_stats['suppressed'] += suppressed
+        if suppressed:
+            LOG.debug("Suppressed %s superseded events for tenant %s, "
+                      "stats: %s", suppressed, self.tenant_name,
+                      self.event_stats)
+
+    def _wait_for_events(self, start_time):
+        if self._pool:
+            # The worker pool schedules the next iteration
+            return
+        if self.ac_context.dispatcher and self._warm:
+            # Block until events are received, resources need to be pushed
+            # or the next scheduled operation is due.
+            timeout = min(self.scheduled_reset,
+                          self.refresh_time) - time.time()
+            if self._pending_events:
+                timeout = min(timeout, self._pending_since +
+                              self.event_coalescing_window - time.time())
+            self.ac_context.wait_for_events(self.tenant.urls,
+                                            max(0, timeout))
+        else:
+            time.sleep(max(0, self.polling_yield -
+                           (time.time() - start_time)))
 
     def push_aim_resources(self, resources):
         """Given a map of AIM resources for this tenant, push them into APIC
@@ -534,49 +971,38 @@ class AciTenantManager(utils.AIMThread):
         try:
             with utils.get_rlock(lcon.ACI_BACKLOG_LOCK_NAME_PREFIX +
                                  self.tenant_name, blocking=False):
-                backlock = Queue.Queue()
-                while not self.object_backlog.empty():
-                    requests = self.object_backlog.get()
-                    # check if there's an event to squash
-                    for op in ['create', 'delete']:
-                        for i, req in enumerate(requests.get(op, [])):
-                            for j, new in enumerate(resources.get(op, [])):
-                                if op == 'create':
-                                    req_dn = req.dn
-                                    new_dn = new.dn
-                                else:
-                                    # Delete items are in ACI format
-                                    req_dn = list(req.values())[0][
-                                        'attributes']['dn']
-                                    new_dn = list(new.values())[0][
-                                        'attributes']['dn']
-                                if req_dn == new_dn:
-                                    # Replace old with new
-                                    requests[op][i] = new
-                                    break
-                            else:
-                                # No colliding item found
-                                continue
-                            # new can be removed from resources
-                            resources[op].pop(j)
-                    backlock.put(requests)
-                if any(resources.values()):
-                    backlock.put(resources)
-                self.object_backlog = backlock
+                self.object_backlog.put(resources)
+            # Wake up the event loop to push the backlog
+            self.ac_context.notify(self.tenant.urls)
+            if self._pool:
+                self._pool.schedule(self)
         except utils.LockNotAcquired:
             # If changes need to be pushed, AID will do it on the next
             # iteration
             pass
 
-    def _post_with_transaction(self, to_push, modified=False, deleted=False):
+    def _post_with_transaction(self, to_push, modified=False, deleted=False,
+                               container=None):
+        """Post ACI objects in a single transaction
+
+        :param container: (mo, rns) of an existing common parent. When set,
+        the objects are posted as children of the container in a single
+        request.
+        """
         if not to_push:
             return
         dn_mgr = apic_client.DNManager()
         decompose = dn_mgr.aci_decompose_dn_guess
         with self.ac_context.aci_session.transaction(
                 top_send=True) as trs:
+            if container:
+                # The container is expected to exist already, modified
+                # status makes the transaction fail otherwise.
+                getattr(self.ac_context.aci_session, container[0]).create(
+                    *container[1], transaction=trs,
+                    status=converter.MODIFIED_STATUS)
             for obj in to_push:
-                attr = list(obj.values())[0]['attributes']
+                attr = dict(list(obj.values())[0]['attributes'])
                 if modified:
                     attr['status'] = converter.MODIFIED_STATUS
                 elif deleted:
@@ -596,14 +1022,18 @@ class AciTenantManager(utils.AIMThread):
                 request = self.object_backlog.get()
                 for method, aim_objects in list(request.items()):
                     # Method will be either "create" or "delete"
-                    # sort the aim_objects based on DN first for DELETE method
-                    sorted_aim_objs = aim_objects
+                    # sort the aim_objects based on DN, so that parents
+                    # are always pushed first
                     if method == base_universe.DELETE:
                         sorted_aim_objs = sorted(
                             aim_objects,
                             key=lambda x: list(
                                 x.values())[0]['attributes']['dn'])
+                    else:
+                        sorted_aim_objs = sorted(aim_objects,
+                                                 key=lambda x: x.dn)
                     potential_parent_dn = ' '
+                    to_create = []
                     for aim_object in sorted_aim_objs:
                         # get MO from ACI client, identify it via its DN parts
                         # and push the new body
@@ -628,51 +1058,114 @@ class AciTenantManager(utils.AIMThread):
                                 aim_object.pre_existing = True
                             to_push = self.to_aci_converter.convert(
                                 [aim_object])
-                        LOG.debug('%s AIM object %s in APIC' % (
-                                  method, repr(aim_object)))
+                            if self.push_batch_size > 1:
+                                to_create.append((aim_object, to_push))
+                                continue
+                        LOG.debug('%s AIM object %r in APIC',
+                                  method, aim_object)
                         try:
                             if method == base_universe.CREATE:
                                 # Set ownership before pushing the request
                                 to_push = self.ownership_mgr.set_ownership_key(
                                     to_push)
-                                LOG.debug("POSTING into APIC: %s" % to_push)
+                                LOG.debug("POSTING into APIC: %s", to_push)
                                 self._post_with_transaction(to_push)
                             else:
                                 to_delete, to_delete_tag, to_update = (
                                     self.ownership_mgr.set_ownership_change(
                                         to_push))
                                 LOG.debug("DELETING tags from APIC: "
-                                          "%s" % to_delete_tag)
+                                          "%s", to_delete_tag)
                                 # Delete object ownership
                                 for obj in to_delete_tag:
                                     attr = list(obj.values())[0]['attributes']
                                     self.ac_context.aci_session.DELETE(
                                         '/mo/%s.json' % attr.pop('dn'))
-                                LOG.debug("DELETING from APIC: %s" % to_delete)
+                                LOG.debug("DELETING from APIC: %s", to_delete)
                                 self._post_with_transaction(to_delete,
                                                             deleted=True)
-                                LOG.debug("UPDATING in APIC: %s" % to_update)
+                                LOG.debug("UPDATING in APIC: %s", to_update)
                                 # Update object ownership
                                 self._post_with_transaction(to_update,
                                                             modified=True)
                             self.creation_succeeded(aim_object)
                         except Exception as e:
-                            LOG.debug(traceback.format_exc())
-                            LOG.error("An error has occurred during %s for "
-                                      "object %s: %s" % (method, aim_object,
-                                                         str(e)))
-                            if method == base_universe.CREATE:
-                                err_type = (
-                                    self.error_handler.analyze_exception(e))
-                                # REVISIT(ivar): for now, treat UNKNOWN errors
-                                # the same way as OPERATION_TRANSIENT.
-                                # Investigate a way to understand when such
-                                # errors might require agent restart.
-                                self.creation_failed(aim_object, str(e),
-                                                     err_type)
+                            self._push_failed(method, aim_object, e)
+                    self._push_aim_batches(to_create)
+
+    def _push_failed(self, method, aim_object, e):
+        LOG.debug(traceback.format_exc())
+        LOG.error("An error has occurred during %s for "
+                  "object %s: %s", method, aim_object, str(e))
+        if method == base_universe.CREATE:
+            err_type = self.error_handler.analyze_exception(e)
+            # REVISIT(ivar): for now, treat UNKNOWN errors the same way as
+            # OPERATION_TRANSIENT. Investigate a way to understand when such
+            # errors might require agent restart.
+            self.creation_failed(aim_object, str(e), err_type)
+
+    def _push_aim_batches(self, to_create):
+        """Push AIM object creations in size bounded transactions
+
+        Objects sharing the same parent DN are posted together, in batches
+        of at most push_batch_size objects.
+
+        :param to_create: list of (AIM object, converted ACI objects)
+        """
+        dn_mgr = apic_client.DNManager()
+        groups = collections.OrderedDict()
+        for aim_object, to_push in to_create:
+            parent = None
+            try:
+                to_push = self.ownership_mgr.set_ownership_key(to_push)
+                aci_type, attr = list(to_push[0].items())[0]
+                parents = dn_mgr.aci_decompose_dn_guess(
+                    attr['attributes']['dn'], aci_type)[1][:-1]
+                if (parents and parents[-1][0] in
+                        apic_client.ManagedObjectClass.supported_mos):
+                    parent = (parents[-1][0],
+                              tuple(dn_mgr.filter_rns(parents)))
+            except IndexError:
+                # Nothing to post, or nowhere to group it
+                pass
+            except Exception as e:
+                self._push_failed(base_universe.CREATE, aim_object, e)
+                continue
+            groups.setdefault(parent, []).append((aim_object, to_push))
+        for parent, items in list(groups.items()):
+            for i in range(0, len(items), self.push_batch_size):
+                self._push_aim_batch(
+                    parent, items[i:i + self.push_batch_size])
+
+    def _push_aim_batch(self, parent, batch):
+        """Push a batch of AIM objects in a single transaction
+
+        A failed transaction is rejected by APIC as a whole. In that case
+        the batch is bisected until the failing objects are found, so that
+        errors are attributed to the right AIM object.
+        """
+        to_push = []
+        for aim_object, aci_objects in batch:
+            to_push.extend(aci_objects)
+        try:
+            LOG.debug("POSTING into APIC: %s", to_push)
+            self._post_with_transaction(
+                to_push, container=parent if len(batch) > 1 else None)
+        except Exception as e:
+            if len(batch) == 1:
+                self._push_failed(base_universe.CREATE, batch[0][0], e)
+                return
+            LOG.debug("Batch of %s objects failed, bisecting: %s",
+                      len(batch), str(e))
+            half = len(batch) // 2
+            self._push_aim_batch(parent, batch[:half])
+            self._push_aim_batch(parent, batch[half:])
+            return
+        for aim_object, _ in batch:
+            self.creation_succeeded(aim_object)
 
     def _unsubscribe_tenant(self, kill=False):
-        LOG.info("Unsubscribing tenant apic clients %s" % self.tenant_name)
+        LOG.info("Unsubscribing tenant apic clients %s", self.tenant_name)
         self._warm = False
         urls = self.tenant.urls
         if kill:
@@ -680,6 +1173,7 @@ class AciTenantManager(utils.AIMThread):
             self.tenant.urls = self.ac_context.EMPTY_URLS
         self.ac_context.unsubscribe(urls)
         self._reset_object_backlog()
+        self._reset_pending_events()
 
     def _subscribe_tenant(self):
         self.ac_context.subscribe(self.tenant.urls)
@@ -699,6 +1193,36 @@ class AciTenantManager(utils.AIMThread):
         :param events: an ACI event in the form of a list of objects
         :return:
         """
+        if self._update_trees(events, self._state, self._operational_state,
+                              self._monitored_state):
+            event_handler.EventHandler.reconcile()
+
+    def _resync_trees(self, events):
+        """Rebuild the trees from a full snapshot of the tenant
+
+        The snapshot is built into new trees which are then synced into the
+        current ones, so that only the subtrees that actually differ are
+        replaced.
+        :param events: the full tenant state as a list of ACI objects
+        :return:
+        """
+        trees = [structured_tree.StructuredHashTree() for x in range(3)]
+        self._update_trees(events, *trees)
+        modified = False
+        for current, new, readable in zip(
+                [self._state, self._operational_state, self._monitored_state],
+                trees, ["configuration", "operational", "monitored"]):
+            if current.sync(new):
+                modified = True
+                LOG.debug("Resynced %s tree for tenant %s: %s",
+                          readable, self.tenant_name, current)
+        if modified:
+            event_handler.EventHandler.reconcile()
+        else:
+            LOG.info("Tenant %s is in sync after resync", self.tenant_name)
+
+    def _update_trees(self, events, state, operational_state,
+                      monitored_state):
         removed, updated = [], []
         removing_dns = set()
         filtered_events = []
@@ -743,31 +1267,29 @@ class AciTenantManager(utils.AIMThread):
             if not self.ownership_mgr.is_owned_dn(event.dn):
                 event.monitored = True
             if event.dn in removing_dns:
-                LOG.info('ACI event: REMOVED %s' % event)
+                LOG.info('ACI event: REMOVED %s', event)
                 removed.append(event)
             else:
-                LOG.info('ACI event: ADDED %s' % event)
+                LOG.info('ACI event: ADDED %s', event)
                 updated.append(event)
         upd_trees, upd_op_trees, upd_mon_trees = self.tree_builder.build(
             [], updated, removed,
-            {self.tree_builder.CONFIG: {self.tenant_name: self._state},
+            {self.tree_builder.CONFIG: {self.tenant_name: state},
              self.tree_builder.MONITOR:
-                 {self.tenant_name: self._monitored_state},
+                 {self.tenant_name: monitored_state},
              self.tree_builder.OPER:
-                 {self.tenant_name: self._operational_state}})
+                 {self.tenant_name: operational_state}})
 
-        # Send events on update
         modified = False
         for upd, tree, readable in [
-                (upd_trees, self._state, "configuration"),
-                (upd_op_trees, self._operational_state, "operational"),
-                (upd_mon_trees, self._monitored_state, "monitored")]:
+                (upd_trees, state, "configuration"),
+                (upd_op_trees, operational_state, "operational"),
+                (upd_mon_trees, monitored_state, "monitored")]:
             if upd:
                 modified = True
-                LOG.debug("New %s tree for tenant %s: %s" %
-                          (readable, self.tenant_name, tree))
-        if modified:
-            event_handler.EventHandler.reconcile()
+                LOG.debug("New %s tree for tenant %s: %s",
+                          readable, self.tenant_name, tree)
+        return modified
 
     def _fill_events(self, events):
         """Gets incomplete objects from APIC if needed
@@ -793,6 +1315,15 @@ class AciTenantManager(utils.AIMThread):
 
     def retrieve_aci_objects(self, events):
         result = {}
+        keys = []
+        modified = []
+        pending = {}
+
+        def set_result(dn, event):
+            # Overrides the modifications not resolved yet
+            for entry in pending.pop(dn, []):
+                entry[3] = True
+            result[dn] = event
 
         for event in events:
             resource = list(event.values())[0]
@@ -803,11 +1334,8 @@ class AciTenantManager(utils.AIMThread):
                     res_type != FAULT_KEY):
                 # We need to make sure to retrieve the parent object as well
                 try:
-                    decomposed = (
-                        apic_client.DNManager().aci_decompose_dn_guess(
-                            raw_dn, res_type))
-                    parent_dn = apic_client.DNManager().build(
-                        decomposed[1][:-1])
+                    decomposed = utils.decompose_dn_guess(raw_dn, res_type)
+                    parent_dn = utils.build_dn(decomposed[1][:-1])
                     if parent_dn not in result:
                         events.append(
                             {decomposed[1][-2][0]:
@@ -816,56 +1344,83 @@ class AciTenantManager(utils.AIMThread):
                                  'status': converter.MODIFIED_STATUS,
                                  '_avoid_print_not_found': True}}})
                 except (apic_client.DNManager.InvalidNameFormat, KeyError):
-                    LOG.debug("Object with DN %s is not supported." % raw_dn)
+                    LOG.debug("Object with DN %s is not supported.", raw_dn)
                     continue
             if res_type == FAULT_KEY:
                 # Make sure we support the parent object
                 try:
-                    apic_client.DNManager().aci_decompose_dn_guess(raw_dn,
-                                                                   res_type)
+                    utils.decompose_dn_guess(raw_dn, res_type)
                     utils.retrieve_fault_parent(raw_dn, converter.resource_map)
                 except (apic_client.DNManager.InvalidNameFormat, KeyError):
-                    LOG.debug("Fault with DN %s is not supported." % raw_dn)
+                    LOG.debug("Fault with DN %s is not supported.", raw_dn)
                     continue
             if res_type == TAG_KEY:
                 # Add to the result and go ahead to the next object
-                result[raw_dn] = event
+                set_result(raw_dn, event)
                 continue
             if status == converter.DELETED_STATUS:
                 # Add to the result but keep evaluating
-                result[raw_dn] = event
+                set_result(raw_dn, event)
             if status == converter.MODIFIED_STATUS:
-                event_attrs = copy.deepcopy(list(
-                    event.values())[0]['attributes'])
+                event_attrs = dict(list(event.values())[0]['attributes'])
                 event_attrs.pop(STATUS_FIELD)
                 apnf = event_attrs.pop('_avoid_print_not_found', False)
-                if raw_dn in result:
+                updated = raw_dn in result
+                if updated:
                     # Update with changes
                     list(result[raw_dn].values())[0]['attributes'].update(
                         event_attrs)
                 key = tree_manager.AimHashTreeMaker._dn_to_key(res_type,
                                                                raw_dn)
-                data = []
                 if key:
-                    # Search within the TenantManager state, which is the most
-                    # up to date.
-                    data = self.get_resources(
-                        [key], desired_state=self._get_full_state())
-                if not data and not apnf:
-                    LOG.debug("Resource %s not found or not supported", raw_dn)
-                for item in data:
-                    dn = list(item.values())[0]['attributes']['dn']
-                    if dn not in result:
-                        result[dn] = item
-                        if dn == raw_dn:
-                            list(result[raw_dn].values())[
-                                0]['attributes'].update(event_attrs)
+                    keys.append(key)
+                # Resolved once all the events are evaluated
+                entry = [raw_dn, event_attrs, apnf, updated]
+                modified.append(entry)
+                pending.setdefault(raw_dn, []).append(entry)
             if not status or status == converter.CREATED_STATUS:
-                result[raw_dn] = event
-        LOG.debug("Result for retrieving ACI resources: %s\n %s" %
-                  (events, result))
+                set_result(raw_dn, event)
+        self._resolve_modified(result, keys, modified)
+        LOG.debug("Result for retrieving ACI resources: %s\n %s",
+                  events, result)
         return list(result.values())
 
+    def _resolve_modified(self, result, keys, modified):
+        """Fill modified objects from the current state
+
+        All the modified objects are retrieved with a single get_resources
+        call.
+        :param result: dictionary of DN -> ACI object to update
+        :param keys: hash tree keys of the modified objects
+        :param modified: list of (DN, changed attributes, avoid print not
+        found, already applied) in event order
+        """
+        if not modified:
+            return
+        data = {}
+        if keys:
+            # Search within the TenantManager state, which is the most
+            # up to date.
+            for item in self.get_resources(
+                    keys, desired_state=self._get_full_state()):
+                data.setdefault(list(item.values())[0]['attributes']['dn'],
+                                item)
+        for raw_dn, event_attrs, apnf, applied in modified:
+            if raw_dn not in data and not apnf:
+                LOG.debug("Resource %s not found or not supported", raw_dn)
+            if applied:
+                continue
+            if raw_dn not in result:
+                if raw_dn not in data:
+                    continue
+                result[raw_dn] = data[raw_dn]
+            list(result[raw_dn].values())[0]['attributes'].update(
+                event_attrs)
+        # Related objects
+        for dn, item in list(data.items()):
+            if dn not in result:
+                result[dn] = item
+
     @staticmethod
     def flat_events(events):
         # If there are children objects, put them at the top level
@@ -886,7 +1441,7 @@ class AciTenantManager(utils.AIMThread):
                             list(child.keys())[0]]
                     except KeyError:
                         # We don't manage this object type
-                        LOG.debug("Unmanaged object type: %s" % list(
+                        LOG.debug("Unmanaged object type: %s", list(
                             child.keys())[0])
                         continue
 
@@ -905,8 +1460,8 @@ class AciTenantManager(utils.AIMThread):
                 apic_client.DNManager().aci_decompose_dn_guess(
                     dn, type))
         except apic_client.DNManager.InvalidNameFormat:
-            LOG.debug("Type %s with DN %s is not supported." %
-                      (type, dn))
+            LOG.debug("Type %s with DN %s is not supported.",
+                      type, dn)
             return False
         if len(decomposed[1]) <= 1:
             return False
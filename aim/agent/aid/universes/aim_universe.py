@@ -76,7 +76,7 @@ class AimDbUniverse(base.HashTreeStoredUniverse):
         tenants = set(tenants)
         new_state = {}
         if self._served_tenants != tenants:
-            LOG.debug('%s serving tenants: %s' % (self.name, tenants))
+            LOG.debug('%s serving tenants: %s', self.name, tenants)
             self._served_tenants = set(tenants)
         for tenant in self._served_tenants:
             new_state.setdefault(tenant, self._state.get(tenant))
@@ -102,7 +102,7 @@ class AimDbUniverse(base.HashTreeStoredUniverse):
         self._state.update(self.get_optimized_state(context, self.state))
 
     def reset(self, context, tenants):
-        LOG.warning('Reset called for roots %s' % tenants)
+        LOG.warning('Reset called for roots %s', tenants)
         for root in tenants:
             hashtree_db_listener.HashTreeDbListener(
                 self.manager).tt_mgr.set_needs_reset_by_root_rn(context, root)
@@ -192,8 +192,8 @@ class AimDbUniverse(base.HashTreeStoredUniverse):
                            (method, resource, str(e)))
                     LOG.warning(msg)
                 except Exception as e:
-                    LOG.error("Failed to %s object %s in AIM: %s." %
-                              (method, resource, str(e)))
+                    LOG.error("Failed to %s object %s in AIM: %s.",
+                              method, resource, str(e))
                     LOG.debug(traceback.format_exc())
                     if method == 'delete':
                         self.deletion_failed(context, resource)
@@ -217,8 +217,8 @@ class AimDbUniverse(base.HashTreeStoredUniverse):
             else:
                 self.manager.delete(context, resource)
         else:
-            LOG.debug("%s object in AIM %s" %
-                      (method, resource))
+            LOG.debug("%s object in AIM %s",
+                      method, resource)
             if method == 'create':
                 if monitored:
                     # We need two more conversions to screen out
@@ -259,8 +259,8 @@ class AimDbUniverse(base.HashTreeStoredUniverse):
                 if isinstance(resource, aim_resource.AciRoot) and monitored:
                     # Monitored Universe doesn't delete Tenant
                     # Resources
-                    LOG.info('%s skipping delete for object %s' %
-                             (self.name, resource))
+                    LOG.info('%s skipping delete for object %s',
+                             self.name, resource)
                     return
                 if monitored:
                     # Only delete a resource if monitored
@@ -282,24 +282,26 @@ class AimDbUniverse(base.HashTreeStoredUniverse):
         all_modified_keys = set(raw_diff[base.CREATE])
         keys_to_sync = all_modified_keys - set(pending_nodes)
         aim_to_sync = self.get_resources(list(keys_to_sync))
-        for obj in aim_to_sync:
-            self.manager.set_resource_sync_pending(context, obj)
+        return self.manager.set_resources_sync_pending(context, aim_to_sync)
 
     def _set_synced_state(self, context, raw_diff, unsynced_nodes, skip_keys):
         all_modified_keys = set(raw_diff[base.CREATE] + raw_diff[base.DELETE])
         keys_to_sync = (set(unsynced_nodes) - all_modified_keys) - skip_keys
         aim_to_sync = self.get_resources(list(keys_to_sync))
-        for obj in aim_to_sync:
-            self.manager.set_resource_sync_synced(context, obj)
+        return self.manager.set_resources_sync_synced(context, aim_to_sync)
 
     def update_status_objects(self, context, tenant_state, raw_diff,
                               skip_keys):
         # AIM Config Universe is the desired state
         pending_nodes, na_nodes = self._get_state_pending_na_nodes(
             tenant_state)
-        self._set_sync_pending_state(context, raw_diff, pending_nodes)
-        self._set_synced_state(context, raw_diff, pending_nodes + na_nodes,
-                               skip_keys)
+        pending = self._set_sync_pending_state(context, raw_diff,
+                                               pending_nodes)
+        synced = self._set_synced_state(context, raw_diff,
+                                        pending_nodes + na_nodes, skip_keys)
+        if pending or synced:
+            LOG.debug("%s set %s statuses pending and %s synced for %s",
+                      self.name, pending, synced, tenant_state.root_key)
 
     def _action_items_to_aim_resources(self, actions, action):
         if action == base.DELETE:
@@ -423,8 +425,8 @@ class AimDbMonitoredUniverse(AimDbUniverse):
                 list(aci_object.keys())[0],
                 list(aci_object.values())[0]['attributes']['dn'])
             if len(key) == 1:
-                LOG.debug('Skipping delete for monitored root object: %s '
-                          % aci_object)
+                LOG.debug('Skipping delete for monitored root object: %s ',
+                          aci_object)
                 return
             if not node or node.dummy:
                 result.append(aci_object)
@@ -19,7 +19,6 @@ import six
 import time
 import traceback
 
-from apicapi import apic_client
 from oslo_log import log as logging
 
 from aim.agent.aid.universes.aci import converter
@@ -314,7 +313,7 @@ class HashTreeStoredUniverse(AimUniverse):
             if mo_type == 'faultInst':
                 fault_code = key_parts[-1][1]
                 key_parts = key_parts[:-1]
-            dn = apic_client.DNManager().build(key_parts)
+            dn = utils.build_dn(key_parts)
             if fault_code:
                 dn += '/fault-%s' % fault_code
                 aci_object[mo_type]['attributes']['code'] = fault_code
@@ -388,8 +387,8 @@ class HashTreeStoredUniverse(AimUniverse):
                                                                  tenant)
                 if (self._sync_log.get(tenant, {}).get('create') or
                         self._sync_log.get(tenant, {}).get('delete')):
-                    LOG.debug('Sync log cache for %s (%s): %s' %
-                              (self.name, tenant, self._sync_log))
+                    LOG.debug('Sync log cache for %s (%s): %s',
+                              self.name, tenant, self._sync_log)
 
                 if reset:
                     self.reset(context, [tenant])
@@ -443,7 +442,7 @@ class HashTreeStoredUniverse(AimUniverse):
                     delete_candidates.remove(tenant)
             except Exception as e:
                 LOG.error("An unexpected error has occurred while "
-                          "reconciling tenant %s: %s" % (tenant, str(e)))
+                          "reconciling tenant %s: %s", tenant, str(e))
                 LOG.error(traceback.format_exc())
                 # Guess we can't consider the multiverse synced if this happens
                 diff = True
@@ -503,14 +502,14 @@ class HashTreeStoredUniverse(AimUniverse):
                 id_set.add(key)
         if resource_keys:
             result = self._convert_get_resources_result(result, monitored_set)
-            LOG.debug("Result for keys %s\n in %s:\n %s" %
-                      (resource_keys, self.name, result))
+            LOG.debug("Result for keys %s\n in %s:\n %s",
+                      resource_keys, self.name, result)
         return result
 
     def _get_resources_for_delete(self, resource_keys, mon_uni, action):
         if resource_keys:
             LOG.debug("Requesting resource keys in %s for "
-                      "delete: %s" % (self.name, resource_keys))
+                      "delete: %s", self.name, resource_keys)
         result = []
         for key in resource_keys:
             aci_object = self._keys_to_bare_aci_objects([key])[0]
@@ -522,8 +521,8 @@ class HashTreeStoredUniverse(AimUniverse):
                 node = None
             action(result, aci_object, node)
         if resource_keys:
-            LOG.debug("Result for keys %s\n in ACI Universe for delete:\n %s" %
-                      (resource_keys, result))
+            LOG.debug("Result for keys %s\n in ACI Universe for delete:\n %s",
+                      resource_keys, result)
         return result
 
     def _fill_node(self, current_key, desired_state):
@@ -647,8 +646,8 @@ class HashTreeStoredUniverse(AimUniverse):
                 if curr_time < curr['next']:
                     # Let's not make any consideration about this object
                     LOG.debug("AIM object %s is being re-tried too soon "
-                              "(delta: %s secs). Skipping for now." %
-                              (str(res), curr['next'] - curr_time))
+                              "(delta: %s secs). Skipping for now.",
+                              res, curr['next'] - curr_time)
                     skip.append((action, res))
                     continue
 
@@ -658,15 +657,15 @@ class HashTreeStoredUniverse(AimUniverse):
                 if curr['retries'] > curr['limit']:
                     if curr['action'] == ACTION_RESET:
                         LOG.warning("AIM object %s failed %s more than %s "
-                                    "times, resetting its root" %
-                                    (str(res), action, curr['retries']))
+                                    "times, resetting its root",
+                                    str(res), action, curr['retries'])
                         reset = True
                         curr['limit'] = self.purge_retry_limit
                         curr['action'] = ACTION_PURGE
                     else:
                         LOG.warning("AIM object %s failed %s more than %s "
-                                    "times, going to ERROR state" %
-                                    (str(res), action, curr['retries']))
+                                    "times, going to ERROR state",
+                                    str(res), action, curr['retries'])
                         curr['limit'] += 5
                         fail.append((action, res))
         self._sync_log[root] = new_state
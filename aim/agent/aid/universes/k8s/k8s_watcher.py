@@ -439,7 +439,7 @@ class K8sWatcher(object):
 
     def _cleanup_status(self, aim_res):
         if isinstance(aim_res, resource.AciResourceBase):
-            LOG.debug("Cleanup status for AIM resource: %s" % aim_res)
+            LOG.debug("Cleanup status for AIM resource: %s", aim_res)
             status = self.mgr.get_status(self.ctx, aim_res,
                                          create_if_absent=False)
             if status:
@@ -27,6 +27,12 @@ from aim import exceptions as exc
 
 
 LOG = logging.getLogger(__name__)
+# Maximum number of resources looked up by a single bulk query
+BULK_QUERY_SIZE = 500
+# Statuses left alone when a parent or child goes pending
+SYNC_PENDING_EXCLUDE = [api_status.AciStatus.SYNCED,
+                        api_status.AciStatus.SYNC_PENDING,
+                        api_status.AciStatus.SYNC_NA]
 
 
 class AimManager(object):
@@ -166,38 +172,44 @@ class AimManager(object):
         self._validate_resource_class(resource)
         with context.store.begin(subtransactions=True):
             old_db_obj = None
-            old_monitored = None
-            new_monitored = None
             if overwrite:
                 old_db_obj = self._query_db_obj(context.store, resource)
-                if old_db_obj:
-                    old_monitored = getattr(old_db_obj, 'monitored', None)
-                    new_monitored = getattr(resource, 'monitored', None)
-                    if (fix_ownership and old_monitored is not None and
-                            old_monitored != new_monitored):
-                        raise exc.InvalidMonitoredStateUpdate(object=resource)
-                    attr_val = context.store.extract_attributes(resource,
-                                                                "other")
-                    old_resource = self._make_resource(context, resource,
-                                                       old_db_obj)
-                    if old_resource.user_equal(resource):
-                        # No need to update. Return old_resource for
-                        # updated DB attributes
-                        return old_resource
-                    context.store.from_attr(old_db_obj, type(resource),
-                                            attr_val)
-            db_obj = old_db_obj or context.store.make_db_obj(resource)
-            context.store.add(db_obj)
-            if self._should_set_pending(old_db_obj, old_monitored,
-                                        new_monitored):
-                # NOTE(ivar): we shouldn't change status in the AIM manager
-                # as this goes against the "AIM as a schema" principles.
-                # However, we need to do this at least for cases where
-                # we take ownership of the objects, which should be removed
-                # soon as it's causing most of our bugs.
-                self.set_resource_sync_pending(context, resource)
+            unchanged = self._create_db_obj(context, resource, old_db_obj,
+                                            fix_ownership)[1]
+            if unchanged:
+                # No need to update. Return old_resource for
+                # updated DB attributes
+                return unchanged
             return self.get(context, resource)
 
+    @utils.log
+    def create_bulk(self, context, resources, overwrite=False,
+                    fix_ownership=False):
+        """Persist many AIM resources to the database.
+
+        Same as calling create() on each of the resources, but existing
+        objects are fetched with one query per resource type and the
+        results are not read back from the database one by one.
+        Returns the list of stored resources, in the same order as
+        'resources'.
+        """
+        for resource in resources:
+            self._validate_resource_class(resource)
+        with context.store.begin(subtransactions=True):
+            db_objs = {}
+            if overwrite:
+                db_objs = self._query_db_objs(context, resources)
+            result = []
+            for resource in resources:
+                key = (type(resource), tuple(resource.identity))
+                db_obj, unchanged = self._create_db_obj(
+                    context, resource,
+                    db_objs.get(key) if overwrite else None, fix_ownership)
+                # A resource might appear more than once
+                db_objs[key] = db_obj
+                result.append(unchanged or db_obj)
+            return self._make_bulk_result(context, resources, result)
+
     @utils.log
     def update(self, context, resource, fix_ownership=False,
                force_update=False, **update_attr_val):
@@ -214,38 +226,138 @@ class AimManager(object):
         with context.store.begin(subtransactions=True):
             db_obj = self._query_db_obj(context.store, resource)
             if db_obj:
-                old_resource = self._make_resource(context, resource, db_obj)
-                old_monitored = getattr(db_obj, 'monitored', None)
-                new_monitored = update_attr_val.get('monitored')
-                if (fix_ownership and old_monitored is not None and
-                        old_monitored != new_monitored):
-                    raise exc.InvalidMonitoredStateUpdate(object=resource)
-                attr_val = {k: v for k, v in list(update_attr_val.items())
-                            if k in list(resource.other_attributes.keys())}
-                if attr_val:
-                    old_resource_copy = copy.deepcopy(old_resource)
-                    for k, v in list(attr_val.items()):
-                        setattr(old_resource, k, v)
-                    if old_resource.user_equal(
-                            old_resource_copy) and not force_update:
-                        # Nothing to do here
-                        return old_resource
-                elif resource.identity_attributes:
-                    # force update
-                    id_attr_0 = list(resource.identity_attributes.keys())[0]
-                    attr_val = {id_attr_0: getattr(resource, id_attr_0)}
-                context.store.from_attr(db_obj, type(resource), attr_val)
-                context.store.add(db_obj)
-                if self._should_set_pending(db_obj, old_monitored,
-                                            new_monitored):
-                    # NOTE(ivar): we shouldn't change status in the AIM manager
-                    # as this goes against the "AIM as a schema" principles.
-                    # However, we need to do this at least for cases where
-                    # we take ownership of the objects, which should be removed
-                    # soon as it's causing most of our bugs.
-                    self.set_resource_sync_pending(context, resource)
+                unchanged = self._update_db_obj(
+                    context, resource, db_obj, fix_ownership, force_update,
+                    update_attr_val)
+                if unchanged:
+                    return unchanged
                 return self.get(context, resource)
 
+    @utils.log
+    def update_bulk(self, context, updates, fix_ownership=False,
+                    force_update=False):
+        """Persist updates to many AIM resources to the database.
+
+        Parameter 'updates' is a list of (resource, update_attr_val) pairs,
+        each one handled as update(context, resource, **update_attr_val)
+        would, but existing objects are fetched with one query per resource
+        type and the results are not read back from the database one by
+        one. Returns the list of updated resources, in the same order as
+        'updates', with None for the resources that don't exist.
+        """
+        for resource, _ in updates:
+            self._validate_resource_class(resource)
+        with context.store.begin(subtransactions=True):
+            db_objs = self._query_db_objs(
+                context, [resource for resource, _ in updates])
+            result = []
+            for resource, update_attr_val in updates:
+                db_obj = db_objs.get((type(resource),
+                                      tuple(resource.identity)))
+                if db_obj:
+                    db_obj = self._update_db_obj(
+                        context, resource, db_obj, fix_ownership,
+                        force_update, update_attr_val) or db_obj
+                result.append(db_obj)
+            return self._make_bulk_result(
+                context, [resource for resource, _ in updates], result)
+
+    def _create_db_obj(self, context, resource, old_db_obj, fix_ownership):
+        """Create the DB object of a resource, or overwrite old_db_obj
+
+        Returns the DB object and, when old_db_obj was already up to date
+        and has been left untouched, the resource it stores.
+        """
+        old_monitored = None
+        new_monitored = None
+        if old_db_obj:
+            old_monitored = getattr(old_db_obj, 'monitored', None)
+            new_monitored = getattr(resource, 'monitored', None)
+            if (fix_ownership and old_monitored is not None and
+                    old_monitored != new_monitored):
+                raise exc.InvalidMonitoredStateUpdate(object=resource)
+            attr_val = context.store.extract_attributes(resource, "other")
+            old_resource = self._make_resource(context, resource, old_db_obj)
+            if old_resource.user_equal(resource):
+                return old_db_obj, old_resource
+            context.store.from_attr(old_db_obj, type(resource), attr_val)
+        db_obj = old_db_obj or context.store.make_db_obj(resource)
+        context.store.add(db_obj)
+        if self._should_set_pending(old_db_obj, old_monitored,
+                                    new_monitored):
+            # NOTE(ivar): we shouldn't change status in the AIM manager
+            # as this goes against the "AIM as a schema" principles.
+            # However, we need to do this at least for cases where
+            # we take ownership of the objects, which should be removed
+            # soon as it's causing most of our bugs.
+            self.set_resource_sync_pending(context, resource)
+        return db_obj, None
+
+    def _update_db_obj(self, context, resource, db_obj, fix_ownership,
+                       force_update, update_attr_val):
+        """Update the DB object of a resource
+
+        Returns the stored resource when there was nothing to update.
+        """
+        old_resource = self._make_resource(context, resource, db_obj)
+        old_monitored = getattr(db_obj, 'monitored', None)
+        new_monitored = update_attr_val.get('monitored')
+        if (fix_ownership and old_monitored is not None and
+                old_monitored != new_monitored):
+            raise exc.InvalidMonitoredStateUpdate(object=resource)
+        attr_val = {k: v for k, v in list(update_attr_val.items())
+                    if k in list(resource.other_attributes.keys())}
+        if attr_val:
+            old_resource_copy = copy.deepcopy(old_resource)
+            for k, v in list(attr_val.items()):
+                setattr(old_resource, k, v)
+            if old_resource.user_equal(
+                    old_resource_copy) and not force_update:
+                # Nothing to do here
+                return old_resource
+        elif resource.identity_attributes:
+            # force update
+            id_attr_0 = list(resource.identity_attributes.keys())[0]
+            attr_val = {id_attr_0: getattr(resource, id_attr_0)}
+        context.store.from_attr(db_obj, type(resource), attr_val)
+        context.store.add(db_obj)
+        if self._should_set_pending(db_obj, old_monitored, new_monitored):
+            # NOTE(ivar): we shouldn't change status in the AIM manager
+            # as this goes against the "AIM as a schema" principles.
+            # However, we need to do this at least for cases where
+            # we take ownership of the objects, which should be removed
+            # soon as it's causing most of our bugs.
+            self.set_resource_sync_pending(context, resource)
+
+    def _query_db_objs(self, context, resources):
+        """DB objects of many resources, by resource type and identity"""
+        by_klass = {}
+        for resource in resources:
+            by_klass.setdefault(type(resource), []).append(resource)
+        result = {}
+        for klass, klass_resources in list(by_klass.items()):
+            for index in range(0, len(klass_resources), BULK_QUERY_SIZE):
+                chunk = klass_resources[index:index + BULK_QUERY_SIZE]
+                # Objects matching every identity attribute separately are a
+                # superset of the ones we are looking for.
+                in_ = dict((k, list(set(getattr(x, k) for x in chunk)))
+                           for k in klass.identity_attributes)
+                for db_obj in (self._query_db(context.store, klass,
+                                              in_=in_) or []):
+                    res = context.store.make_resource(klass, db_obj)
+                    result[(klass, tuple(res.identity))] = db_obj
+        return result
+
+    def _make_bulk_result(self, context, resources, db_objs_or_resources):
+        # Make sure defaults computed by the backend are in place
+        context.store.flush()
+        result = []
+        for resource, obj in zip(resources, db_objs_or_resources):
+            if obj is not None and not isinstance(obj, api_res.ResourceBase):
+                obj = self._make_resource(context, resource, obj)
+            result.append(obj)
+        return result
+
     def _should_set_pending(self, old_obj, old_monitored, new_monitored):
         return old_obj and old_monitored is False and new_monitored is True
 
@@ -392,6 +504,52 @@ class AimManager(object):
         with context.store.begin(subtransactions=True):
             return context.store.query_statuses(resources)
 
+    def get_statuses_with_faults(self, context, resources):
+        """Get status and faults of many AIM resources at once.
+
+        Returns a list with the status of each resource in 'resources',
+        in the same order, or None for resources that have no status.
+        Faults are set on each status as with get_status, but statuses are
+        never created. AIM IDs, statuses and faults are retrieved with a
+        constant number of queries rather than a few per resource.
+        """
+        result = [None] * len(resources)
+        with context.store.begin(subtransactions=True):
+            keys = [(type(resource).__name__, aim_id) if aim_id else None
+                    for resource, aim_id in zip(
+                        resources, self._get_aim_ids(context, resources))]
+            statuses = {}
+            aim_ids = list(set(key[1] for key in keys if key))
+            for index in range(0, len(aim_ids), BULK_QUERY_SIZE):
+                for db_obj in self._query_db(
+                        context.store, api_status.AciStatus,
+                        in_={'resource_id':
+                             aim_ids[index:index + BULK_QUERY_SIZE]}) or []:
+                    status = context.store.make_resource(
+                        api_status.AciStatus, db_obj)
+                    status.faults = []
+                    statuses[(status.resource_type,
+                              status.resource_id)] = status
+            by_id = dict((status.id, status)
+                         for status in list(statuses.values()))
+            status_ids = list(by_id.keys())
+            for index in range(0, len(status_ids), BULK_QUERY_SIZE):
+                for db_obj in self._query_db(
+                        context.store, api_status.AciFault,
+                        in_={'status_id':
+                             status_ids[index:index + BULK_QUERY_SIZE]}) or []:
+                    fault = context.store.make_resource(
+                        api_status.AciFault, db_obj)
+                    by_id[fault.status_id].faults.append(fault)
+            seen = set()
+            for index, key in enumerate(keys):
+                if key in statuses:
+                    # Repeated resources get their own copy of the status
+                    result[index] = (copy.deepcopy(statuses[key])
+                                     if key in seen else statuses[key])
+                    seen.add(key)
+        return result
+
     @utils.log
     def update_status(self, context, resource, status):
         """Update the status of an AIM resource.
@@ -408,6 +566,29 @@ class AimManager(object):
                     status.resource_id = res_id
                     return self.create(context, status, overwrite=True)
 
+    def _get_aim_ids(self, context, resources):
+        """AIM IDs of many resources, or None if they have no status"""
+        aim_ids = []
+        missing = []
+        for resource in resources:
+            aim_id = None
+            if isinstance(resource, api_res.AciResourceBase):
+                aim_id = getattr(resource, '_injected_aim_id',
+                                 getattr(resource, '_aim_id', None))
+                if not aim_id:
+                    missing.append(resource)
+            aim_ids.append(aim_id)
+        if missing:
+            db_objs = self._query_db_objs(context, missing)
+            for index, resource in enumerate(resources):
+                if aim_ids[index] or not isinstance(
+                        resource, api_res.AciResourceBase):
+                    continue
+                db_obj = db_objs.get(
+                    (type(resource), tuple(resource.identity)))
+                aim_ids[index] = getattr(db_obj, 'aim_id', None)
+        return aim_ids
+
     def _set_resource_sync(self, context, resource, sync_status, message='',
                            exclude=None):
         if isinstance(resource, api_status.AciStatus):
@@ -422,8 +603,77 @@ class AimManager(object):
                 return True
             return False
 
+    def _set_resources_sync(self, context, resources, sync_status,
+                            message='', exclude=None):
+        """Set the sync status of many resources at once.
+
+        Same as calling _set_resource_sync on each resource, missing
+        statuses included, but statuses are read, created and updated with
+        a few statements for all of them. Returns the resources whose
+        status changed.
+        """
+        exclude = exclude or []
+        resources = [x for x in resources
+                     if not isinstance(x, api_status.AciStatus)]
+        for resource in resources:
+            self._validate_resource_class(resource)
+        aim_ids = self._get_aim_ids(context, resources)
+        statuses = {}
+        found_ids = list(set(x for x in aim_ids if x))
+        for index in range(0, len(found_ids), BULK_QUERY_SIZE):
+            for db_obj in self._query_db(
+                    context.store, api_status.AciStatus,
+                    in_={'resource_id':
+                         found_ids[index:index + BULK_QUERY_SIZE]}) or []:
+                status = context.store.make_resource(api_status.AciStatus,
+                                                     db_obj)
+                statuses[tuple(status.identity)] = status
+        missing = []
+        changed = []
+        changed_ids = []
+        seen = set()
+        for resource, aim_id in zip(resources, aim_ids):
+            if not aim_id:
+                continue
+            status = api_status.AciStatus(
+                resource_type=type(resource).__name__, resource_id=aim_id,
+                resource_root=resource.root, resource_dn=resource.dn)
+            key = tuple(status.identity)
+            if key not in statuses:
+                statuses[key] = status
+                missing.append(status)
+            if statuses[key].sync_status not in exclude and key not in seen:
+                seen.add(key)
+                changed.append(resource)
+                changed_ids.append(aim_id)
+        if missing:
+            self.create_bulk(context, missing)
+        for index in range(0, len(changed_ids), BULK_QUERY_SIZE):
+            context.store.update_all(
+                api_status.AciStatus,
+                filters={'in_': {'resource_id':
+                                 changed_ids[index:index + BULK_QUERY_SIZE]},
+                         'notin_': {'sync_status': exclude}},
+                sync_status=sync_status, sync_message=message)
+        return changed
+
     def set_resource_sync_synced(self, context, resource):
-        self._set_resource_sync(context, resource, api_status.AciStatus.SYNCED)
+        return self._set_resource_sync(context, resource,
+                                       api_status.AciStatus.SYNCED)
+
+    def set_resources_sync_synced(self, context, resources):
+        """Set many resources as synced.
+
+        Statuses already synced are left alone. Returns the number of
+        statuses changed.
+        """
+        with context.store.begin(subtransactions=True):
+            if 'sql' in context.store.features:
+                return len(self._set_resources_sync(
+                    context, resources, api_status.AciStatus.SYNCED,
+                    exclude=[api_status.AciStatus.SYNCED]))
+            return len([x for x in resources
+                        if self.set_resource_sync_synced(context, x)])
 
     def recover_root_errors(self, context, root):
         with context.store.begin(subtransactions=True):
@@ -443,24 +693,56 @@ class AimManager(object):
             # propagation
             if self._set_resource_sync(
                     context, resource, api_status.AciStatus.SYNC_PENDING,
-                    exclude=[api_status.AciStatus.SYNCED,
-                             api_status.AciStatus.SYNC_PENDING,
-                             api_status.AciStatus.SYNC_NA]
+                    exclude=SYNC_PENDING_EXCLUDE
                     if not top else [api_status.AciStatus.SYNC_PENDING]):
+                if 'sql' in context.store.features:
+                    self._propagate_sync_pending(context, resource, cascade)
+                    return True
                 # Change parent first
-                parent_klass = resource._tree_parent
-                if parent_klass:
-                    identity = {v: resource.identity[i]
-                                for i, v in enumerate(
-                        parent_klass.identity_attributes)}
-                    self.set_resource_sync_pending(context,
-                                                   parent_klass(**identity),
-                                                   top=False)
+                parent = self._get_tree_parent(resource)
+                if parent:
+                    self.set_resource_sync_pending(context, parent, top=False)
                 if cascade:
                     for child_res in self.get_subtree(context, resource):
                         self.set_resource_sync_pending(context, child_res,
                                                        top=False,
                                                        cascade=False)
+                return True
+            return False
+
+    def set_resources_sync_pending(self, context, resources):
+        """Set many resources as pending.
+
+        Same as calling set_resource_sync_pending on each resource, except
+        that all statuses change before any propagation takes place. Returns
+        the number of statuses changed, not counting propagation.
+        """
+        with context.store.begin(subtransactions=True):
+            if 'sql' not in context.store.features:
+                return len([x for x in resources
+                            if self.set_resource_sync_pending(context, x)])
+            changed = self._set_resources_sync(
+                context, resources, api_status.AciStatus.SYNC_PENDING,
+                exclude=[api_status.AciStatus.SYNC_PENDING])
+            for resource in changed:
+                self._propagate_sync_pending(context, resource, True)
+            return len(changed)
+
+    def _propagate_sync_pending(self, context, resource, cascade):
+        # Same outcome as the recursion above: parents in error go pending
+        # up to the first one that isn't, and each of them cascades to its
+        # subtree. Subtrees nest, so only the highest one needs updating.
+        top_resource = resource if cascade else None
+        parent = self._get_tree_parent(resource)
+        while parent and self._set_resource_sync(
+                context, parent, api_status.AciStatus.SYNC_PENDING,
+                exclude=SYNC_PENDING_EXCLUDE):
+            top_resource = parent
+            parent = self._get_tree_parent(parent)
+        if top_resource:
+            self._set_subtree_sync(context, top_resource,
+                                   api_status.AciStatus.SYNC_PENDING,
+                                   exclude=SYNC_PENDING_EXCLUDE)
 
     def set_resource_sync_error(self, context, resource, message='', top=True):
         with context.store.begin(subtransactions=True):
@@ -470,11 +752,34 @@ class AimManager(object):
                     message=message,
                     exclude=[api_status.AciStatus.SYNC_FAILED]) and top:
                 # Set sync_error for the whole subtree
+                message = "Parent resource %s is in error state" % str(
+                    resource)
+                if 'sql' in context.store.features:
+                    self._set_subtree_sync(
+                        context, resource, api_status.AciStatus.SYNC_FAILED,
+                        message=message,
+                        exclude=[api_status.AciStatus.SYNC_FAILED])
+                    return
                 for child_res in self.get_subtree(context, resource):
                     self.set_resource_sync_error(
-                        context, child_res,
-                        message="Parent resource %s is "
-                                "in error state" % str(resource), top=False)
+                        context, child_res, message=message, top=False)
+
+    def _set_subtree_sync(self, context, resource, sync_status, message='',
+                          exclude=None):
+        """Set the sync status of the subtree of a resource."""
+        self._set_resources_sync(
+            context, self._get_subtree(context, type(resource),
+                                       *resource.identity,
+                                       include_aim_id=True),
+            sync_status, message=message, exclude=exclude)
+
+    def _get_tree_parent(self, resource):
+        parent_klass = resource._tree_parent
+        if parent_klass:
+            identity = {v: resource.identity[i]
+                        for i, v in enumerate(
+                parent_klass.identity_attributes)}
+            return parent_klass(**identity)
 
     @utils.log
     def set_fault(self, context, resource, fault):
@@ -531,7 +836,7 @@ class AimManager(object):
             res_id = db_obj.aim_id
         except AttributeError:
             LOG.warning("Resource with type %s doesn't support"
-                        "status" % res_type)
+                        "status", res_type)
             return None, None
         return res_type, res_id
 
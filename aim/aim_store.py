@@ -17,9 +17,10 @@ from contextlib import contextmanager
 import copy
 from oslo_log import log as logging
 import six
-from sqlalchemy import and_
 from sqlalchemy import event as sa_event
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy import or_
+from sqlalchemy import tuple_
 from sqlalchemy.sql.expression import func
 
 from aim.agent.aid.event_services import rpc
@@ -54,7 +55,9 @@ class AimStore(object):
 
     _features = []
     _update_listeners = {}
+    _update_listener_types = {}
     _postcommit_listeners = {}
+    _postcommit_listener_types = {}
 
     def __init__(self):
         pass
@@ -84,6 +87,10 @@ class AimStore(object):
         # Expunge transaction artifacts if supported
         pass
 
+    def flush(self):
+        # Write pending changes to the backend, if applicable
+        pass
+
     def resource_to_db_type(self, resource_klass):
         # Returns the DB object type for an AIM resource type
         return resource_klass
@@ -136,7 +143,8 @@ class AimStore(object):
     def query_statuses(self, resources):
         raise NotImplementedError('query_statuses not implemented')
 
-    def register_before_session_flush_callback(self, name, func):
+    def register_before_session_flush_callback(self, name, func,
+                                               resource_types=None):
         """Register callback for update to AIM objects.
 
         Parameter 'func' should be a function that accepts 4 parameters.
@@ -145,6 +153,8 @@ class AimStore(object):
         that were added, updated and deleted respectively.
         If the store supports transaction, the callback will be invoked
         before the transaction that updated the AIM object commits.
+        When 'resource_types' is set, only AIM resources that are instances
+        of those classes are passed to the callback.
 
         Example:
 
@@ -158,18 +168,35 @@ class AimStore(object):
         """
         if name not in self._update_listeners:
             self._update_listeners[name] = func
+            self._update_listener_types[name] = (
+                tuple(resource_types) if resource_types else None)
 
     def unregister_before_session_flush_callback(self, name):
         """Remove callback for update to AIM objects."""
         self._update_listeners.pop(name, None)
-
-    def register_after_transaction_ends_callback(self, name, func):
+        self._update_listener_types.pop(name, None)
+
+    def register_after_transaction_ends_callback(self, name, func,
+                                                 resource_types=None):
+        """Register callback for committed updates to AIM objects.
+
+        Parameter 'func' should be a function that accepts 3 parameters,
+        the lists of AIM resources that were added, updated and deleted
+        by the transaction. Resources reflect the state of the objects
+        after their last flush, an object changed by several flushes is
+        only reported once per list.
+        When 'resource_types' is set, only AIM resources that are instances
+        of those classes are passed to the callback.
+        """
         if name not in self._postcommit_listeners:
             self._postcommit_listeners[name] = func
+            self._postcommit_listener_types[name] = (
+                tuple(resource_types) if resource_types else None)
 
     def unregister_after_transaction_ends_callback(self, name):
         """Remove callback for update to AIM objects."""
         self._postcommit_listeners.pop(name, None)
+        self._postcommit_listener_types.pop(name, None)
 
     def extract_attributes(self, resource, attr_type=None):
         val = {}
@@ -334,7 +361,8 @@ class SqlAlchemyStore(AimStore):
             ht_db_l.HashTreeDbListener(aim_manager.AimManager()).on_commit)
         self.register_after_transaction_ends_callback(
             'tree_creation_postcommit',
-            rpc.AIDEventRpcApi().tree_creation_postcommit)
+            rpc.AIDEventRpcApi().tree_creation_postcommit,
+            resource_types=(api_tree.TypeTreeBase, api_tree.ActionLog))
 
     @property
     def name(self):
@@ -357,6 +385,9 @@ class SqlAlchemyStore(AimStore):
     def add(self, db_obj):
         self.db_session.add(db_obj)
 
+    def flush(self):
+        self.db_session.flush()
+
     def delete(self, db_obj):
         self.db_session.delete(db_obj)
 
@@ -393,18 +424,26 @@ class SqlAlchemyStore(AimStore):
             return []
         db_ids_by_type = {}
         for res in resources:
-            db_ids_by_type.setdefault(self.db_model_map[type(res)], []).append(
-                self.extract_attributes(res, "id"))
+            db_ids_by_type.setdefault(
+                (self.db_model_map[type(res)],
+                 tuple(type(res).identity_attributes)), set()).add(
+                tuple(res.identity))
         query = self.db_session.query(status_model.Status)
         in_query = []
-        for klass in db_ids_by_type:
-            subq = self.db_session.query(getattr(klass, 'aim_id'))
-            subq = subq.filter(
-                or_(*[
-                    and_(*[getattr(klass, k) == v
-                           for k, v in list(ids.items())])
-                    for ids in db_ids_by_type[klass]]))
-            in_query.append(subq)
+        for (klass, id_attrs), ids in list(db_ids_by_type.items()):
+            # Match identities with a tuple IN rather than an OR of
+            # per-resource clauses, which gets too large to compile.
+            if len(id_attrs) == 1:
+                column = getattr(klass, id_attrs[0])
+                ids = [x[0] for x in ids]
+            else:
+                column = tuple_(*[getattr(klass, k) for k in id_attrs])
+                ids = list(ids)
+            for index in range(0, len(ids), aim_manager.BULK_QUERY_SIZE):
+                subq = self.db_session.query(getattr(klass, 'aim_id'))
+                subq = subq.filter(column.in_(
+                    ids[index:index + aim_manager.BULK_QUERY_SIZE]))
+                in_query.append(subq)
         query = query.filter(or_(*[status_model.Status.resource_id.in_(sub)
                                    for sub in in_query]))
         db_statuses = query.all()
@@ -475,16 +514,40 @@ class SqlAlchemyStore(AimStore):
         obj.bump_epoch()
         setattr(obj, '_epoch_bumped', True)
 
+    @staticmethod
+    def _get_listeners(listeners, listener_types):
+        """Snapshot the registered listeners along with their resource types.
+
+        Also returns the union of the resource types the listeners are
+        interested in, None meaning any resource type.
+        """
+        result = []
+        wanted = ()
+        for name, f in list(copy.copy(listeners).items()):
+            types = listener_types.get(name)
+            result.append((f, types))
+            if wanted is not None:
+                wanted = None if types is None else wanted + types
+        return result, wanted
+
+    @staticmethod
+    def _is_wanted(types, res_cls):
+        return types is None or issubclass(res_cls, types)
+
+    @staticmethod
+    def _materialize(store, objs, wanted):
+        # Only convert the DB objects some listener is interested in
+        result = []
+        for db_obj in objs:
+            res_cls = store.resource_map.get(type(db_obj))
+            if res_cls and SqlAlchemyStore._is_wanted(wanted, res_cls):
+                result.append((db_obj, store.make_resource(res_cls, db_obj)))
+        return result
+
     @staticmethod
     def _before_session_commit(session, flush_context, instances):
         store = SqlAlchemyStore(session)
-        added = []
-        updated = []
-        deleted = []
-        modified = [(session.new, added),
-                    (session.dirty, updated),
-                    (session.deleted, deleted)]
-        for mod_set, res_list in modified:
+        for mod_set in (session.new, session.dirty, session.deleted):
             for db_obj in mod_set:
                 if isinstance(db_obj, model_base.AttributeMixin):
                     # REVISIT: This removes epoch updates, which serialized
@@ -506,12 +569,20 @@ class SqlAlchemyStore(AimStore):
                         # che version, a StaleDataError would be raised.
                         # http://docs.sqlalchemy.org/en/latest/orm/versioning.html
                         SqlAlchemyStore._bump_epoch(db_obj)
-                res_cls = store.resource_map.get(type(db_obj))
-                if res_cls:
-                    res = store.make_resource(res_cls, db_obj)
-                    res_list.append(res)
 
-        for f in list(copy.copy(SqlAlchemyStore._update_listeners).values()):
+        listeners, wanted = SqlAlchemyStore._get_listeners(
+            SqlAlchemyStore._update_listeners,
+            SqlAlchemyStore._update_listener_types)
+        if not listeners:
+            return
+        modified = [
+            SqlAlchemyStore._materialize(store, mod_set, wanted)
+            for mod_set in (session.new, session.dirty, session.deleted)]
+        for f, types in listeners:
+            added, updated, deleted = [
+                [res for _, res in mod_list
+                 if SqlAlchemyStore._is_wanted(types, type(res))]
+                for mod_list in modified]
             LOG.debug("Invoking pre-commit hook %s with %d add(s), "
                       "%d update(s), %d delete(s)",
                       f.__name__, len(added), len(updated), len(deleted))
@@ -520,29 +591,31 @@ class SqlAlchemyStore(AimStore):
     @staticmethod
     def _after_session_flush(session, _):
         # Stash log changes
-        def to_resource(objs):
-            res_set = set()
-            # This is not creating a session
-            store = SqlAlchemyStore(None)
-            for db_obj in objs:
-                res_cls = store.resource_map.get(type(db_obj))
-                if res_cls:
-                    res = store.make_resource(res_cls, db_obj)
-                    res_set.add(res)
-            return res_set
-
-        added = to_resource(session.new)
-        updated = to_resource(session.dirty)
-        deleted = to_resource(session.deleted)
-
+        _, wanted = SqlAlchemyStore._get_listeners(
+            SqlAlchemyStore._postcommit_listeners,
+            SqlAlchemyStore._postcommit_listener_types)
+        if wanted == ():
+            # Nobody is going to look at the stash
+            return
         try:
-            session._aim_stash
+            stash = session._aim_stash
         except AttributeError:
-            session._aim_stash = {'added': set(), 'updated': set(),
-                                  'deleted': set()}
-        session._aim_stash['added'] |= added
-        session._aim_stash['updated'] |= updated
-        session._aim_stash['deleted'] |= deleted
+            stash = session._aim_stash = {'added': {}, 'updated': {},
+                                          'deleted': {}}
+        # This is not creating a session. Resources are made after the
+        # flush, so that postcommit listeners see the values it generated.
+        store = SqlAlchemyStore(None)
+        for key, mod_set in (('added', session.new),
+                             ('updated', session.dirty),
+                             ('deleted', session.deleted)):
+            for db_obj, res in SqlAlchemyStore._materialize(store, mod_set,
+                                                            wanted):
+                # Identify changes by primary key rather than hashing the
+                # whole resource, the latest flush wins. New objects have
+                # no identity key yet, but their primary key is populated.
+                identity = sa_inspect(
+                    db_obj).mapper.identity_key_from_instance(db_obj)
+                stash[key][identity] = res
 
     @staticmethod
     def _after_session_rollback(session):
@@ -563,13 +636,17 @@ class SqlAlchemyStore(AimStore):
             if transaction._parent is not None:
                 return
         try:
-            added = list(session._aim_stash['added'])
-            updated = list(session._aim_stash['updated'])
-            deleted = list(session._aim_stash['deleted'])
+            stash = session._aim_stash
         except AttributeError:
             return
-        for f in list(copy.copy(
-            SqlAlchemyStore._postcommit_listeners).values()):
+        listeners, _ = SqlAlchemyStore._get_listeners(
+            SqlAlchemyStore._postcommit_listeners,
+            SqlAlchemyStore._postcommit_listener_types)
+        for f, types in listeners:
+            added, updated, deleted = [
+                [res for res in stash[key].values()
+                 if SqlAlchemyStore._is_wanted(types, type(res))]
+                for key in ('added', 'updated', 'deleted')]
             LOG.debug("Invoking after transaction commit hook %s with "
                       "%d add(s), %d update(s))",
                       f.__name__, len(added), len(updated))
@@ -577,7 +654,7 @@ class SqlAlchemyStore(AimStore):
                 f(added, updated, deleted)
             except Exception as ex:
                 LOG.error("An error occurred during aim manager postcommit "
-                          "execution: %s" % str(ex))
+                          "execution: %s", str(ex))
         del session._aim_stash
 
 
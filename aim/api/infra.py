@@ -147,12 +147,12 @@ class ApicAssignment(resource.ResourceBase):
         result = current - self.last_update_timestamp >= datetime.timedelta(
             seconds=cfg.CONF.aim.apic_available_time)
         if result:
-            LOG.info("APIC %s is available. Last update time was %s" %
-                     (self.apic_host, self.last_update_timestamp))
+            LOG.info("APIC %s is available. Last update time was %s",
+                     self.apic_host, self.last_update_timestamp)
             return True
         else:
-            LOG.debug("APIC %s is not available. Last update time was %s" %
-                      (self.apic_host, self.last_update_timestamp))
+            LOG.debug("APIC %s is not available. Last update time was %s",
+                      self.apic_host, self.last_update_timestamp)
             return False
 
 
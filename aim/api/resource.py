@@ -14,8 +14,10 @@
 #    under the License.
 
 import base64
+import collections
 import datetime
 from hashlib import md5
+import itertools
 import oslo_serialization
 import six
 
@@ -31,6 +33,9 @@ from apicapi import apic_client
 
 
 LOG = logging.getLogger(__name__)
+_MISSING = object()
+# Attributes of each resource type, in storage order
+_ATTRIBUTE_ORDER = {}
 
 
 class ResourceBase(object):
@@ -49,6 +54,10 @@ class ResourceBase(object):
     db_attributes = t.db()
     common_db_attributes = t.db(('epoch', t.epoch))
     sorted_attributes = []
+    # Values derived from the identity attributes (DN, RN...) are cached out
+    # of __dict__, so that they don't take part in comparison and
+    # serialization.
+    __slots__ = ('_derived', '__dict__', '__weakref__')
 
     def __init__(self, defaults, **kwargs):
         unset_attr = [k for k in self.identity_attributes
@@ -58,17 +67,67 @@ class ResourceBase(object):
         if unset_attr:
             raise exc.IdentityAttributesMissing(klass=type(self).__name__,
                                                 attr=unset_attr)
-        if kwargs.pop('_set_default', True):
-            for k, v in list(defaults.items()):
-                setattr(self, k, v)
-        for k, v in list(kwargs.items()):
-            setattr(self, k, v)
+        if not kwargs.pop('_set_default', True):
+            defaults = {}
+        # Attributes are always stored in the same order, so that instances
+        # of the same type share their attribute layout. A brand new object
+        # has nothing to reset, __setattr__ is therefore bypassed.
+        order = self._attribute_order()
+        for k in order:
+            if k in kwargs:
+                object.__setattr__(self, k, kwargs[k])
+            elif k in defaults:
+                object.__setattr__(self, k, defaults[k])
+        for values in (defaults, kwargs):
+            for k, v in list(values.items()):
+                if k not in order:
+                    setattr(self, k, v)
+
+    @classmethod
+    def _attribute_order(cls):
+        try:
+            return _ATTRIBUTE_ORDER[cls]
+        except KeyError:
+            # Iterate the declarations rather than calling attributes(), some
+            # resources declare them as plain lists.
+            return _ATTRIBUTE_ORDER.setdefault(
+                cls, collections.OrderedDict.fromkeys(itertools.chain(
+                    cls.identity_attributes, cls.other_attributes,
+                    cls.db_attributes, cls.common_db_attributes)))
 
     def __getattr__(self, item):
         if item == 'epoch':
             return None
         super(ResourceBase, self).__getattr__(item)
 
+    def __setattr__(self, name, value):
+        if name in self.identity_attributes:
+            self._reset_derived()
+        super(ResourceBase, self).__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if name in self.identity_attributes:
+            self._reset_derived()
+        super(ResourceBase, self).__delattr__(name)
+
+    def _reset_derived(self):
+        object.__setattr__(self, '_derived', None)
+
+    def _get_derived(self, name, func):
+        """Return the identity derived value name, computing it if needed"""
+        try:
+            derived = object.__getattribute__(self, '_derived')
+        except AttributeError:
+            derived = None
+        if derived is None:
+            derived = {}
+            object.__setattr__(self, '_derived', derived)
+        try:
+            return derived[name]
+        except KeyError:
+            derived[name] = func()
+            return derived[name]
+
     @property
     def identity(self):
         return [str(getattr(self, x))
@@ -115,30 +174,32 @@ class ResourceBase(object):
             oslo_serialization.jsonutils.dump_as_bytes(
                 serializable, sort_keys=True))).hexdigest(), 16)
 
-    def user_equal(self, other):
-        def sort_if_list(key, attr):
-            # In Py3, sorting a dict w.r.t. keys first & then its values
-            # natively is not available. So this is a fix for that.
-            if six.PY3:
-                if isinstance(attr,
-                              list) and key not in self.sorted_attributes:
-                    if attr and isinstance(attr[0], dict):
-                        return sorted(attr, key=lambda d: sorted(d.items()))
-                    return sorted(attr)
-                return attr
-            return (sorted(attr) if isinstance(attr, list) and
-                    key not in self.sorted_attributes else attr)
-
-        missing = object()
+    def _user_canonical_form(self, attributes):
+        """Values of the user attributes, with unordered lists sorted
+
+        Not cached, as list attributes can be modified in place.
+        """
+        result = []
+        for attr in attributes:
+            value = getattr(self, attr, _MISSING)
+            if isinstance(value, list) and attr not in self.sorted_attributes:
+                # In Py3, sorting a dict w.r.t. keys first & then its values
+                # natively is not available. So this is a fix for that.
+                if six.PY3 and value and isinstance(value[0], dict):
+                    value = sorted(value, key=lambda d: sorted(d.items()))
+                else:
+                    value = sorted(value)
+            result.append(value)
+        return result
 
+    def user_equal(self, other):
         if type(self) != type(other):
             return False
-
-        for attr in self.user_attributes():
-            if (sort_if_list(attr, getattr(self, attr, missing)) !=
-                    sort_if_list(attr, getattr(other, attr, missing))):
-                return False
-        return True
+        if self.__dict__ == other.__dict__:
+            return True
+        attributes = self.user_attributes()
+        return (self._user_canonical_form(attributes) ==
+                other._user_canonical_form(attributes))
 
     def __str__(self):
         return '%s(%s)' % (type(self).__name__, ','.join(self.identity))
@@ -161,8 +222,15 @@ class ResourceBase(object):
     # address of the object in memory) goes away.
     # So for each class defining __eq__() we must also
     # define __hash__() even though parent class has __hash__().
+    #
+    # Objects that compare equal have the same type and identity, hashing
+    # those alone is therefore enough and way cheaper than hashing all the
+    # attributes. The type keeps resources of different types sharing the
+    # same identity values, like a tenant's VRF and BD, apart.
     def __hash__(self):
-        return self.hash
+        return self._get_derived(
+            'hash',
+            lambda: hash((type(self).__name__,) + tuple(self.identity)))
 
 
 class AciResourceBase(ResourceBase):
@@ -184,16 +252,13 @@ class AciResourceBase(ResourceBase):
 
     @property
     def dn(self):
-        return apic_client.ManagedObjectClass(self._aci_mo_name).dn(
-            *self.identity)
+        return self._get_derived(
+            'dn', lambda: utils.get_aci_dn(self._aci_mo_name, *self.identity))
 
     @property
     def rn(self):
-        mo = apic_client.ManagedObjectClass(self._aci_mo_name)
-        if mo.rn_param_count > 0:
-            return mo.rn(*self.identity[-mo.rn_param_count:])
-        else:
-            return mo.rn()
+        return self._get_derived(
+            'rn', lambda: utils.get_aci_rn(self._aci_mo_name, *self.identity))
 
     @classmethod
     def from_dn(cls, dn):
@@ -210,12 +275,11 @@ class AciResourceBase(ResourceBase):
 
     @property
     def root(self):
+        return self._get_derived('root', self._get_root)
+
+    def _get_root(self):
         mos_and_types = utils.decompose_dn(self._aci_mo_name, self.dn)
-        mo = apic_client.ManagedObjectClass(mos_and_types[0][0])
-        if mo.rn_param_count > 0:
-            return mo.rn(mos_and_types[0][1])
-        else:
-            return mo.rn()
+        return utils.get_aci_rn(*mos_and_types[0])
 
     @classmethod
     def root_ref_attribute(cls):
@@ -376,11 +440,11 @@ class Agent(ResourceBase):
         result = current - self.heartbeat_timestamp >= datetime.timedelta(
             seconds=cfg.CONF.aim.agent_down_time)
         if result:
-            LOG.warning("Agent %s is down. Last heartbeat was %s" %
-                        (self.id, self.heartbeat_timestamp))
+            LOG.warning("Agent %s is down. Last heartbeat was %s",
+                        self.id, self.heartbeat_timestamp)
         else:
-            LOG.debug("Agent %s is alive, its last heartbeat was %s" %
-                      (self.id, self.heartbeat_timestamp))
+            LOG.debug("Agent %s is alive, its last heartbeat was %s",
+                      self.id, self.heartbeat_timestamp)
         return result
 
     def down_time(self, context):
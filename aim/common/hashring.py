@@ -53,9 +53,14 @@ class ConsistentHashRing(object):
 
     This class is not thread safe, but guarantees is results to be reproducible
     by different instances given the same configuration.
+
+    Key hashes and key assignments are memoized, so that a long lived ring
+    only pays the hashing cost for keys it has never seen before. Assignments
+    are invalidated every time the ring membership changes.
     """
 
-    def __init__(self, nodes=None, vnodes=40, replicas=1, default_weight=1):
+    def __init__(self, nodes=None, vnodes=40, replicas=1, default_weight=1,
+                 key_cache_size=100000):
         """ConsistentHashRing initialization.
 
         :param nodes: Initial node set, the expected format is a dictionary
@@ -69,6 +74,8 @@ class ConsistentHashRing(object):
         of nodes in the cluster.
         :param default_weight: Weight value to be used for nodes when not
         specified.
+        :param key_cache_size: maximum number of keys for which hashes and
+        assignments are memoized.
         :return:
         """
         self._nodes = {}
@@ -76,6 +83,11 @@ class ConsistentHashRing(object):
         self._vnodes = vnodes
         self._replicas = replicas
         self._default_weight = default_weight
+        self._key_cache_size = key_cache_size
+        self._key_hashes = {}
+        self._assignments = {}
+        self._load_assignments = None
+        self.version = 0
         self.add_nodes(nodes or {})
 
     def _hashi(self, node, weight):
@@ -83,14 +95,39 @@ class ConsistentHashRing(object):
 
         :return:
         """
-        weight = weight if weight is not None else self._default_weight
+        weight = self._weight(weight)
         vnodes = self._vnodes * weight
         for x in range(vnodes):
             yield self._hash(str(node) + str(x))
 
+    def _weight(self, weight):
+        return weight if weight is not None else self._default_weight
+
     def _hash(self, key):
         return int(md5(b64.encode_as_bytes(key)).hexdigest(), 16)  # nosec
 
+    def _hash_key(self, key):
+        try:
+            return self._key_hashes[key]
+        except KeyError:
+            if len(self._key_hashes) >= self._key_cache_size:
+                self._key_hashes = {}
+            h4sh = self._key_hashes[key] = self._hash(key)
+            return h4sh
+
+    def _ring_changed(self):
+        self.version += 1
+        self._assignments = {}
+        self._load_assignments = None
+
+    @property
+    def vnodes(self):
+        return self._vnodes
+
+    @property
+    def nodes(self):
+        return dict(self._nodes)
+
     def add_node(self, node, weight=None):
         """Add a node to the ring
 
@@ -112,10 +149,42 @@ class ConsistentHashRing(object):
         # Remove nodes already in the ring, this could be a weight update
         # operation
         self.remove_nodes(set(self._nodes.keys()) & set(nodes.keys()))
-        for node, weight in list(nodes.items()):
-            for h4sh in self._hashi(node, weight):
-                bisect.insort(self._ring, Star(h4sh, node))
+        if not nodes:
+            return
+        stars = [Star(h4sh, node) for node, weight in list(nodes.items())
+                 for h4sh in self._hashi(node, weight)]
+        if len(stars) > len(self._ring):
+            # Cheaper to sort everything once than to insert one by one
+            self._ring.extend(stars)
+            self._ring.sort()
+        else:
+            for star in stars:
+                bisect.insort(self._ring, star)
         self._nodes.update(nodes)
+        self._ring_changed()
+
+    def update_nodes(self, nodes):
+        """Align the ring to a given node set
+
+        Only the differences between the current and the requested
+        configuration are applied: new nodes are added, missing nodes are
+        removed and nodes whose weight changed are re-added.
+
+        :param nodes: The expected format is a dictionary
+        with the node ID as key and its weight as value. Weight can be set to
+        None to use the default value.
+        :return: True if the ring changed, False otherwise
+        """
+        removed = set(self._nodes.keys()) - set(nodes.keys())
+        changed = dict(
+            (node, weight) for node, weight in list(nodes.items())
+            if node not in self._nodes or
+            self._weight(self._nodes[node]) != self._weight(weight))
+        if removed:
+            self.remove_nodes(removed)
+        if changed:
+            self.add_nodes(changed)
+        return bool(removed or changed)
 
     def remove_node(self, node):
         """Remove a single node from the ring
@@ -131,15 +200,15 @@ class ConsistentHashRing(object):
         :param nodes:
         :return:
         """
+        removed = set()
         for node in nodes:
             if node not in self._nodes:
                 continue
-            weight = self._nodes.pop(node, None)
-            for x in self._hashi(node, weight):
-                try:
-                    self._ring.remove(Star(x))
-                except ValueError:
-                    pass
+            self._nodes.pop(node, None)
+            removed.add(node)
+        if removed:
+            self._ring = [x for x in self._ring if x.node not in removed]
+            self._ring_changed()
 
     def assign_key(self, key):
         """Assign a key to the ring
@@ -147,7 +216,20 @@ class ConsistentHashRing(object):
         :param key: identifier
         :return: list of nodes that serve this key
         """
-        index = bisect.bisect(self._ring, Star(self._hash(key)))
+        try:
+            return list(self._assignments[key])
+        except KeyError:
+            pass
+        if len(self._assignments) >= self._key_cache_size:
+            self._assignments = {}
+        result = self._assign_key(key)
+        self._assignments[key] = tuple(result)
+        return result
+
+    def _assign_key(self, key):
+        if not self._ring:
+            return []
+        index = bisect.bisect(self._ring, Star(self._hash_key(key)))
         if index == len(self._ring):
             index = 0
         result = [self._ring[index].node]
@@ -160,5 +242,64 @@ class ConsistentHashRing(object):
                 result.append(self._ring[index - x].node)
         return result
 
+    def assign_keys_with_load(self, costs, load_factor=1.25):
+        """Assign a set of keys to the ring, bounding each node's load
+
+        Consistent hashing with bounded loads: each key walks the ring
+        clockwise from its hash, and is assigned to the first node(s) whose
+        load would not exceed its capacity. Capacity of a node is
+        proportional to its weight, and the whole ring can take up to
+        load_factor times the total cost. Keys are placed in decreasing cost
+        order, so that heavy keys are spread first. The result only depends
+        on the ring configuration and on the costs, which makes it
+        reproducible by different instances. Only keys that would overload
+        their natural node move away from it.
+
+        :param costs: dictionary with keys as keys and their cost (a
+        positive number) as value.
+        :param load_factor: how much a node can exceed the average load. Must
+        be greater than 1.
+        :return: dictionary with keys as keys and the list of nodes that
+        serve them as values.
+        """
+        costs_id = (load_factor, sorted(costs.items()))
+        if (self._load_assignments is not None and
+                self._load_assignments[0] == costs_id):
+            return self._load_assignments[1]
+        result = {}
+        if not self._ring:
+            return result
+        total_weight = float(sum(self._weight(x) for x in
+                                 list(self._nodes.values())))
+        total_cost = sum(costs.values()) * self._replicas
+        capacity = dict(
+            (node, total_cost * load_factor * self._weight(weight) /
+             total_weight) for node, weight in list(self._nodes.items()))
+        load = dict((node, 0) for node in self._nodes)
+        replicas = min(self._replicas, len(self._nodes))
+        for key, cost in sorted(list(costs.items()),
+                                key=lambda x: (-x[1], x[0])):
+            index = bisect.bisect(self._ring, Star(self._hash_key(key)))
+            candidates = []
+            for x in range(len(self._ring)):
+                node = self._ring[(index + x) % len(self._ring)].node
+                if node not in candidates:
+                    candidates.append(node)
+                    if len(candidates) == len(self._nodes):
+                        break
+            allocation = [node for node in candidates
+                          if load[node] + cost <= capacity[node]][:replicas]
+            if len(allocation) < replicas:
+                # Key too big to fit anywhere, fill with the least loaded
+                # nodes in ring order.
+                allocation += sorted(
+                    [x for x in candidates if x not in allocation],
+                    key=lambda x: load[x])[:replicas - len(allocation)]
+            for node in allocation:
+                load[node] += cost
+            result[key] = allocation
+        self._load_assignments = (costs_id, result)
+        return result
+
     def __len__(self):
         return len(self._nodes)
@@ -403,6 +403,40 @@ class StructuredHashTree(base.ComparableCollection):
         self._diff_children(childrenl, childrenr, result)
         return result
 
+    def sync(self, other):
+        """Make this tree identical to other
+
+        Only the subtrees whose hash differ are replaced, nodes that are
+        already in sync are left untouched (metadata included, as it is not
+        part of the hash).
+        :return: True if the tree was modified
+        """
+        if self == other:
+            return False
+        if not (self.root and other.root) or self.root.key != other.root.key:
+            self.root = other.root
+        else:
+            self._sync_nodes(self.root, other.root)
+        self.root_key = other.root_key
+        self.has_populated = other.has_populated
+        return True
+
+    def _sync_nodes(self, node, other):
+        node.partial_hash = other.partial_hash
+        node.dummy = other.dummy
+        node.error = other.error
+        node.metadata = other.metadata
+        for child in node.get_children():
+            if other.get_child(child.key) is None:
+                node.remove_child(child.key)
+        for otherchild in other.get_children():
+            child = node.get_child(otherchild.key)
+            if child is None:
+                node.replace_child(otherchild)
+            elif child.full_hash != otherchild.full_hash:
+                self._sync_nodes(child, otherchild)
+        node.full_hash = other.full_hash
+
     def has_subtree(self):
         return self.root and len(self.root._children) > 0
 
@@ -0,0 +1,162 @@
+# Copyright (c) 2016 Cisco Systems
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+from contextlib import contextmanager
+import functools
+import threading
+import time
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+STATS_LOG_INTERVAL = 60
+
+_owner = threading.local()
+
+
+def get_request_owner():
+    return getattr(_owner, 'name', None)
+
+
+@contextmanager
+def request_owner(name):
+    """Account the requests made by the current thread to name"""
+    previous = get_request_owner()
+    _owner.name = name
+    try:
+        yield
+    finally:
+        _owner.name = previous
+
+
+class RequestGovernor(object):
+    """Rate and concurrency limiter for outgoing requests
+
+    Requests consume tokens from a bucket refilled at `rate` tokens per
+    second up to `burst`, and at most `max_in_flight` requests run at the
+    same time. Waiting requests are served round robin across owners, so
+    that a busy owner can't starve the others.
+
+    :param rate: requests per second, 0 for unlimited
+    :param burst: bucket size
+    :param max_in_flight: concurrent requests, 0 for unlimited
+    """
+
+    def __init__(self, rate=0, burst=1, max_in_flight=0):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_in_flight = max_in_flight
+        self._tokens = float(self.burst)
+        self._last_refill = time.time()
+        self._in_flight = 0
+        # owner -> queue of waiting requests, in round robin order
+        self._waiters = collections.OrderedDict()
+        self._cond = threading.Condition()
+        self._stats = {'requests': 0, 'queued': 0, 'total_wait': 0.0,
+                       'max_wait': 0.0}
+        self._last_stats_log = time.time()
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._last_refill) *
+                           self.rate)
+        self._last_refill = now
+
+    def _try_grant(self, owner, ticket):
+        """Grant the request if its turn came
+
+        :return: 0 when granted, seconds to wait otherwise (None when the
+        request has to wait for another one to proceed)
+        """
+        if (next(iter(self._waiters)) != owner or
+                self._waiters[owner][0] is not ticket):
+            return None
+        if self.max_in_flight and self._in_flight >= self.max_in_flight:
+            return None
+        if self.rate:
+            self._refill()
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self._in_flight += 1
+        waiting = self._waiters.pop(owner)
+        waiting.popleft()
+        if waiting:
+            # Back of the line
+            self._waiters[owner] = waiting
+        # Let the next request check its turn
+        self._cond.notify_all()
+        return 0
+
+    def acquire(self):
+        owner = get_request_owner()
+        ticket = object()
+        start = time.time()
+        with self._cond:
+            self._waiters.setdefault(owner, collections.deque()).append(
+                ticket)
+            while True:
+                wait = self._try_grant(owner, ticket)
+                if wait == 0:
+                    break
+                self._cond.wait(wait)
+            self._account(time.time() - start)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _account(self, wait):
+        self._stats['requests'] += 1
+        if wait > 0.001:
+            self._stats['queued'] += 1
+        self._stats['total_wait'] += wait
+        self._stats['max_wait'] = max(self._stats['max_wait'], wait)
+        if time.time() - self._last_stats_log > STATS_LOG_INTERVAL:
+            self._last_stats_log = time.time()
+            LOG.info("APIC requests: %(requests)s, queued: %(queued)s, "
+                     "average wait: %(avg_wait).3fs, max wait: "
+                     "%(max_wait).3fs, waiting: %(waiting)s, in flight: "
+                     "%(in_flight)s", self._get_stats())
+
+    def _get_stats(self):
+        stats = dict(self._stats)
+        stats['avg_wait'] = (stats['total_wait'] / stats['requests']
+                             if stats['requests'] else 0.0)
+        stats['waiting'] = sum(len(x) for x in self._waiters.values())
+        stats['in_flight'] = self._in_flight
+        return stats
+
+    def get_stats(self):
+        with self._cond:
+            return self._get_stats()
+
+    @contextmanager
+    def limit(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def wrap(self, func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with self.limit():
+                return func(*args, **kwargs)
+        return inner
@@ -18,6 +18,7 @@ from collections import OrderedDict
 from contextlib import contextmanager
 import functools
 import hashlib
+import itertools
 import json
 import os
 import oslo_serialization
@@ -139,7 +140,7 @@ def get_backoff_time(max_time, tentative_number):
 def exponential_backoff(max_time, tentative=None):
     tentative = tentative or Counter()
     sleep_time_secs = get_backoff_time(max_time, tentative.get())
-    LOG.debug('Sleeping for %s seconds' % sleep_time_secs)
+    LOG.debug('Sleeping for %s seconds', sleep_time_secs)
     sleep(sleep_time_secs)
     tentative.increment()
     return tentative
@@ -226,9 +227,154 @@ class FakeContext(object):
             self.store = store
 
 
+class BoundedCache(object):
+    """Thread safe LRU cache keeping hit and miss counters"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, func, *args):
+        """Return the value of key, computing it with func(*args) if missing
+
+        Exceptions raised by func are not cached.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                # Most recently used
+                self._data[key] = value
+                return value
+        value = func(*args)
+        with self._lock:
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def get_stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._data), 'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': float(self.hits) / total if total else 0.0}
+
+
+DN_CACHE_SIZE = 100000
+# DN <-> (type, RN) conversions are deterministic for a given APIC scope, but
+# fairly expensive and repeated over and over for the same objects.
+_dn_caches = {'decompose': BoundedCache(DN_CACHE_SIZE),
+              'build': BoundedCache(DN_CACHE_SIZE),
+              'dn': BoundedCache(DN_CACHE_SIZE),
+              'rn': BoundedCache(DN_CACHE_SIZE),
+              'identity': BoundedCache(DN_CACHE_SIZE)}
+
+
+def _cacheable(params):
+    # Subclasses of str can carry extra information used when formatting the
+    # DN, they are never cached.
+    return all(type(x) in (str, six.text_type) for x in params)
+
+
+def _decompose_dn_guess(dn, mo_type):
+    mo, mos_and_rns = apic_client.DNManager().aci_decompose_dn_guess(
+        dn, mo_type)
+    return mo, tuple(tuple(x) for x in mos_and_rns)
+
+
+def decompose_dn_guess(dn, mo_type):
+    """Cached version of DNManager().aci_decompose_dn_guess"""
+    if not _cacheable([dn, mo_type]):
+        return apic_client.DNManager().aci_decompose_dn_guess(dn, mo_type)
+    mo, mos_and_rns = _dn_caches['decompose'].get(
+        (apic_client.ManagedObjectClass.scope, dn, mo_type),
+        _decompose_dn_guess, dn, mo_type)
+    return mo, list(mos_and_rns)
+
+
+def build_dn(mos_and_rns):
+    """Cached version of DNManager().build"""
+    key = tuple(tuple(x) for x in mos_and_rns)
+    if not _cacheable(itertools.chain(*key)):
+        return apic_client.DNManager().build(mos_and_rns)
+    return _dn_caches['build'].get(
+        (apic_client.ManagedObjectClass.scope, key),
+        apic_client.DNManager().build, mos_and_rns)
+
+
+def _get_aci_dn(mo_name, *params):
+    return apic_client.ManagedObjectClass(mo_name).dn(*params)
+
+
+def get_aci_dn(mo_name, *params):
+    """Cached DN of an ACI object given its type and identity"""
+    if not _cacheable(params):
+        return _get_aci_dn(mo_name, *params)
+    return _dn_caches['dn'].get(
+        (apic_client.ManagedObjectClass.scope, mo_name, params),
+        _get_aci_dn, mo_name, *params)
+
+
+def _get_aci_rn(mo_name, *params):
+    mo = apic_client.ManagedObjectClass(mo_name)
+    if mo.rn_param_count > 0:
+        return mo.rn(*params[-mo.rn_param_count:])
+    else:
+        return mo.rn()
+
+
+def get_aci_rn(mo_name, *params):
+    """Cached RN of an ACI object given its type and identity
+
+    Only the last parameters, as many as the RN requires, are used.
+    """
+    if not _cacheable(params):
+        return _get_aci_rn(mo_name, *params)
+    return _dn_caches['rn'].get(
+        (apic_client.ManagedObjectClass.scope, mo_name, params),
+        _get_aci_rn, mo_name, *params)
+
+
+def _get_dn_identity(dn, mo_type):
+    dn_mgr = apic_client.DNManager()
+    return tuple(dn_mgr.filter_rns(dn_mgr.aci_decompose_with_type(dn,
+                                                                  mo_type)))
+
+
+def get_dn_identity(dn, mo_type):
+    """Cached identity values (the RN names) of an ACI DN of type mo_type"""
+    if not _cacheable([dn, mo_type]):
+        return list(_get_dn_identity(dn, mo_type))
+    return list(_dn_caches['identity'].get(
+        (apic_client.ManagedObjectClass.scope, dn, mo_type),
+        _get_dn_identity, dn, mo_type))
+
+
+def get_dn_cache_stats():
+    return dict((name, cache.get_stats())
+                for name, cache in _dn_caches.items())
+
+
+def clear_dn_caches():
+    for cache in _dn_caches.values():
+        cache.clear()
+
+
 def decompose_dn(mo_type, dn):
     try:
-        return apic_client.DNManager().aci_decompose_dn_guess(dn, mo_type)[1]
+        return decompose_dn_guess(dn, mo_type)[1]
     except (apic_client.DNManager.InvalidNameFormat, KeyError,
             apic_client.cexc.ApicManagedObjectNotSupported, IndexError):
         log_ = LOG.warning
@@ -75,6 +75,37 @@ agent_opts = [
                  help="how long the ACITenant yield to other processed"),
     cfg.FloatOpt('websocket_monitor_sleep', default=10,
                  help="how long the ACITenant yield to other processed"),
+    cfg.BoolOpt('websocket_event_dispatcher', default=False,
+                help=("(Restart Required) Use a single dispatcher thread to "
+                      "route WebSocket events to the tenant managers. Tenant "
+                      "managers then block until events are received "
+                      "instead of polling every aci_tenant_polling_yield "
+                      "seconds.")),
+    cfg.IntOpt('aci_tenant_workers', default=0, min=0,
+               help=("(Restart Required) Number of worker threads running "
+                     "the ACI tenant managers. When 0, each served tenant "
+                     "runs in its own thread.")),
+    cfg.IntOpt('aci_push_batch_size', default=1, min=1,
+               help=("Maximum number of AIM objects with the same parent "
+                     "pushed to APIC in a single transaction. Failed "
+                     "batches are split until the failing objects are "
+                     "found. 1 disables batching.")),
+    cfg.FloatOpt('apic_request_rate', default=0, min=0,
+                 help=("(Restart Required) Maximum rate of REST requests per "
+                       "second sent by AID to APIC, shared by all the "
+                       "served tenants. 0 means unlimited.")),
+    cfg.IntOpt('apic_request_burst', default=10, min=1,
+               help=("(Restart Required) Number of REST requests that can "
+                     "be sent at once to APIC before apic_request_rate "
+                     "kicks in.")),
+    cfg.IntOpt('apic_max_requests_in_flight', default=0, min=0,
+               help=("(Restart Required) Maximum number of concurrent REST "
+                     "requests sent by AID to APIC. 0 means unlimited.")),
+    cfg.FloatOpt('aci_event_coalescing_window', default=0, min=0,
+                 help=("Seconds APIC events are held by the tenant managers "
+                       "before being processed, so that several events on "
+                       "the same DN are coalesced into one. Events received "
+                       "in the same batch are always coalesced.")),
     cfg.IntOpt('max_operation_retry', default=5,
                help="How many creations/deletions are attempted by AID before "
                     "declaring failure on a specific object"),
@@ -131,6 +162,22 @@ agent_opts = [
     cfg.BoolOpt('enable_faults_subscriptions', default=False,
                 help=("(Temporary) Set to True to ensure faults are subscribed"
                       "to under the tenants")),
+    cfg.StrOpt('tenant_assignment_mode', default='hash',
+               choices=['hash', 'load'],
+               help=("How tenants are distributed across the AID agents. "
+                     "'hash' uses plain consistent hashing. 'load' uses "
+                     "consistent hashing with bounded loads, where the cost "
+                     "of each tenant is derived from the size of its stored "
+                     "tree. One of the agents periodically snapshots the "
+                     "costs in the DB, all the agents assign tenants from "
+                     "that snapshot. All the agents must use the same "
+                     "value.")),
+    cfg.FloatOpt('tenant_assignment_load_factor', default=1.25, min=1,
+                 help=("Only used when tenant_assignment_mode is 'load'. How "
+                       "much the load of an agent can exceed the average "
+                       "load before tenants are moved to the next agent in "
+                       "the ring. Lower values give a better balance at the "
+                       "cost of more tenants moving on rebalance.")),
 ]
 
 # TODO(ivar): move into AIM section
@@ -231,8 +278,8 @@ class ConfigManager(object):
                     else:
                         value = getattr(getattr(cfg_obj, group), k)
                 except cfg.NoSuchOptError as e:
-                    LOG.debug("Option %s is not registered in group %s"
-                              % (k, group))
+                    LOG.debug("Option %s is not registered in group %s",
+                              k, group)
                     raise e
                 if isinstance(v, cfg.IntOpt):
                     value = str(value)
@@ -255,7 +302,7 @@ class ConfigManager(object):
         # If not restricted by host, all the config will be deleted
         configs = self._to_query_format(cfg_obj, host=host)
         LOG.info("Replacing existing configuration for host %s "
-                 "with: %s" % (host, configs))
+                 "with: %s", host, configs)
         self.db.replace_all(context or self.context, configs, host=host)
 
     def override(self, item, value, group='default', host=None, context=None):
@@ -290,7 +337,7 @@ class ConfigManager(object):
             else:
                 LOG.warning(
                     "Unsupported option type %s of item %s in group %s for "
-                    "host %s. Returning None" % (type(obj), item, group, host))
+                    "host %s. Returning None", type(obj), item, group, host)
             return db_conf
         except exc.ConfigurationUndefined:
             if host == '':
@@ -549,7 +596,7 @@ class ConfigSubscriber(utils.AIMThread):
                                       readable_caller='Config Subscriber')
         except Exception as e:
             LOG.error("An exception has occurred in config subscriber thread "
-                      "%s" % str(e))
+                      "%s", str(e))
             LOG.error(traceback.format_exc())
 
     def _poll_and_execute(self):
@@ -580,8 +627,8 @@ class ConfigSubscriber(utils.AIMThread):
                         except Exception as e:
                             LOG.error(
                                 "An exception has occurred while "
-                                "executing callback %s: %s" % (
-                                    values['callback'], str(e)))
+                                "executing callback %s: %s",
+                                values['callback'], str(e))
                             LOG.error(traceback.format_exc())
 
     def _get_call_id(self, callback):
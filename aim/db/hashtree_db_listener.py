@@ -69,7 +69,7 @@ class HashTreeDbListener(object):
                         continue
                     if self._get_log_count(ctx, root) >= MAX_EVENTS_PER_ROOT:
                         LOG.warning('Max events per root %s reached, '
-                                    'requesting a reset' % root)
+                                    'requesting a reset', root)
                         action = aim_tree.ActionLog.RESET
                     log = aim_tree.ActionLog(
                         root_rn=root, action=action,
@@ -111,6 +111,7 @@ class HashTreeDbListener(object):
                         if type not in ROOTLESS_TYPES:
                             filters[klass.root_ref_attribute()] = name
                     # Get all objects of that type
+                    objs = []
                     for obj in self.aim_manager.find(aim_ctx, klass,
                                                      **filters):
                         # We will not add this SG rule to AIM tree to
@@ -124,9 +125,11 @@ class HashTreeDbListener(object):
                             obj.remote_group_id and not obj.remote_ips and
                                 not obj.tDn):
                             continue
-                        # Need all the faults and statuses as well
-                        stat = self.aim_manager.get_status(
-                            aim_ctx, obj, create_if_absent=False)
+                        objs.append(obj)
+                    # Need all the faults and statuses as well
+                    stats = self.aim_manager.get_statuses_with_faults(
+                        aim_ctx, objs)
+                    for obj, stat in zip(objs, stats):
                         if getattr(obj, 'sync', True):
                             if stat:
                                 log_by_root.setdefault(obj.root, []).append(
@@ -157,7 +160,7 @@ class HashTreeDbListener(object):
                     to_delete.append(stat.id)
             if to_delete:
                 LOG.info("Deleting parentless status objects "
-                         "%s" % to_delete)
+                         "%s", to_delete)
                 self.aim_manager.delete_all(
                     aim_ctx, klass, in_={'id': to_delete})
 
@@ -198,9 +201,9 @@ class HashTreeDbListener(object):
             with ctx.store.begin(subtransactions=True):
                 logs = self.aim_manager.find(ctx, aim_tree.ActionLog, **kwargs)
                 if len(logs) > ACTION_LOG_THRESHOLD:
-                    LOG.info('Tenant %s has %s ActionLogs to be processed' %
-                             (served_tenant, len(logs)))
-                LOG.debug('Processing action logs: %s' % logs)
+                    LOG.info('Tenant %s has %s ActionLogs to be processed',
+                             served_tenant, len(logs))
+                LOG.debug('Processing action logs: %s', logs)
                 log_by_root, resetting_roots = self._preprocess_logs(ctx, logs)
                 self._cleanup_resetting_roots(
                     ctx, log_by_root, resetting_roots)
@@ -229,7 +232,7 @@ class HashTreeDbListener(object):
                 except ImportError:
                     pass
             if not aim_res:
-                LOG.warning('Aim resource for event %s not found' % log)
+                LOG.warning('Aim resource for event %s not found', log)
                 continue
             # REVISIT: We currently only query the DB for
             # SecurityGroupRule resources, but should treat all
@@ -247,7 +250,7 @@ class HashTreeDbListener(object):
                 if db_aim_res:
                     if action == aim_tree.ActionLog.DELETE:
                         LOG.warning("AIM resource %s exists in DB for delete "
-                                    "action" % db_aim_res)
+                                    "action", db_aim_res)
                         action = aim_tree.ActionLog.SKIP
                     else:
                         # Use current resource from DB so that list
@@ -267,7 +270,7 @@ class HashTreeDbListener(object):
                 else:
                     if action != aim_tree.ActionLog.DELETE:
                         LOG.warning("AIM resource %s does not exist in DB "
-                                    "for create/update action" % aim_res)
+                                    "for create/update action", aim_res)
                         action = aim_tree.ActionLog.SKIP
 
                 # Queue up these SG rules first as we really just need
@@ -318,7 +321,7 @@ class HashTreeDbListener(object):
                                                           lock_update=True)
                         if check_reset and ttree and ttree.needs_reset:
                             LOG.warning('RESET action received for root %s, '
-                                        'resetting trees' % root_rn)
+                                        'resetting trees', root_rn)
                             self.reset(ctx.store, root_rn)
                             continue
                         ttree_conf = self.tt_mgr.get(
@@ -358,13 +361,13 @@ class HashTreeDbListener(object):
                         self._delete_logs(ctx, log_by_root[root_rn])
             except Exception as e:
                 LOG.error('Failed to update root %s '
-                          'tree for: %s' % (root_rn, str(e)))
+                          'tree for: %s', root_rn, str(e))
                 LOG.debug(traceback.format_exc())
 
     def _validate_config_trees(self, ctx, roots):
-        LOG.info("validating config trees for roots: %s" % roots)
+        LOG.info("validating config trees for roots: %s", roots)
         for root in roots:
-            LOG.info("validating config tree for root: %s" % root)
+            LOG.info("validating config tree for root: %s", root)
             with ctx.store.begin(subtransactions=True):
                 before = copy.deepcopy(
                     self.tt_mgr.get(
@@ -375,6 +378,6 @@ class HashTreeDbListener(object):
                 after = self.tt_mgr.get(
                     ctx, root, tree=tree_manager.CONFIG_TREE)
                 if before.root_full_hash != after.root_full_hash:
-                    LOG.warning("invalid config tree for root: %s" % root)
-                    LOG.warning(" before recreating: %s" % before)
-                    LOG.warning(" after recreating: %s" % after)
+                    LOG.warning("invalid config tree for root: %s", root)
+                    LOG.warning(" before recreating: %s", before)
+                    LOG.warning(" after recreating: %s", after)
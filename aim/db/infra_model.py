@@ -196,6 +196,51 @@ class ACISupportedMoManager(object):
                 setattr(obj, "supports", status)
                 self.aim_context.store.add(obj)
 
+    def get_probe_results(self, version):
+        """Capability probe results persisted for an APIC version
+
+        Only works with sql store, returns an empty dictionary otherwise.
+
+        :return: dictionary of probe name -> supported
+        """
+        if 'sql' not in self.aim_context.store.features:
+            return {}
+        db_session = self.aim_context.store.db_session
+        return dict((x.probe, x.supports) for x in db_session.query(
+            ACICapabilityProbe).filter_by(apic_version=version))
+
+    def set_probe_results(self, version, results):
+        """Persist capability probe results for an APIC version
+
+        Results stored for any other version are removed, they are never
+        going to be used again. Only works with sql store.
+        """
+        if 'sql' not in self.aim_context.store.features:
+            return
+        columns = ACICapabilityProbe.__table__.columns
+        if len(version) > columns.apic_version.type.length:
+            return
+        store = self.aim_context.store
+        with store.begin(subtransactions=True):
+            store.db_session.query(ACICapabilityProbe).filter(
+                ACICapabilityProbe.apic_version != version).delete(
+                synchronize_session=False)
+            for name, supports in list(results.items()):
+                if len(name) > columns.probe.type.length:
+                    continue
+                store.db_session.merge(ACICapabilityProbe(
+                    apic_version=version, probe=name, supports=supports))
+
+
+class ACICapabilityProbe(model_base.Base):
+    """DB model for APIC capability probe results, by APIC version"""
+
+    __tablename__ = 'aim_aci_capability_probes'
+
+    apic_version = sa.Column(sa.String(64), primary_key=True)
+    probe = sa.Column(sa.String(128), primary_key=True)
+    supports = sa.Column(sa.Boolean, nullable=False)
+
 
 class AimHashRing(model_base.Base, model_base.AttributeMixin):
     """DB model for configurable params for consistent hashing algo"""
@@ -0,0 +1,42 @@
+# Copyright (c) 2026 Cisco Systems
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""ACI capability probes
+Revision ID: 3c7a51f4b2d9
+Revises: e322787e56fd
+Create date: 2026-10-19 12:00:00.000000000
+"""
+
+# revision identifiers, used by Alembic.
+from alembic import op
+import sqlalchemy as sa
+
+revision = '3c7a51f4b2d9'
+down_revision = 'e322787e56fd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'aim_aci_capability_probes',
+        sa.Column('apic_version', sa.String(64), nullable=False),
+        sa.Column('probe', sa.String(128), nullable=False),
+        sa.Column('supports', sa.Boolean, nullable=False),
+        sa.PrimaryKeyConstraint('apic_version', 'probe'))
+
+
+def downgrade():
+    pass
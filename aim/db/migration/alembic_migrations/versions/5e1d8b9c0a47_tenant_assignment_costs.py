@@ -0,0 +1,41 @@
+# Copyright (c) 2026 Cisco Systems
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tenant assignment costs
+Revision ID: 5e1d8b9c0a47
+Revises: 3c7a51f4b2d9
+Create date: 2026-10-19 15:00:00.000000000
+"""
+
+# revision identifiers, used by Alembic.
+from alembic import op
+import sqlalchemy as sa
+
+revision = '5e1d8b9c0a47'
+down_revision = '3c7a51f4b2d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'aim_tenant_assignment_costs',
+        sa.Column('root_rn', sa.String(64), nullable=False),
+        sa.Column('cost', sa.Integer, nullable=False),
+        sa.PrimaryKeyConstraint('root_rn'))
+
+
+def downgrade():
+    pass
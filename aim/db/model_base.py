@@ -17,10 +17,15 @@ import six
 import sqlalchemy as sa
 from sqlalchemy.dialects import mysql
 from sqlalchemy.ext import declarative
+from sqlalchemy import orm
 
 from aim.common import utils
 
 
+# Attribute names, getters and setters of each AttributeMixin class
+_ATTRIBUTE_MAPS = {}
+
+
 def to_tuple(obj):
     return obj if isinstance(obj, tuple) else (obj,)
 
@@ -156,24 +161,13 @@ class AttributeMixin(object):
         # Since in Py2, string are bytes-like objects, decoding won't
         # make a difference.
         attr_dict = {}
-        for k in dir(self):
-            if (not k.startswith('_') and
-                    k not in getattr(self, '_exclude_to', []) and
-                    not callable(getattr(self, k))):
-                if k == 'object_dict':
-                    v = self.get_attr(session, k)
-                    if isinstance(v, bytes):
-                        attr_dict[k] = v.decode('utf-8')
-                    else:
-                        attr_dict[k] = v
-                elif k == 'tree':
-                    v = self.get_attr(session, k)
-                    if isinstance(v, bytes):
-                        attr_dict[k] = v.decode('utf-8')
-                    else:
-                        attr_dict[k] = v
-                else:
-                    attr_dict[k] = self.get_attr(session, k)
+        getters = self._attribute_maps()[1]
+        for k in self._attribute_names():
+            getter = getters.get(k)
+            v = getattr(self, getter)(session) if getter else getattr(self, k)
+            if k in ('object_dict', 'tree') and isinstance(v, bytes):
+                v = v.decode('utf-8')
+            attr_dict[k] = v
         return attr_dict
 
     def set_attr(self, session, k, v, **kwargs):
@@ -186,18 +180,63 @@ class AttributeMixin(object):
         for retrieving the object identifiers.
         :return:
         """
-        if getattr(self, 'set_' + k, None):
+        setter = self._attribute_maps()[2].get(k)
+        if setter:
             # setter method exists
-            getattr(self, 'set_' + k)(session, v, **kwargs)
+            getattr(self, setter)(session, v, **kwargs)
         else:
             setattr(self, k, v)
 
     def get_attr(self, session, k):
-        if getattr(self, 'get_' + k, None):
+        getter = self._attribute_maps()[1].get(k)
+        if getter:
             # getter method exists
-            return getattr(self, 'get_' + k)(session)
+            return getattr(self, getter)(session)
         else:
             return getattr(self, k)
 
+    @classmethod
+    def _attribute_maps(cls):
+        """Attribute names, getters and setters of the model class.
+
+        Computed once per class rather than inspecting the class for every
+        object converted. Relationships and backrefs add attributes to the
+        classes, so the maps are reset whenever mappers get configured.
+        """
+        try:
+            return _ATTRIBUTE_MAPS[cls]
+        except KeyError:
+            pass
+        exclude = getattr(cls, '_exclude_to', [])
+        names = []
+        getters = {}
+        setters = {}
+        for k in dir(cls):
+            value = getattr(cls, k)
+            if k.startswith('get_') and callable(value):
+                getters[k[4:]] = k
+            elif k.startswith('set_') and callable(value):
+                setters[k[4:]] = k
+            if (not k.startswith('_') and k not in exclude and
+                    not callable(value)):
+                names.append(k)
+        _ATTRIBUTE_MAPS[cls] = (names, getters, setters,
+                                frozenset(names + list(exclude)))
+        return _ATTRIBUTE_MAPS[cls]
+
+    def _attribute_names(self):
+        """Names of the attributes exported by to_attr."""
+        maps = self._attribute_maps()
+        # Attributes only set on this object, outside of the model
+        extra = [k for k, v in list(self.__dict__.items())
+                 if k not in maps[3] and not k.startswith('_') and
+                 not callable(v)]
+        return maps[0] + extra if extra else maps[0]
+
+
+@sa.event.listens_for(orm.Mapper, 'after_configured')
+def _reset_attribute_maps():
+    _ATTRIBUTE_MAPS.clear()
+
 
 Base = declarative.declarative_base(cls=AimBase)
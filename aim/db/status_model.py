@@ -46,14 +46,11 @@ class Fault(model_base.Base, model_base.AttributeMixin):
         mapping of model properties to resource attributes.
         """
         result = {}
-        for k in dir(self):
-            if (not k.startswith('_') and
-                    k not in getattr(self, '_exclude_to', []) and
-                    not callable(getattr(self, k))):
-                if k == 'last_update_timestamp':
-                    result[k] = str(self.get_attr(session, k))
-                else:
-                    result[k] = self.get_attr(session, k)
+        for k in self._attribute_names():
+            if k == 'last_update_timestamp':
+                result[k] = str(self.get_attr(session, k))
+            else:
+                result[k] = self.get_attr(session, k)
         return result
 
 
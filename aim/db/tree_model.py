@@ -49,6 +49,15 @@ class Tree(model_base.Base, model_base.AttributeMixin):
                               lazy="joined")
 
 
+class RootCost(model_base.Base):
+    """Shared snapshot of the root costs used to assign roots to agents."""
+
+    __tablename__ = 'aim_tenant_assignment_costs'
+
+    root_rn = sa.Column(sa.String(64), primary_key=True)
+    cost = sa.Column(sa.Integer, nullable=False)
+
+
 class TypeTreeBase(object):
     root_rn = sa.Column(sa.String(64), primary_key=True, name='tenant_rn')
     root_full_hash = sa.Column(sa.String(256), nullable=True)
@@ -83,15 +83,15 @@ class AIMController(object):
         for klass in klasses:
             all_resources.extend(self.mgr.find(
                 self.ctx, klass, include_aim_id=True, **filters))
-        for obj in all_resources:
-            if get_status:
-                status = self.mgr.get_status(self.ctx, obj,
-                                             create_if_absent=False)
-                if status:
-                    faults = status.faults
-                    del status.faults
-                    data.append(self._generate_data_item(status))
-                    data.extend([self._generate_data_item(f) for f in faults])
+        statuses = (self.mgr.get_statuses_with_faults(self.ctx,
+                                                      all_resources)
+                    if get_status else [None] * len(all_resources))
+        for obj, status in zip(all_resources, statuses):
+            if status:
+                faults = status.faults
+                del status.faults
+                data.append(self._generate_data_item(status))
+                data.extend([self._generate_data_item(f) for f in faults])
             data.append(self._generate_data_item(obj))
         return self._generate_response(data)
 
@@ -107,9 +107,9 @@ class AIMController(object):
         except AttributeError:
             body = json.loads(cherrypy.request.body.read())
         with self.ctx.store.begin(subtransactions=True):
-            for item in body:
-                res = self._generate_aim_resource(item)
-                self.mgr.create(self.ctx, res, overwrite=True)
+            self.mgr.create_bulk(
+                self.ctx, [self._generate_aim_resource(item) for item in body],
+                overwrite=True)
 
     def DELETE(self, path_, *args, **kwargs):
         _, klasses, filters = self._inspect_selection_query(**kwargs)
@@ -198,5 +198,5 @@ def main():
     try:
         run(aim_cfg.CONF, False)
     except (RuntimeError, ValueError) as e:
-        LOG.error("%s CherryPy Server terminated!" % e)
+        LOG.error("%s CherryPy Server terminated!", e)
         sys.exit(1)
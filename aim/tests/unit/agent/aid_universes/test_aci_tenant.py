@@ -24,11 +24,13 @@ import mock
 from aim.agent.aid.universes.aci import aci_universe
 from aim.agent.aid.universes.aci import converter
 from aim.agent.aid.universes.aci import tenant as aci_tenant
+from aim import aim_manager
 from aim.api import infra as api_infra
 from aim.api import resource as a_res
 from aim.common.hashtree import structured_tree
 from aim.common import utils
 from aim import config as aim_cfg
+from aim.db import infra_model
 from aim.tests import base
 from aim import tree_manager
 
@@ -491,6 +493,306 @@ class TestAciTenant(base.TestAimDBBase, TestAciClientMixin):
         self.manager._event_loop()
         self.manager.tenant_name = old_name
 
+    def test_coalesce_events(self):
+        bd_dn = 'uni/tn-test-tenant/BD-bd1'
+        ctx_dn = 'uni/tn-test-tenant/ctx-vrf1'
+        events = [
+            {'fvBD': {'attributes': {'dn': bd_dn, 'status': 'created',
+                                     'arpFlood': 'no'}}},
+            {'fvBD': {'attributes': {'dn': bd_dn, 'status': 'modified',
+                                     'nameAlias': 'bd'}}},
+            {'fvCtx': {'attributes': {'dn': ctx_dn, 'status': 'created'}}},
+            {'fvBD': {'attributes': {'dn': bd_dn, 'status': 'modified',
+                                     'arpFlood': 'yes'}}},
+            {'fvCtx': {'attributes': {'dn': ctx_dn, 'status': 'deleted'}}},
+            {'fvTenant': {'attributes': {'dn': 'uni/tn-test-tenant'},
+                          'children': []}},
+        ]
+        self.manager._coalesce_events(events)
+        self.assertEqual(
+            [{'fvBD': {'attributes': {'dn': bd_dn, 'status': 'created',
+                                      'arpFlood': 'yes', 'nameAlias': 'bd'}}},
+             {'fvCtx': {'attributes': {'dn': ctx_dn, 'status': 'deleted'}}},
+             {'fvTenant': {'attributes': {'dn': 'uni/tn-test-tenant'},
+                           'children': []}}],
+            list(self.manager._pending_events.values()))
+        self.assertEqual({'received': 6, 'suppressed': 3},
+                         self.manager.event_stats)
+        # Created after deleted replaces the deletion
+        self.manager._coalesce_events(
+            [{'fvCtx': {'attributes': {'dn': ctx_dn, 'status': 'created',
+                                       'name': 'vrf1'}}}])
+        self.assertEqual(
+            {'fvCtx': {'attributes': {'dn': ctx_dn, 'status': 'created',
+                                      'name': 'vrf1'}}},
+            list(self.manager._pending_events.values())[-1])
+        self.assertEqual({'received': 7, 'suppressed': 4},
+                         self.manager.event_stats)
+
+    def test_event_loop_coalescing_window(self):
+        old_name = self.manager.tenant_name
+        self.manager.tenant_name = 'tn-test-tenant'
+        self.manager.event_coalescing_window = 60
+        self.manager._subscribe_tenant()
+        self.manager._warm = True
+        self._set_events(self._init_event())
+        with mock.patch.object(self.manager, '_fill_events') as fill:
+            self.manager._event_loop()
+            # Events are held within the window
+            self.assertFalse(fill.called)
+            self.assertTrue(self.manager._pending_events)
+            self.manager._pending_since -= 60
+            self.manager._event_loop()
+            self.assertTrue(fill.called)
+        self.assertEqual({}, self.manager._pending_events)
+        self.manager.tenant_name = old_name
+
+    def test_event_loop_no_coalescing_window(self):
+        self.manager.event_coalescing_window = 0
+        self.manager._warm = True
+        event = {'fvBD': {'attributes': {'dn': 'uni/tn-tenant-1/BD-bd',
+                                         'status': 'modified',
+                                         'arpFlood': 'yes'}}}
+        ac_context = self.manager.ac_context
+        with mock.patch.object(ac_context, 'has_event', return_value=True), \
+                mock.patch.object(ac_context, 'get_event_data',
+                                  return_value=[event]), \
+                mock.patch.object(self.manager, '_fill_events',
+                                  return_value=[]) as fill, \
+                mock.patch.object(self.manager, '_event_to_tree'):
+            self.manager._event_loop()
+            # Events are processed in the iteration that received them
+            fill.assert_called_once_with([event])
+        self.assertEqual({}, self.manager._pending_events)
+
+    def test_event_loop_resync(self):
+        old_name = self.manager.tenant_name
+        self.manager.tenant_name = 'tn-test-tenant'
+        self.manager._subscribe_tenant()
+        self._set_events(self._init_event())
+        self.manager._event_loop()
+        state = self.manager._state
+        self.assertIsNotNone(state.root)
+        bd_key = ('fvTenant|test-tenant', 'fvBD|test')
+        bd_node = state.find(bd_key)
+        self.assertIsNotNone(bd_node)
+        before = str(state)
+        reconcile = 'aim.agent.aid.event_handler.EventHandler.reconcile'
+        # Same snapshot, nothing changes
+        with mock.patch(reconcile) as reconcile_mock:
+            self.manager._unsubscribe_tenant()
+            self.manager._subscribe_tenant()
+            self._set_events(self._init_event())
+            self.manager._event_loop()
+            self.assertFalse(reconcile_mock.called)
+        self.assertIs(state, self.manager._state)
+        self.assertIs(bd_node, state.find(bd_key))
+        # Only the differing subtree is replaced
+        events = self._init_event()
+        events[2]['fvBD']['attributes']['arpFlood'] = 'yes'
+        with mock.patch(reconcile) as reconcile_mock:
+            self.manager._unsubscribe_tenant()
+            self.manager._subscribe_tenant()
+            self._set_events(events)
+            self.manager._event_loop()
+            self.assertTrue(reconcile_mock.called)
+        self.assertIs(bd_node, state.find(bd_key))
+        self.assertNotEqual(before, str(state))
+        self.manager.tenant_name = old_name
+
+    def test_event_dispatcher(self):
+        self.set_override('websocket_event_dispatcher', True, 'aim')
+        aci_universe.ac_context = None
+        with mock.patch.object(aci_universe.WebSocketEventDispatcher,
+                               'start', lambda x: x):
+            ac_context = aci_universe.get_apic_clients_context(
+                self.cfg_manager, None)
+        dispatcher = ac_context.dispatcher
+        self.assertIsNotNone(dispatcher)
+        manager = aci_tenant.AciTenantManager(
+            'tn-test-tenant', self.cfg_manager, ac_context)
+        manager._subscribe_tenant()
+        urls = manager.tenant.urls
+        self.assertIsNotNone(dispatcher.get_queue(urls))
+        self.assertFalse(ac_context.has_event(urls))
+
+        # Session events are routed to the tenant queue
+        self._set_events(self._init_event(), manager=manager, tag=False)
+        self.assertFalse(ac_context.has_event(urls))
+        self.assertTrue(dispatcher._dispatch())
+        self.assertFalse(dispatcher._dispatch())
+        self.assertTrue(ac_context.has_event(urls))
+        self.assertTrue(ac_context.wait_for_events(urls, 0))
+        events = ac_context.get_event_data(urls)
+        self.assertEqual(self._init_event(), events)
+        self.assertFalse(ac_context.has_event(urls))
+
+        # Waiters are woken up by notifications
+        result = []
+        thd = utils.spawn_thread(
+            lambda: result.append(ac_context.wait_for_events(urls, 30)))
+        start = time.time()
+        while not result and time.time() - start < 10:
+            manager.push_aim_resources({})
+            time.sleep(0.1)
+        thd.join(10)
+        self.assertEqual([False], result)
+
+        # Unsubscribing removes the queue
+        manager._unsubscribe_tenant()
+        self.assertIsNone(dispatcher.get_queue(urls))
+        self.assertEqual([], ac_context.get_event_data(urls))
+        aci_universe.ac_context = None
+
+    def test_event_dispatcher_wait_fallback(self):
+        ac_context = mock.Mock()
+        dispatcher = aci_universe.WebSocketEventDispatcher(ac_context)
+        # The private queue of the subscription thread went away
+        del ac_context.session.subscription_thread._event_q
+        with mock.patch.object(aci_universe.time, 'sleep') as sleep, \
+                mock.patch.object(aci_universe.LOG, 'warning') as warning:
+            dispatcher._wait_for_session_events(0.5)
+            dispatcher._wait_for_session_events(0.5)
+        sleep.assert_has_calls([mock.call(0.5), mock.call(0.5)])
+        self.assertEqual(1, warning.call_count)
+
+    def test_worker_pool(self):
+
+        class FakeTask(object):
+
+            def __init__(self, runs):
+                self.runs = runs
+                self.calls = 0
+
+            def _run_task(self):
+                self.calls += 1
+                self.runs -= 1
+                return 0 if self.runs > 0 else None
+
+        def wait_for(condition):
+            start = time.time()
+            while not condition() and time.time() - start < 10:
+                time.sleep(0.05)
+            self.assertTrue(condition())
+
+        pool = aci_tenant.TenantWorkerPool(2)
+        tasks = [FakeTask(3) for x in range(10)]
+        for task in tasks:
+            pool.schedule(task)
+        wait_for(lambda: all(x.calls == 3 for x in tasks))
+        wait_for(lambda: len(pool) == 0)
+
+        # Scheduling a task earlier brings it forward
+        task = FakeTask(1)
+        pool.schedule(task, delay=3600)
+        time.sleep(0.1)
+        self.assertEqual(0, task.calls)
+        self.assertEqual(1, len(pool))
+        pool.schedule(task)
+        wait_for(lambda: task.calls == 1)
+        # Unscheduled tasks are not run
+        task = FakeTask(1)
+        pool.schedule(task, delay=0.1)
+        pool.unschedule(task)
+        time.sleep(0.3)
+        self.assertEqual(0, task.calls)
+
+    def test_run_task(self):
+        pool = mock.Mock()
+        with mock.patch.object(aci_tenant, 'get_worker_pool',
+                               return_value=pool):
+            manager = aci_tenant.AciTenantManager(
+                'tn-1', self.cfg_manager,
+                aci_universe.get_apic_clients_context(self.cfg_manager,
+                                                      None)).start()
+        pool.schedule.assert_called_once_with(manager)
+        self.assertIsNone(manager._thread)
+        self.assertFalse(manager.dead)
+        # First step subscribes the tenant
+        self.assertEqual(manager.polling_yield, manager._run_task())
+        self.assertTrue(manager.is_warm())
+        self.assertEqual(manager.polling_yield, manager._run_task())
+        # Pushing resources wakes up the task
+        pool.schedule.reset_mock()
+        manager.push_aim_resources({'create': [self._get_example_aim_bd()]})
+        pool.schedule.assert_called_once_with(manager)
+        # Scheduled reset
+        manager.scheduled_reset = 0
+        self.assertEqual(0, manager._run_task())
+        self.assertFalse(manager.is_warm())
+        # Failures back off until the manager is destroyed
+        manager.max_retries = 2
+        manager._subscribe_tenant = mock.Mock(side_effect=Exception)
+        self.assertIsNotNone(manager._run_task())
+        self.assertFalse(manager.dead)
+        self.assertIsNone(manager._run_task())
+        self.assertTrue(manager.dead)
+        pool.unschedule.assert_called_once_with(manager)
+        self.assertIsNone(manager._run_task())
+
+    def test_get_capabilities(self):
+        session = mock.Mock()
+        session.GET.return_value = [
+            {'firmwareCtrlrRunning': {'attributes': {'version': '5.2(1g)'}}}]
+        probes = {'fvBD': mock.Mock(return_value=True),
+                  'fvFoo': mock.Mock(return_value=False)}
+        support_mgr = infra_model.ACISupportedMoManager(
+            self.ctx, aim_manager.AimManager())
+        with mock.patch.object(aci_tenant, '_refresh_probes') as refresh:
+            result = aci_tenant.get_capabilities(session, probes)
+            self.assertEqual({'fvBD': True, 'fvFoo': False}, result)
+            self.assertEqual(result, support_mgr.get_probe_results('5.2(1g)'))
+            self.assertFalse(refresh.called)
+
+            # Persisted probes are not run again, only refreshed
+            probes['fvBar'] = mock.Mock(return_value=True)
+            on_refresh = mock.Mock()
+            result = aci_tenant.get_capabilities(session, probes,
+                                                 on_refresh=on_refresh)
+            self.assertEqual({'fvBD': True, 'fvFoo': False, 'fvBar': True},
+                             result)
+            self.assertEqual(1, probes['fvBD'].call_count)
+            self.assertEqual(1, probes['fvFoo'].call_count)
+            self.assertEqual(1, probes['fvBar'].call_count)
+            refresh.assert_called_once_with(
+                session, '5.2(1g)',
+                {'fvBD': probes['fvBD'], 'fvFoo': probes['fvFoo']},
+                on_refresh=mock.ANY)
+            # The version is only retrieved once per session
+            self.assertEqual(1, session.GET.call_count)
+
+        # Background refresh updates the DB and notifies the caller
+        probes['fvFoo'].return_value = True
+        aci_tenant._refresh_probes(session, '5.2(1g)',
+                                   {'fvFoo': probes['fvFoo']},
+                                   on_refresh=on_refresh)
+        on_refresh.assert_called_once_with({'fvFoo': True})
+        self.assertEqual({'fvBD': True, 'fvFoo': True, 'fvBar': True},
+                         support_mgr.get_probe_results('5.2(1g)'))
+
+        # Which reads the version again
+        self.assertEqual(2, session.GET.call_count)
+
+        # A different version is probed again, replacing the old results
+        session = mock.Mock()
+        session.GET.return_value = [
+            {'firmwareCtrlrRunning': {'attributes': {'version': '6.0(1a)'}}}]
+        probes['fvLong' + 'x' * 128] = mock.Mock(return_value=True)
+        aci_tenant.get_capabilities(session, probes)
+        self.assertEqual(2, probes['fvBD'].call_count)
+        self.assertEqual({}, support_mgr.get_probe_results('5.2(1g)'))
+        # Without version, nothing is persisted
+        session = mock.Mock()
+        session.GET.side_effect = Exception
+        aci_tenant.get_capabilities(session, {'fvBaz': probes['fvBD']})
+        # Nor are probe names that don't fit
+        self.assertEqual(set(['fvBD', 'fvFoo', 'fvBar']),
+                         set(support_mgr.get_probe_results('6.0(1a)')))
+        # Probe failures are raised
+        probes['fvBD'].side_effect = KeyError
+        self.assertRaises(KeyError, aci_tenant.get_capabilities, session,
+                          probes)
+
     def test_login_failed(self):
         # Mock response and login
         with mock.patch('acitoolkit.acitoolkit.Session.login',
@@ -603,6 +905,54 @@ class TestAciTenant(base.TestAimDBBase, TestAciClientMixin):
         manager._main_loop()
         self.assertEqual(1, manager._unsubscribe_tenant.call_count)
 
+    def test_push_aim_resources_batched(self):
+        self.manager.push_batch_size = 2
+        self.manager.creation_succeeded = mock.Mock()
+        self.manager.creation_failed = mock.Mock()
+        post = self.manager.ac_context.aci_session.post_body_dict
+        bds = [self._get_example_aim_bd(name='bd%s' % x) for x in range(3)]
+        subj1 = a_res.ContractSubject(tenant_name='test-tenant',
+                                      contract_name='c', name='s',
+                                      in_filters=['i1', 'i2'],
+                                      out_filters=['o1', 'o2'])
+        self.manager.push_aim_resources({'create': bds + [subj1]})
+        self.manager._push_aim_resources()
+        # BDs are posted in batches under their tenant, the subject alone
+        self.assertEqual(3, post.call_count)
+        body = post.call_args_list[0][0][1]
+        self.assertEqual(('test-tenant',), post.call_args_list[0][0][2:])
+        self.assertEqual('modified',
+                         body['fvTenant']['attributes']['status'])
+        self.assertEqual(
+            ['bd0', 'bd1'],
+            sorted(x['fvBD']['attributes']['name']
+                   for x in body['fvTenant']['children']))
+        self.assertEqual(('test-tenant', 'bd2'),
+                         post.call_args_list[1][0][2:])
+        self.assertEqual(('test-tenant', 'c', 's'),
+                         post.call_args_list[2][0][2:])
+        self.assertEqual(4, self.manager.creation_succeeded.call_count)
+        self.assertFalse(self.manager.creation_failed.called)
+
+        # Failed batches are bisected to find the failing object
+        post.reset_mock()
+        self.manager.creation_succeeded.reset_mock()
+        self.manager.push_batch_size = 10
+
+        def post_body(mo, body, *params):
+            if 'bd1' in str(body):
+                raise Exception('Failed')
+        post.side_effect = post_body
+        self.manager.push_aim_resources({'create': bds})
+        self.manager._push_aim_resources()
+        self.assertEqual(
+            ['bd0', 'bd2'],
+            sorted(x[0][0].name for x in
+                   self.manager.creation_succeeded.call_args_list))
+        self.manager.creation_failed.assert_called_once_with(
+            bds[1], 'Failed', mock.ANY)
+        post.side_effect = None
+
     def test_push_aim_resources(self):
         # Create some AIM resources
         bd1 = self._get_example_aim_bd()
@@ -773,6 +1123,35 @@ class TestAciTenant(base.TestAimDBBase, TestAciClientMixin):
         self.assertEqual(utils.deep_sort([parent_bd, complete]),
                          utils.deep_sort(events))
 
+    def test_fill_events_batched(self):
+        bds = [{'fvBD': {'attributes': {
+            'arpFlood': 'no', 'dn': 'uni/tn-test-tenant/BD-test%s' % x,
+            'epMoveDetectMode': '', 'ipLearning': 'yes',
+            'limitIpLearnToSubnets': 'no', 'nameAlias': '',
+            'unicastRoute': 'yes', 'unkMacUcastAct': 'proxy'}}}
+            for x in range(3)]
+        self._add_data_to_tree(bds, self.backend_state)
+        events = [{'fvBD': {'attributes': {
+            'descr': 'test%s' % x, 'dn': 'uni/tn-test-tenant/BD-test%s' % x,
+            'status': 'modified'}}} for x in range(3)]
+        # A modification followed by a full object
+        created = {'fvBD': {'attributes': {
+            'arpFlood': 'yes', 'dn': 'uni/tn-test-tenant/BD-test2'}}}
+        events.append(created)
+        events_copy = copy.deepcopy(events)
+        self.manager.get_resources = mock.Mock(
+            side_effect=self.manager.get_resources)
+        result = self.manager.retrieve_aci_objects(events)
+        # All the modified objects are retrieved at once
+        self.assertEqual(1, self.manager.get_resources.call_count)
+        self.assertEqual(3, len(self.manager.get_resources.call_args[0][0]))
+        # Events are not modified
+        self.assertEqual(events_copy, events)
+        for x in range(2):
+            bds[x]['fvBD']['attributes']['descr'] = 'test%s' % x
+        self.assertEqual(utils.deep_sort(bds[:2] + [created]),
+                         utils.deep_sort(result))
+
     def test_fill_events_not_found(self):
         events = [
             {"fvRsCtx": {"attributes": {
@@ -1033,6 +1412,28 @@ class TestAciTenant(base.TestAimDBBase, TestAciClientMixin):
             {'delete': aim_converter.convert([vrf])})
         self.assertEqual(2, len(self.manager.object_backlog.queue))
 
+    def test_squash_operations_drained(self):
+        bds = [a_res.BridgeDomain(tenant_name='tn1', name='bd%s' % x)
+               for x in range(100)]
+        for bd in bds:
+            self.manager.push_aim_resources({'create': [bd]})
+        self.assertEqual(100, len(self.manager.object_backlog.queue))
+        # Every object is squashed in its own request
+        bd = copy.deepcopy(bds[50])
+        bd.display_name = 'foo'
+        self.manager.push_aim_resources({'create': [bd]})
+        self.assertEqual(100, len(self.manager.object_backlog.queue))
+        self.assertEqual(
+            'foo',
+            self.manager.object_backlog.queue[50]['create'][0].display_name)
+        # Once drained, objects are queued again
+        self.manager.object_backlog.get()
+        self.manager.push_aim_resources({'create': [bds[0]]})
+        self.assertEqual(100, len(self.manager.object_backlog.queue))
+        self.manager._push_aim_resources()
+        self.assertTrue(self.manager.object_backlog.empty())
+        self.assertEqual({}, self.manager.object_backlog._index)
+
     def test_aci_types_not_convertible_if_monitored(self):
         self.assertEqual({'hostprotPol': ['hostprotPol'],
                           'hostprotRemoteIp': ['hostprotRule'],
@@ -15,6 +15,8 @@
 
 import pprint
 
+import mock
+
 from aim.agent.aid.universes.aci import converter
 from aim.agent.aid.universes.aci.converters import (
     service_graph as conv_service_graph)
@@ -23,6 +25,7 @@ from aim.api import infra as aim_infra
 from aim.api import resource
 from aim.api import service_graph as aim_service_graph
 from aim.api import status as aim_status
+from aim.common import utils as aim_utils
 from aim import config as aim_cfg
 from aim.tests import base
 
@@ -5375,3 +5378,72 @@ class TestAimToAciConverterSpanSpanlbl(TestAimToAciConverterBase,
                   dn=('uni/infra/vsrcgrp-testSrcGrp/spanlbl-testDestGrp1'),
                   nameAlias='', tag='yellow-green')]
     ]
+
+
+class TestConverterPlans(base.BaseTestCase):
+    """Conversion of a recorded tenant dump.
+
+    Compares the compiled conversion plans with the interpreted converters
+    they replace.
+    """
+
+    BDS = 20
+
+    def _aim_tenant(self):
+        tn = 'tn-bench'
+        objects = [resource.Tenant(name=tn, display_name='bench'),
+                   resource.VRF(tenant_name=tn, name='vrf'),
+                   resource.ApplicationProfile(tenant_name=tn, name='ap'),
+                   resource.Filter(tenant_name=tn, name='flt'),
+                   resource.FilterEntry(tenant_name=tn, filter_name='flt',
+                                        name='e1', ip_protocol='tcp',
+                                        dest_from_port='22',
+                                        dest_to_port='22'),
+                   resource.Contract(tenant_name=tn, name='c')]
+        for x in range(self.BDS):
+            name = 'net-%s' % x
+            objects.extend([
+                resource.BridgeDomain(tenant_name=tn, name=name,
+                                      vrf_name='vrf', display_name=name,
+                                      l3out_names=['out']),
+                resource.Subnet(tenant_name=tn, bd_name=name,
+                                gw_ip_mask='10.%s.%s.1/24' % (
+                                    x // 250, x % 250), scope='public'),
+                resource.EndpointGroup(
+                    tenant_name=tn, app_profile_name='ap', name=name,
+                    bd_name=name, display_name=name,
+                    provided_contract_names=['c'],
+                    consumed_contract_names=['c'],
+                    static_paths=[{'path': 'topology/pod-1/paths-101/'
+                                           'pathep-[eth1/%s]' % (x % 48),
+                                   'encap': 'vlan-%s' % (x + 2)}])])
+        return objects
+
+    def _plans(self, compiled):
+        return (converter.compile_plans(converter.resource_map, True,
+                                        compiled=compiled),
+                converter.compile_plans(converter.reverse_resource_map,
+                                        False, compiled=compiled))
+
+    def _run(self, aim_objects, aci_objects, compiled):
+        to_aim, to_aci = self._plans(compiled)
+        aim_utils.clear_dn_caches()
+        with mock.patch.object(converter, 'aci_to_aim_plans', to_aim), \
+                mock.patch.object(converter, 'aim_to_aci_plans', to_aci):
+            return (converter.AimToAciModelConverter().convert(aim_objects),
+                    converter.AciToAimModelConverter().convert(aci_objects))
+
+    def test_tenant_dump(self):
+        aim_objects = self._aim_tenant()
+        # What ACI returns for the same tenant
+        dump = converter.AimToAciModelConverter().convert(aim_objects)
+        self.assertTrue(any('nameAlias' in list(x.values())[0]['attributes']
+                            for x in dump))
+
+        aci_old, aim_old = self._run(aim_objects, dump, False)
+        aci_new, aim_new = self._run(aim_objects, dump, True)
+        self.assertEqual(aci_old, aci_new)
+        self.assertEqual(aim_old, aim_new)
+        self.assertEqual(len(aim_objects), len(aim_new))
+        # The dump is left untouched
+        self.assertEqual(dump, aci_new)
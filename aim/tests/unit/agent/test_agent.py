@@ -243,6 +243,88 @@ class TestAgent(base.TestAimDBBase, test_aci_tenant.TestAciClientMixin):
         self.assertEqual(set(['keyA', 'keyA1', 'keyA2']),
                          set(result + result2 + result3))
 
+    def test_calculate_tenants_ring_reuse(self):
+        agent = self._create_agent()
+        data = tree.StructuredHashTree().include([{'key': ('keyA', 'keyB')}])
+        self.tree_manager.update_bulk(self.ctx, [data])
+        agent._calculate_tenants(self.ctx)
+        ring = agent.ring
+        version = ring.version
+        # No membership change, same ring
+        agent._calculate_tenants(self.ctx)
+        self.assertIs(ring, agent.ring)
+        self.assertEqual(version, ring.version)
+        # New agent is applied as a delta
+        agent2 = self._create_agent(host='h2')
+        result = agent._calculate_tenants(self.ctx)
+        self.assertIs(ring, agent.ring)
+        self.assertNotEqual(version, ring.version)
+        self.assertEqual(set([agent.agent_id, agent2.agent_id]),
+                         set(ring.nodes.keys()))
+        self.assertEqual(set(['keyA']),
+                         set(result + agent2._calculate_tenants(self.ctx)))
+        # Vnodes change rebuilds the ring
+        with mock.patch.object(agent, 'get_vnodes_value', return_value=80):
+            agent._calculate_tenants(self.ctx)
+        self.assertIsNot(ring, agent.ring)
+        self.assertEqual(80, agent.ring.vnodes)
+
+    def test_calculate_tenants_load_mode(self):
+        self.set_override('tenant_assignment_mode', 'load', 'aim')
+        agent = self._create_agent()
+        agent2 = self._create_agent(host='h2')
+        trees = [tree.StructuredHashTree().include(
+            [{'key': ('key%s' % x, 'keyB')}]) for x in range(10)]
+        self.tree_manager.update_bulk(self.ctx, trees)
+        with mock.patch.object(service.hashring.ConsistentHashRing,
+                               'assign_key') as assign:
+            result = agent._calculate_tenants(self.ctx)
+            result2 = agent2._calculate_tenants(self.ctx)
+            self.assertFalse(assign.called)
+        self.assertEqual(set(['key%s' % x for x in range(10)]),
+                         set(result + result2))
+        self.assertEqual(set(), set(result) & set(result2))
+        costs = agent._get_tenant_costs(self.ctx, ['key0', 'notakey'])
+        self.assertEqual(1, costs['notakey'])
+        self.assertTrue(costs['key0'] >= 1)
+
+    def test_calculate_tenants_load_mode_shared_costs(self):
+        self.set_override('tenant_assignment_mode', 'load', 'aim')
+        # The agent with the lowest ID owns the snapshot
+        agents = sorted([self._create_agent(), self._create_agent(host='h2')],
+                        key=lambda x: x.agent_id)
+        tenants = ['key%s' % x for x in range(10)]
+        self.tree_manager.update_bulk(self.ctx, [
+            tree.StructuredHashTree().include([{'key': (x, 'keyB')}])
+            for x in tenants])
+        # Each agent sees a different heavy tenant, assigning from these
+        # costs directly would make them disagree
+        loads = [{tenants[0]: service.TREE_NODE_SIZE * 64},
+                 {tenants[1]: service.TREE_NODE_SIZE * 64}]
+
+        def calculate(loads):
+            results = []
+            for agent, load in zip(agents, loads):
+                # Everybody's snapshot timer expired
+                agent._costs_refreshed = 0
+                with mock.patch.object(agent.tree_manager, 'get_roots_load',
+                                       return_value=load):
+                    results.append(set(agent._calculate_tenants(self.ctx)))
+            # Every tenant is served by exactly one agent
+            self.assertEqual(set(tenants), results[0] | results[1])
+            self.assertEqual(set(), results[0] & results[1])
+            return results
+
+        first = calculate(loads)
+        with mock.patch.object(agents[0].tree_manager, 'get_roots_load',
+                               return_value=loads[0]):
+            self.assertEqual(
+                agents[0]._get_tenant_costs(self.ctx, tenants),
+                self.tree_manager.get_roots_cost(self.ctx))
+        # Costs change, the agents move to the new snapshot together
+        calculate(list(reversed(loads)))
+        self.assertEqual(first, calculate(loads))
+
     @base.requires(['timestamp'])
     def test_down_time_suicide(self):
         with mock.patch.object(service.utils, 'perform_harakiri') as hara:
@@ -21,6 +21,7 @@ Tests for `aim_manager` module.
 """
 
 import copy
+import sys
 import time
 
 import jsonschema
@@ -30,6 +31,7 @@ import six
 from sqlalchemy.orm import exc as sql_exc
 
 from aim import aim_manager
+from aim import aim_store
 from aim.api import infra
 from aim.api import resource
 from aim.api import resource as aim_res
@@ -42,6 +44,7 @@ from aim.common import utils
 from aim import config  # noqa
 from aim.db import api
 from aim.db import hashtree_db_listener
+from aim.db import model_base
 from aim.db import tree_model  # noqa
 from aim import exceptions as exc
 from aim.tests import base
@@ -149,6 +152,248 @@ class TestAimManager(base.TestAimDBBase):
                                                                 name='test'))
         self.assertEqual(aim_status.AciStatus.SYNC_PENDING, vmmd.sync_status)
 
+    def _make_sync_tree(self, tn_name):
+        tn = self.mgr.create(self.ctx, resource.Tenant(name=tn_name))
+        self.mgr.create(self.ctx, resource.ApplicationProfile(
+            tenant_name=tn_name, name='ap'))
+        epgs = [self.mgr.create(self.ctx, resource.EndpointGroup(
+            tenant_name=tn_name, app_profile_name='ap', name=name))
+            for name in ['epg1', 'epg2']]
+        bds = [self.mgr.create(self.ctx, resource.BridgeDomain(
+            tenant_name=tn_name, name='bd%s' % x)) for x in range(4)]
+        subnet = self.mgr.create(self.ctx, resource.Subnet(
+            tenant_name=tn_name, bd_name='bd0', gw_ip_mask='10.0.0.1/24'))
+        return tn, epgs, bds, subnet
+
+    def _sync_statuses(self, tn):
+        # Statuses of a tenant's subtree, stripped of the tenant name
+        return dict(
+            (status.resource_dn.replace(tn.dn, ''),
+             (status.sync_status,
+              status.sync_message.replace(tn.name, '')))
+            for status in self.mgr.find(
+                self.ctx, aim_status.AciStatus, resource_root=tn.rn))
+
+    def _run_sync(self, tn, func, *args, **kwargs):
+        # Tenant t1 goes through the SQL path, the others through the
+        # per-resource one.
+        if tn.name == 't1':
+            return func(self.ctx, *args, **kwargs)
+        with mock.patch.object(self.ctx.store, '_features', []):
+            return func(self.ctx, *args, **kwargs)
+
+    def test_sync_status_propagation(self):
+        # Both tenants must end up with the same statuses
+        trees = [self._make_sync_tree('t1'), self._make_sync_tree('t2')]
+        for tn, epgs, bds, subnet in trees:
+            self._run_sync(tn, self.mgr.set_resource_sync_error, tn)
+            self.mgr.set_resource_sync_synced(self.ctx, epgs[1])
+            # Without status yet
+            self.mgr.create(self.ctx, resource.VRF(tenant_name=tn.name,
+                                                   name='vrf'))
+        self.assertEqual(self._sync_statuses(trees[0][0]),
+                         self._sync_statuses(trees[1][0]))
+        self.assertEqual(
+            (aim_status.AciStatus.SYNC_FAILED,
+             "Parent resource Tenant() is in error state"),
+            self._sync_statuses(trees[0][0])['/BD-bd0'])
+
+        # Parents go pending and cascade to their subtree
+        call_counts = []
+        for tn, epgs, bds, subnet in trees:
+            with mock.patch.object(self.mgr, 'get_status',
+                                   side_effect=self.mgr.get_status) as gs:
+                self._run_sync(tn, self.mgr.set_resource_sync_pending,
+                               epgs[0])
+                call_counts.append(gs.call_count)
+        # Statuses are looked up only for the EPG and its parents
+        self.assertEqual(3, call_counts[0])
+        self.assertEqual(self._sync_statuses(trees[0][0]),
+                         self._sync_statuses(trees[1][0]))
+        result = self._sync_statuses(trees[0][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_PENDING, result[''][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_PENDING,
+                         result['/BD-bd0/subnet-[10.0.0.1/24]'][0])
+        self.assertEqual(aim_status.AciStatus.SYNCED,
+                         result['/ap-ap/epg-epg2'][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_NA,
+                         result['/ctx-vrf'][0])
+
+        for tn, epgs, bds, subnet in trees:
+            self._run_sync(tn, self.mgr.set_resource_sync_error, bds[0],
+                           message='down')
+            self._run_sync(tn, self.mgr.set_resource_sync_error, epgs[0])
+            self._run_sync(tn, self.mgr.set_resource_sync_pending, bds[0],
+                           cascade=False)
+        self.assertEqual(self._sync_statuses(trees[0][0]),
+                         self._sync_statuses(trees[1][0]))
+        result = self._sync_statuses(trees[0][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_PENDING,
+                         result['/BD-bd0'][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_FAILED,
+                         result['/BD-bd0/subnet-[10.0.0.1/24]'][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_FAILED,
+                         result['/ap-ap/epg-epg1'][0])
+
+    def test_bulk_sync_status(self):
+        trees = [self._make_sync_tree('t1'), self._make_sync_tree('t2')]
+        for tn, epgs, bds, subnet in trees:
+            self.mgr.set_resource_sync_error(self.ctx, tn)
+            self.mgr.set_resource_sync_synced(self.ctx, bds[1])
+            self.mgr.update(self.ctx, self.mgr.get_status(self.ctx, bds[2]),
+                            sync_status=aim_status.AciStatus.SYNC_PENDING)
+            # Without status
+            bds.append(self.mgr.create(self.ctx, resource.BridgeDomain(
+                tenant_name=tn.name, name='bd4')))
+        counts = [self._run_sync(tn, self.mgr.set_resources_sync_pending,
+                                 [bds[0], bds[1], bds[3], bds[4], bds[2],
+                                  bds[0]])
+                  for tn, epgs, bds, subnet in trees]
+        # One at a time, bd3 is already set pending by bd0's propagation
+        self.assertEqual([4, 3], counts)
+        self.assertEqual(self._sync_statuses(trees[0][0]),
+                         self._sync_statuses(trees[1][0]))
+        result = self._sync_statuses(trees[0][0])
+        # Parent and subtree of bd0 went pending as well
+        self.assertEqual(aim_status.AciStatus.SYNC_PENDING, result[''][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_PENDING,
+                         result['/BD-bd0/subnet-[10.0.0.1/24]'][0])
+        self.assertEqual(aim_status.AciStatus.SYNC_PENDING,
+                         result['/BD-bd4'][0])
+
+        self.assertEqual(
+            [3, 3], [self._run_sync(tn, self.mgr.set_resources_sync_synced,
+                                    [tn, bds[0], subnet])
+                     for tn, epgs, bds, subnet in trees])
+        self.assertEqual(self._sync_statuses(trees[0][0]),
+                         self._sync_statuses(trees[1][0]))
+        # Statuses already synced aren't written again
+        tn, epgs, bds, subnet = trees[0]
+        with mock.patch.object(self.ctx.store, 'update_all') as update_all:
+            with mock.patch.object(self.mgr, 'update') as update:
+                self.assertEqual(0, self.mgr.set_resources_sync_synced(
+                    self.ctx, [tn, bds[0], subnet]))
+                self.assertFalse(update.called)
+            self.assertFalse(update_all.called)
+
+    def test_identity_derived_values(self):
+        bd = resource.BridgeDomain(tenant_name='t1', name='bd1')
+        self.assertEqual('uni/tn-t1/BD-bd1', bd.dn)
+        self.assertEqual('BD-bd1', bd.rn)
+        self.assertEqual('tn-t1', bd.root)
+        # Cached values don't affect comparison nor serialization
+        self.assertEqual(resource.BridgeDomain(tenant_name='t1', name='bd1'),
+                         bd)
+        self.assertFalse('_derived' in bd.members)
+        self.assertFalse('_derived' in bd.__dict__)
+        # And are reset when the identity changes
+        bd.name = 'bd2'
+        self.assertEqual('uni/tn-t1/BD-bd2', bd.dn)
+        self.assertEqual('BD-bd2', bd.rn)
+        copied = copy.deepcopy(bd)
+        bd.tenant_name = 't2'
+        self.assertEqual('uni/tn-t2/BD-bd2', bd.dn)
+        self.assertEqual('tn-t2', bd.root)
+        self.assertEqual('uni/tn-t1/BD-bd2', copied.dn)
+        self.assertEqual('tn-t1', copied.root)
+        # Other attributes don't reset them
+        with mock.patch('aim.common.utils.get_aci_dn') as get_dn:
+            bd.display_name = 'foo'
+            self.assertEqual('uni/tn-t2/BD-bd2', bd.dn)
+            self.assertFalse(get_dn.called)
+
+    def test_resource_hash(self):
+        epg = resource.EndpointGroup(
+            tenant_name='t1', app_profile_name='ap', name='epg',
+            static_paths=[{'path': 'b', 'encap': 'vlan-2'},
+                          {'path': 'a', 'encap': 'vlan-1'}])
+        same = resource.EndpointGroup(
+            tenant_name='t1', app_profile_name='ap', name='epg',
+            static_paths=[{'path': 'b', 'encap': 'vlan-2'},
+                          {'path': 'a', 'encap': 'vlan-1'}])
+        self.assertEqual(hash(epg), hash(same))
+        self.assertEqual(1, len(set([epg, same])))
+        same.display_name = 'foo'
+        self.assertEqual(hash(epg), hash(same))
+        self.assertEqual(2, len(set([epg, same])))
+        # Hash follows the identity
+        same.name = 'epg2'
+        self.assertNotEqual(hash(epg), hash(same))
+        same.name = 'epg'
+        self.assertEqual(hash(epg), hash(same))
+        # Same identity values with different types don't collide
+        self.assertNotEqual(
+            hash(resource.VRF(tenant_name='t1', name='x')),
+            hash(resource.BridgeDomain(tenant_name='t1', name='x')))
+
+    def test_user_equal(self):
+        epg = resource.EndpointGroup(
+            tenant_name='t1', app_profile_name='ap', name='epg',
+            static_paths=[{'path': 'b', 'encap': 'vlan-2'},
+                          {'path': 'a', 'encap': 'vlan-1'}],
+            provided_contract_names=['c2', 'c1'])
+        other = copy.deepcopy(epg)
+        self.assertTrue(epg.user_equal(other))
+        # Unordered lists
+        other.static_paths.reverse()
+        other.provided_contract_names.reverse()
+        self.assertTrue(epg.user_equal(other))
+        # DB attributes are ignored
+        other.epoch = 2
+        self.assertTrue(epg.user_equal(other))
+        # Changes in place are detected
+        other.provided_contract_names.append('c3')
+        self.assertFalse(epg.user_equal(other))
+        self.assertFalse(epg.user_equal(
+            resource.EndpointGroup(tenant_name='t1', app_profile_name='ap',
+                                   name='epg2')))
+        self.assertFalse(epg.user_equal(
+            resource.BridgeDomain(tenant_name='t1', name='epg')))
+
+    def test_attribute_layout(self):
+        bd = resource.BridgeDomain(name='bd', display_name='foo',
+                                   tenant_name='t1', _error=True)
+        bd1 = resource.BridgeDomain(tenant_name='t1', name='bd',
+                                    display_name='foo', _error=True)
+        self.assertEqual(list(bd.__dict__), list(bd1.__dict__))
+        self.assertEqual(['tenant_name', 'name'], list(bd.__dict__)[:2])
+        self.assertEqual('_error', list(bd.__dict__)[-1])
+        self.assertEqual(bd, bd1)
+        self.assertEqual(
+            {'tenant_name': 't1', 'name': 'bd'},
+            resource.BridgeDomain(tenant_name='t1', name='bd',
+                                  _set_default=False).__dict__)
+
+    def test_bulk_queries(self):
+        self.mgr.create(self.ctx, resource.Tenant(name='t1'))
+        bds = [resource.BridgeDomain(tenant_name='t1', name='bd%s' % x)
+               for x in range(3)]
+        self.mgr.create(self.ctx, bds[0])
+        bds[0].vrf_name = 'vrf'
+        query = self.mgr._query_db
+        with mock.patch.object(self.mgr, '_query_db',
+                               side_effect=query) as query_db:
+            result = self.mgr.create_bulk(self.ctx, bds + [bds[0]],
+                                          overwrite=True)
+            # One query for the three BDs
+            self.assertEqual(1, query_db.call_count)
+        self.assertEqual('vrf', result[0].vrf_name)
+        self.assertEqual(result[0], result[3])
+        self.assertEqual([self.mgr.get(self.ctx, x) for x in bds],
+                         result[:3])
+
+        with mock.patch.object(aim_manager, 'BULK_QUERY_SIZE', 2):
+            with mock.patch.object(self.mgr, '_query_db',
+                                   side_effect=query) as query_db:
+                result = self.mgr.update_bulk(
+                    self.ctx, [(x, {'vrf_name': 'other'}) for x in bds] +
+                    [(resource.BridgeDomain(tenant_name='t2', name='bd0'),
+                      {'vrf_name': 'other'})])
+                self.assertEqual(2, query_db.call_count)
+        self.assertEqual(['other'] * 3, [x.vrf_name for x in result[:3]])
+        self.assertIsNone(result[3])
+        self.assertEqual('other', self.mgr.get(self.ctx, bds[2]).vrf_name)
+
     def test_multiple_statuses(self):
         t1 = self.mgr.create(self.ctx, resource.Tenant(name='t1'))
         t2 = self.mgr.create(self.ctx, resource.Tenant(name='t2'))
@@ -179,6 +424,105 @@ class TestAimManager(base.TestAimDBBase):
         statuses = self.mgr.get_statuses(self.ctx, [])
         self.assertEqual(expected_statuses, statuses)
 
+    def test_statuses_with_faults(self):
+        self.mgr.create(self.ctx, resource.Tenant(name='t1'))
+        bds = [self.mgr.create(self.ctx, resource.BridgeDomain(
+            tenant_name='t1', name='bd%s' % x)) for x in range(5)]
+        for bd in bds[:4]:
+            self.mgr.get_status(self.ctx, bd)
+        for bd in bds[:2]:
+            self.mgr.set_fault(self.ctx, bd, aim_status.AciFault(
+                fault_code='F0952', external_identifier=bd.dn + '/fault-F0952',
+                severity=aim_status.AciFault.SEV_CRITICAL))
+        # Neither an AIM ID, nor a status
+        missing = resource.BridgeDomain(tenant_name='t1', name='bd9')
+        resources = bds + [missing, bds[0]]
+        expected = [self.mgr.get_status(self.ctx, x, create_if_absent=False)
+                    for x in resources]
+        self.assertIsNone(expected[4])
+
+        query = self.mgr._query_db
+        with mock.patch.object(aim_manager, 'BULK_QUERY_SIZE', 2):
+            with mock.patch.object(self.mgr, '_query_db',
+                                   side_effect=query) as query_db:
+                result = self.mgr.get_statuses_with_faults(self.ctx,
+                                                           resources)
+                # BDs by identity, statuses and faults, in chunks of 2
+                self.assertEqual(4 + 3 + 2, query_db.call_count)
+        self.assertIsNot(result[0], result[6])
+        self.assertEqual([1, 1, 0, 0, None, None, 1],
+                         [x and len(x.faults) for x in result])
+        self.assertEqual([x and x.faults for x in expected],
+                         [x and x.faults for x in result])
+        for status in expected + result:
+            if status:
+                status.faults = []
+        self.assertEqual(expected, result)
+        self.assertEqual(
+            set(expected[:4]),
+            set(self.mgr.get_statuses(self.ctx, resources)))
+        # Resources found with their AIM ID skip the first query
+        found = self.mgr.find(self.ctx, resource.BridgeDomain,
+                              include_aim_id=True)
+        with mock.patch.object(self.mgr, '_query_db',
+                               side_effect=query) as query_db:
+            result = self.mgr.get_statuses_with_faults(self.ctx, found)
+            self.assertEqual(2, query_db.call_count)
+        self.assertEqual([1, 1, 0, 0, None],
+                         [x and len(x.faults) for x in result])
+        self.assertEqual([], self.mgr.get_statuses_with_faults(self.ctx, []))
+
+    def test_commit_hooks_materialization(self):
+        store = self.ctx.store
+        pre = mock.Mock(__name__='pre-listener')
+        post = mock.Mock(__name__='post-listener')
+
+        def made(klass):
+            return [x[0][1] for x in make.call_args_list].count(klass)
+
+        # Only the listeners of this test are registered
+        with mock.patch.object(aim_store.SqlAlchemyStore,
+                               '_initialize_hooks'), \
+                mock.patch.dict(store._update_listeners, clear=True), \
+                mock.patch.dict(store._postcommit_listeners, clear=True), \
+                mock.patch.object(aim_store.AimStore, 'make_resource',
+                                  autospec=True,
+                                  side_effect=aim_store.AimStore.make_resource
+                                  ) as make:
+            store.register_before_session_flush_callback(
+                'pre-listener', pre,
+                resource_types=[resource.Tenant, resource.VRF])
+            store.register_after_transaction_ends_callback(
+                'post-listener', post, resource_types=[resource.VRF])
+            tn = self.mgr.create(self.ctx, resource.Tenant(name='t1'))
+            vrf = self.mgr.create(self.ctx, resource.VRF(tenant_name='t1',
+                                                         name='v1'))
+            # One conversion for the get, one for each interested hook
+            self.assertEqual(2, made(resource.Tenant))
+            self.assertEqual(3, made(resource.VRF))
+            self.assertEqual([tn, vrf], [res for x in pre.call_args_list
+                                         for res in x[0][1]])
+            post.assert_called_with([vrf], [], [])
+            # Postcommit listeners see the values generated by the flush
+            self.assertIsNotNone(post.call_args[0][0][0].epoch)
+            self.assertEqual(vrf.epoch, post.call_args[0][0][0].epoch)
+
+            make.reset_mock()
+            post.reset_mock()
+            vrf = self.mgr.update(self.ctx, vrf, display_name='vrf')
+            with_listeners = made(resource.VRF)
+            post.assert_called_once_with([], [vrf], [])
+            self.assertEqual(vrf.epoch, post.call_args[0][1][0].epoch)
+
+            # Nothing is converted when no listener is registered
+            store.unregister_before_session_flush_callback('pre-listener')
+            store.unregister_after_transaction_ends_callback('post-listener')
+            make.reset_mock()
+            self.mgr.update(self.ctx, vrf, display_name='vrf1')
+            self.assertEqual(with_listeners - 2, made(resource.VRF))
+            self.assertEqual(set([resource.VRF]),
+                             set(x[0][1] for x in make.call_args_list))
+
 
 class TestResourceOpsBase(object):
     test_dn = None
@@ -523,6 +867,32 @@ class TestResourceOpsBase(object):
             for res in prereq:
                 self.assertIsNone(self.mgr.get(self.ctx, res))
 
+    def test_bulk(self):
+        self._create_prerequisite_objects()
+        creation_attributes = dict(self.test_identity_attributes)
+        creation_attributes.update(self.test_required_attributes)
+        res = self.resource_class(**creation_attributes)
+        created = self.mgr.create_bulk(self.ctx, [res])
+        self.assertEqual([self.mgr.get(self.ctx, res)], created)
+        if not getattr(self, 'skip_overwrite', False):
+            self.assertEqual(
+                created, self.mgr.create_bulk(self.ctx, [res],
+                                              overwrite=True))
+
+        updated = self.mgr.update_bulk(
+            self.ctx, [(res, self.test_update_attributes)])
+        self.assertEqual([self.mgr.get(self.ctx, res)], updated)
+        for k, v in list(self.test_update_attributes.items()):
+            self.assertTrue(utils.is_equal(v, getattr_canonical(updated[0],
+                                                                k)))
+        # Nothing to update
+        self.assertEqual(updated, self.mgr.update_bulk(
+            self.ctx, [(res, self.test_update_attributes)]))
+
+        self.mgr.delete(self.ctx, res)
+        self.assertEqual([None], self.mgr.update_bulk(
+            self.ctx, [(res, self.test_update_attributes)]))
+
     # REVISIT(ivar): now that the listeners are all mocked this test
     # doesn't look very helpful
     @base.requires(['skip'])
@@ -3357,3 +3727,81 @@ class TestSystemSecurityGroupRule(TestSystemSecurityGroupRuleMixin,
         self.assertEqual(
             'uwb4yv2u6k6lvjrhoi36genjxnhgkevjg24rvhuns7gzmeibpjyq',
             db_obj['metadata']['name'])
+
+
+class TestResourceAttributes(base.TestAimDBBase):
+
+    def test_attribute_order(self):
+        for klass in aim_manager.AimManager.aim_resources:
+            identity = list(klass.identity_attributes)
+            # Same attributes, passed in opposite orders
+            objects = [klass(**dict((k, 'x') for k in attrs))
+                       for attrs in (identity, identity[::-1])]
+            keys = [list(x.__dict__) for x in objects]
+            # Declared attributes first, in declaration order
+            declared = [k for k in klass._attribute_order() if k in keys[0]]
+            self.assertEqual(declared, keys[0][:len(declared)],
+                             klass.__name__)
+            self.assertEqual(keys[0], keys[1], klass.__name__)
+            # Instances share their layout, their dicts have the same size
+            self.assertEqual(sys.getsizeof(objects[0].__dict__),
+                             sys.getsizeof(objects[1].__dict__),
+                             klass.__name__)
+
+
+def _legacy_attribute_names(db_obj):
+    return [k for k in dir(db_obj)
+            if (not k.startswith('_') and
+                k not in getattr(db_obj, '_exclude_to', []) and
+                not callable(getattr(db_obj, k)))]
+
+
+def _legacy_get_attr(db_obj, session, k):
+    if getattr(db_obj, 'get_' + k, None):
+        return getattr(db_obj, 'get_' + k)(session)
+    return getattr(db_obj, k)
+
+
+def _legacy_to_attr(db_obj, session):
+    attr_dict = {}
+    for k in _legacy_attribute_names(db_obj):
+        v = _legacy_get_attr(db_obj, session, k)
+        if k in ('object_dict', 'tree') and isinstance(v, bytes):
+            v = v.decode('utf-8')
+        attr_dict[k] = v
+    return attr_dict
+
+
+class TestModelConversion(base.TestAimDBBase):
+
+    ROWS = 400
+
+    def _rows(self):
+        rows = []
+        for x in range(self.ROWS // 4):
+            bd = resource.BridgeDomain(tenant_name='t%s' % (x % 10),
+                                       name='bd%s' % x, l3out_names=['l3'])
+            epg = resource.EndpointGroup(
+                tenant_name='t%s' % (x % 10), app_profile_name='ap',
+                name='epg%s' % x, bd_name=bd.name)
+            vrf = resource.VRF(tenant_name='t%s' % (x % 10), name='vrf%s' % x)
+            status = aim_status.AciStatus(
+                resource_type='BridgeDomain', resource_id='id%s' % x,
+                resource_root=bd.root, resource_dn=bd.dn)
+            rows.extend(self.ctx.store.make_db_obj(res)
+                        for res in [bd, epg, vrf, status])
+        return rows
+
+    def _convert(self, rows):
+        return [self.ctx.store.to_attr(type(row), row) for row in rows]
+
+    def test_to_attr(self):
+        rows = self._rows()
+        with mock.patch.object(model_base.AttributeMixin, '_attribute_names',
+                               _legacy_attribute_names):
+            with mock.patch.object(model_base.AttributeMixin, 'get_attr',
+                                   _legacy_get_attr):
+                with mock.patch.object(model_base.AttributeMixin, 'to_attr',
+                                       _legacy_to_attr):
+                    legacy = self._convert(rows)
+        self.assertEqual(legacy, self._convert(rows))
@@ -15,6 +15,8 @@
 
 import uuid
 
+import mock
+
 from aim.common import hashring
 from aim.tests import base
 
@@ -152,3 +154,134 @@ class TestHashRing(base.BaseTestCase):
         ring.add_node('a', 6)
         a_count2 = self._count_replicas(ring, 'a')
         self.assertEqual(6, a_count2 / a_count)
+
+    def test_update_nodes(self):
+        ring = hashring.ConsistentHashRing({'a': None, 'b': None})
+        version = ring.version
+        # Same configuration, nothing to do
+        self.assertFalse(ring.update_nodes({'a': None, 'b': 1}))
+        self.assertEqual(version, ring.version)
+        self.assertEqual(80, len(ring._ring))
+
+        # Add one, remove one, change weight of another
+        self.assertTrue(ring.update_nodes({'b': 2, 'c': None}))
+        self.assertNotEqual(version, ring.version)
+        self.assertEqual(set(['b', 'c']), set(ring.nodes.keys()))
+        self.assertEqual(0, self._count_replicas(ring, 'a'))
+        self.assertEqual(80, self._count_replicas(ring, 'b'))
+        self.assertEqual(40, self._count_replicas(ring, 'c'))
+
+        # Result is the same as a freshly built ring
+        fresh = hashring.ConsistentHashRing({'b': 2, 'c': None})
+        self.assertEqual([x.h4sh for x in fresh._ring],
+                         [x.h4sh for x in ring._ring])
+        for x in range(100):
+            key = str(uuid.uuid4())
+            self.assertEqual(fresh.assign_key(key), ring.assign_key(key))
+
+    def test_assignment_memoization(self):
+        ring = hashring.ConsistentHashRing({'a': None, 'b': None, 'c': None})
+        keys = [str(uuid.uuid4()) for x in range(50)]
+        first = dict((k, ring.assign_key(k)) for k in keys)
+        with mock.patch.object(ring, '_hash',
+                               side_effect=ring._hash) as hash_mock:
+            # Memoized assignments don't need any hashing
+            self.assertEqual(first,
+                             dict((k, ring.assign_key(k)) for k in keys))
+            self.assertEqual(0, hash_mock.call_count)
+            # Ring change invalidates assignments but not key hashes
+            ring.remove_node('c')
+            second = dict((k, ring.assign_key(k)) for k in keys)
+            self.assertEqual(0, hash_mock.call_count)
+        for k in keys:
+            self.assertNotEqual(['c'], second[k])
+            if first[k] != ['c']:
+                # Keys not owned by the removed node didn't move
+                self.assertEqual(first[k], second[k])
+
+    def test_key_cache_size(self):
+        ring = hashring.ConsistentHashRing({'a': None, 'b': None},
+                                           key_cache_size=10)
+        for x in range(25):
+            ring.assign_key(str(x))
+            self.assertTrue(len(ring._key_hashes) <= 10)
+            self.assertTrue(len(ring._assignments) <= 10)
+
+    def test_assign_keys_with_load(self):
+        ring = hashring.ConsistentHashRing({'a': None, 'b': None, 'c': None})
+        # A few heavy keys and many light ones
+        costs = dict(('key-%s' % x, 1) for x in range(300))
+        costs.update(dict(('heavy-%s' % x, 64) for x in range(6)))
+        result = ring.assign_keys_with_load(costs, load_factor=1.1)
+        self.assertEqual(set(costs.keys()), set(result.keys()))
+        load = {'a': 0, 'b': 0, 'c': 0}
+        for key, nodes in list(result.items()):
+            self.assertEqual(1, len(nodes))
+            load[nodes[0]] += costs[key]
+        total = sum(costs.values())
+        for node in load:
+            self.assertTrue(load[node] <= total * 1.1 / 3)
+        # Reproducible by a different instance
+        ring2 = hashring.ConsistentHashRing({'c': None, 'a': None, 'b': None})
+        self.assertEqual(result,
+                         ring2.assign_keys_with_load(costs, load_factor=1.1))
+
+    def test_assign_keys_with_load_movement(self):
+        ring = hashring.ConsistentHashRing({'a': None, 'b': None, 'c': None})
+        costs = dict(('key-%s' % x, 1) for x in range(300))
+        # With a loose bound, the result is the plain consistent hashing
+        result = ring.assign_keys_with_load(costs, load_factor=10)
+        for key in costs:
+            self.assertEqual(ring.assign_key(key)[0], result[key][0])
+        # Adding a node only moves keys to the new node
+        before = ring.assign_keys_with_load(costs)
+        ring.add_node('d')
+        after = ring.assign_keys_with_load(costs)
+        moved = [x for x in costs if before[x] != after[x]]
+        self.assertTrue(moved)
+        self.assertTrue(len(moved) < len(costs) / 2)
+        self.assertTrue(
+            len([x for x in moved if after[x] == ['d']]) > len(moved) / 2)
+
+    def test_assign_keys_with_load_oversized(self):
+        ring = hashring.ConsistentHashRing({'a': None, 'b': None},
+                                           replicas=2)
+        # One key is bigger than any node capacity
+        result = ring.assign_keys_with_load({'big': 100, 'small': 1})
+        self.assertEqual(set(['a', 'b']), set(result['big']))
+        self.assertEqual(set(['a', 'b']), set(result['small']))
+        self.assertEqual(
+            {}, hashring.ConsistentHashRing().assign_keys_with_load(
+                {'key': 1}))
+
+
+class TestHashRingServeCycle(base.BaseTestCase):
+    """Serving cycles with the maximum vnodes allowed by the rebalance CLI"""
+
+    TENANTS = 200
+    VNODES = 400
+    AGENTS = 5
+
+    def setUp(self):
+        super(TestHashRingServeCycle, self).setUp()
+        self.tenants = ['tn-%s' % x for x in range(self.TENANTS)]
+        self.agents = dict(('aid-%s' % x, None) for x in range(self.AGENTS))
+
+    def _cycle(self, ring):
+        return dict((tenant, ring.assign_key(tenant))
+                    for tenant in self.tenants)
+
+    def test_serve_cycle(self):
+        ring = hashring.ConsistentHashRing(self.agents, vnodes=self.VNODES)
+        expected = self._cycle(ring)
+        # Same membership, the ring is kept
+        ring.update_nodes(self.agents)
+        self.assertEqual(expected, self._cycle(ring))
+        # Agent leaves the cluster, the delta gives the same ring as a rebuild
+        agents = dict(self.agents)
+        agents.pop('aid-0')
+        ring.update_nodes(agents)
+        self.assertEqual(
+            self._cycle(hashring.ConsistentHashRing(agents,
+                                                    vnodes=self.VNODES)),
+            self._cycle(ring))
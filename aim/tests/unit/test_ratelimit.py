@@ -0,0 +1,100 @@
+# Copyright (c) 2016 Cisco Systems
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+from aim.common import ratelimit
+from aim.common import utils
+from aim.tests import base
+
+
+class TestRequestGovernor(base.BaseTestCase):
+
+    def _wait_waiting(self, governor, count):
+        start = time.time()
+        while (governor.get_stats()['waiting'] < count and
+               time.time() - start < 10):
+            time.sleep(0.01)
+        self.assertEqual(count, governor.get_stats()['waiting'])
+
+    def test_unlimited(self):
+        governor = ratelimit.RequestGovernor()
+        func = governor.wrap(lambda x: x + 1)
+        for x in range(100):
+            self.assertEqual(x + 1, func(x))
+        stats = governor.get_stats()
+        self.assertEqual(100, stats['requests'])
+        self.assertEqual(0, stats['queued'])
+        self.assertEqual(0, stats['in_flight'])
+
+    def test_rate(self):
+        governor = ratelimit.RequestGovernor(rate=50, burst=5)
+        start = time.time()
+        for x in range(10):
+            with governor.limit():
+                pass
+        # 5 requests out of the bucket, 5 at 50 per second
+        self.assertTrue(time.time() - start >= 0.09)
+        stats = governor.get_stats()
+        self.assertEqual(10, stats['requests'])
+        self.assertTrue(stats['queued'] >= 4)
+        self.assertTrue(stats['max_wait'] > 0)
+
+    def test_max_in_flight(self):
+        governor = ratelimit.RequestGovernor(max_in_flight=2)
+        lock = threading.Lock()
+        current = [0]
+        result = [0]
+
+        def request():
+            with lock:
+                current[0] += 1
+                result[0] = max(result[0], current[0])
+            time.sleep(0.05)
+            with lock:
+                current[0] -= 1
+        request = governor.wrap(request)
+        threads = [utils.spawn_thread(request) for x in range(6)]
+        for thd in threads:
+            thd.join(10)
+        self.assertEqual(2, result[0])
+        self.assertEqual(6, governor.get_stats()['requests'])
+
+    def test_owner_fairness(self):
+        governor = ratelimit.RequestGovernor(max_in_flight=1)
+        order = []
+
+        def request(owner):
+            with ratelimit.request_owner(owner):
+                with governor.limit():
+                    order.append(owner)
+
+        # Keep the only slot busy while requests pile up
+        governor.acquire()
+        threads = []
+        for x in range(8):
+            threads.append(utils.spawn_thread(request, 'tn-busy'))
+            self._wait_waiting(governor, x + 1)
+        for x in range(2):
+            threads.append(utils.spawn_thread(request, 'tn-quiet'))
+            self._wait_waiting(governor, x + 9)
+        governor.release()
+        for thd in threads:
+            thd.join(10)
+        self.assertEqual(10, len(order))
+        # The quiet owner doesn't wait for the busy one to be done
+        self.assertEqual(['tn-busy', 'tn-quiet'] * 2, order[:4])
+        self.assertIsNone(ratelimit.get_request_owner())
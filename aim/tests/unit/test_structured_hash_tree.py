@@ -14,13 +14,16 @@
 #    under the License.
 
 import copy
+import logging as std_logging
 
 import mock
 
+from aim.agent.aid.universes.aci import converter
 from aim import aim_manager
 from aim.api import resource
 from aim.common.hashtree import exceptions as exc
 from aim.common.hashtree import structured_tree as tree
+from aim.db import tree_model
 from aim.tests import base
 from aim import tree_manager
 
@@ -476,6 +479,34 @@ class TestStructuredHashTree(base.BaseTestCase):
         node = data4.find(('keyA', 'keyB'))
         self.assertEqual(1, node.metadata['a'])
 
+    def test_sync(self):
+        data = tree.StructuredHashTree().include(
+            [{'key': ('keyA', 'keyB')}, {'key': ('keyA', 'keyC')},
+             {'key': ('keyA', 'keyC', 'keyD')},
+             {'key': ('keyA', 'keyE', 'keyF')}])
+        data2 = tree.StructuredHashTree().include(
+            [{'key': ('keyA', 'keyB')},
+             {'key': ('keyA', 'keyC', 'keyD'), 'attr': 'some_attr'},
+             {'key': ('keyA', 'keyE', 'keyF'), 'attr': 'some_attr',
+              '_metadata': {'a': 1}},
+             {'key': ('keyA', 'keyG')}])
+        untouched = data.find(('keyA', 'keyB'))
+        self.assertFalse(data.sync(copy.deepcopy(data)))
+        self.assertTrue(data.sync(data2))
+        self.assertEqual(data2, data)
+        self.assertEqual(str(data2), str(data))
+        self.assertEqual(data2.diff(data), {'add': [], 'remove': []})
+        # Subtrees in sync are preserved
+        self.assertIs(untouched, data.find(('keyA', 'keyB')))
+        self.assertFalse(data.sync(data2))
+        # Different or empty roots
+        data3 = tree.StructuredHashTree().include([{'key': ('keyZ', 'keyB')}])
+        self.assertTrue(data.sync(data3))
+        self.assertEqual(data3, data)
+        self.assertTrue(data.sync(tree.StructuredHashTree()))
+        self.assertIsNone(data.root)
+        self.assertFalse(data.has_populated)
+
     def test_remove(self):
         data = tree.StructuredHashTree().include(
             [{'key': ('keyA', 'keyB')}, {'key': ('keyA', 'keyC')},
@@ -765,6 +796,52 @@ class TestHashTreeManager(base.TestAimDBBase):
         tenants = self.mgr.get_roots(self.ctx)
         self.assertEqual(set(['keyA', 'keyA1', 'keyA2']), set(tenants))
 
+    def test_get_roots_load(self):
+        if 'sql' not in self.ctx.store.features:
+            self.assertEqual({}, self.mgr.get_roots_load(self.ctx))
+            return
+        data1 = tree.StructuredHashTree().include(
+            [{'key': ('keyA', 'keyB')}, {'key': ('keyA', 'keyC')},
+             {'key': ('keyA', 'keyC', 'keyD')}])
+        data2 = tree.StructuredHashTree().include(
+            [{'key': ('keyA1', 'keyB')}])
+        self.mgr.update_bulk(self.ctx, [data1, data2])
+        with self.ctx.store.begin(subtransactions=True):
+            for x in range(3):
+                self.ctx.store.add(tree_model.ActionLog(
+                    uuid=x, root_rn='keyA1', action='create',
+                    object_type='Tenant', object_dict=b'{}'))
+        # Pending action logs don't count
+        self.assertEqual({'keyA': len(str(data1)), 'keyA1': len(str(data2))},
+                         self.mgr.get_roots_load(self.ctx))
+
+    def test_update_agent_trees(self):
+        data = tree.StructuredHashTree().include([{'key': ('keyA', 'keyB')}])
+        data2 = tree.StructuredHashTree().include(
+            [{'key': ('keyA1', 'keyB')}])
+        data3 = tree.StructuredHashTree().include(
+            [{'key': ('keyA2', 'keyB')}])
+        self.mgr.update_bulk(self.ctx, [data, data2, data3])
+        mgr = aim_manager.AimManager()
+        agent = mgr.create(self.ctx, resource.Agent(
+            agent_type='aid', host='host', binary_file='binary',
+            hash_trees=['keyA'], version='1.0'))
+        updated = self.mgr.update_agent_trees(
+            self.ctx, agent.id, ['keyA1', 'keyA2', 'notakey'])
+        if not updated:
+            self.assertFalse(self.ctx.store.supports_sql)
+            return
+        agent = mgr.get(self.get_new_context(), agent)
+        # Rogue key is ignored
+        self.assertEqual(set(['keyA1', 'keyA2']), set(agent.hash_trees))
+        self.assertTrue(self.mgr.update_agent_trees(self.ctx, agent.id,
+                                                    ['keyA2']))
+        agent = mgr.get(self.get_new_context(), agent)
+        self.assertEqual(['keyA2'], agent.hash_trees)
+        self.assertTrue(self.mgr.update_agent_trees(self.ctx, agent.id, []))
+        agent = mgr.get(self.get_new_context(), agent)
+        self.assertEqual([], agent.hash_trees)
+
     def test_single_session_multi_objects(self):
         with self.ctx.store.begin(subtransactions=True):
             data = tree.StructuredHashTree().include(
@@ -976,6 +1053,54 @@ class TestAimHashTreeMaker(base.TestAimDBBase):
         self.maker.delete(htree, [bd2])
         self.assertFalse(htree.has_subtree())
 
+    def test_conversion_cache(self):
+        tree_manager.clear_conversion_cache()
+        bd = self._get_example_aim_bd(tenant_name='t1', name='bd1')
+        expected = self.maker.aim_res_to_nodes(bd)
+        bd_key = ('fvTenant|t1', 'fvBD|bd1')
+        # Callers get their own copy
+        expected[bd_key]['arpFlood'] = 'yes'
+        result = self.maker.aim_res_to_nodes(
+            self._get_example_aim_bd(tenant_name='t1', name='bd1'))
+        self.assertEqual('no', result[bd_key]['arpFlood'])
+        stats = tree_manager.get_conversion_cache_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+        # Any change converts again
+        bd.enable_arp_flood = True
+        self.assertEqual('yes',
+                         self.maker.aim_res_to_nodes(bd)[bd_key]['arpFlood'])
+        bd.enable_arp_flood = 1
+        self.maker.aim_res_to_nodes(bd)
+        self.assertEqual(3, tree_manager.get_conversion_cache_stats()[
+            'misses'])
+        # Metadata is never cached
+        bd._error = True
+        bd.monitored = True
+        result = self.maker.aim_res_to_nodes(bd)
+        self.assertTrue(result[bd_key]['_error'])
+        self.assertTrue(result[bd_key]['_metadata']['monitored'])
+
+        # Conversion settings are part of the key
+        epg = resource.EndpointGroup(
+            tenant_name='t1', app_profile_name='ap', name='epg',
+            vmm_domains=[{'type': 'OpenStack', 'name': 'ostack'}])
+        dom_key = ('fvTenant|t1', 'fvAp|ap', 'fvAEPg|epg',
+                   'fvRsDomAtt|uni/vmmp-OpenStack/dom-ostack')
+        self.assertEqual('useg',
+                         self.maker.aim_res_to_nodes(epg)[dom_key].get(
+                             'classPref'))
+        self.set_override('disable_micro_segmentation', True, 'aim')
+        self.assertIsNone(
+            self.maker.aim_res_to_nodes(epg)[dom_key].get('classPref'))
+
+        # Unhashable values are converted every time
+        bd.l3out_names = [set()]
+        self.maker.aim_res_to_nodes(bd)
+        self.assertEqual(6, tree_manager.get_conversion_cache_stats()[
+            'size'])
+
 
 class TestTreeBuilder(base.TestAimDBBase):
 
@@ -1099,3 +1224,78 @@ class TestTreeBuilder(base.TestAimDBBase):
         # Should not add parent back
         exp_key = tt_maker._build_hash_tree_key(epg)
         self.assertIsNone(cfg.find(exp_key))
+
+
+class TestTreeBuilderDerivedCache(base.TestAimDBBase):
+    """Full tenant tree build, with and without cached identity values"""
+
+    OBJECTS = 50
+
+    def _build(self, builder, resources):
+        trees = {builder.CONFIG: {'tn-t1': tree.StructuredHashTree()},
+                 builder.MONITOR: {'tn-t1': tree.StructuredHashTree()},
+                 builder.OPER: {'tn-t1': tree.StructuredHashTree()}}
+        builder.build(resources, [], [], trees, aim_ctx=self.ctx)
+        return trees
+
+    def test_tenant_build(self):
+        resources = [resource.Tenant(name='t1')]
+        for x in range(self.OBJECTS):
+            resources.append(resource.BridgeDomain(
+                tenant_name='t1', name='bd%s' % x, vrf_name='vrf'))
+            resources.append(resource.Subnet(
+                tenant_name='t1', bd_name='bd%s' % x,
+                gw_ip_mask='10.%s.%s.1/28' % (x // 256, x % 256)))
+            resources.append(resource.EndpointGroup(
+                tenant_name='t1', app_profile_name='ap', name='epg%s' % x,
+                bd_name='bd%s' % x))
+        builder = tree_manager.HashTreeBuilder(aim_manager.AimManager())
+        with mock.patch.object(resource.ResourceBase, '_get_derived',
+                               lambda self, name, func: func()):
+            expected = self._build(builder, copy.deepcopy(resources))
+        self.assertEqual(expected, self._build(builder, resources))
+
+
+class TestDebugLogging(base.TestAimDBBase):
+    """Sync cycle with logging at INFO level.
+
+    Debug messages used to be formatted before being handed to the logger,
+    whatever the log level. The eager variant patches the loggers to keep
+    doing that.
+    """
+
+    OBJECTS = 50
+    LOGGERS = (converter.LOG, tree_manager.LOG)
+
+    def setUp(self):
+        super(TestDebugLogging, self).setUp()
+        for log in self.LOGGERS:
+            self.addCleanup(log.logger.setLevel, log.logger.level)
+            log.logger.setLevel(std_logging.INFO)
+
+    def _cycle(self, builder, resources):
+        tree_manager.clear_conversion_cache()
+        trees = {builder.CONFIG: {'tn-t1': tree.StructuredHashTree()},
+                 builder.MONITOR: {'tn-t1': tree.StructuredHashTree()},
+                 builder.OPER: {'tn-t1': tree.StructuredHashTree()}}
+        builder.build(resources, [], [], trees, aim_ctx=self.ctx)
+        aci_objects = converter.AimToAciModelConverter().convert(resources)
+        return trees, converter.AciToAimModelConverter().convert(aci_objects)
+
+    def test_info_cycle(self):
+        resources = [resource.Tenant(name='t1')]
+        for x in range(self.OBJECTS):
+            resources.append(resource.BridgeDomain(
+                tenant_name='t1', name='bd%s' % x, vrf_name='vrf'))
+            resources.append(resource.EndpointGroup(
+                tenant_name='t1', app_profile_name='ap', name='epg%s' % x,
+                bd_name='bd%s' % x))
+        builder = tree_manager.HashTreeBuilder(aim_manager.AimManager())
+
+        def eager(msg, *args, **kwargs):
+            return msg % args if args else msg
+
+        with mock.patch.object(converter.LOG, 'debug', eager), \
+                mock.patch.object(tree_manager.LOG, 'debug', eager):
+            expected = self._cycle(builder, resources)
+        self.assertEqual(expected, self._cycle(builder, resources))
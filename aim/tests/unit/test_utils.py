@@ -20,8 +20,10 @@ test_utils
 Tests for `utils` module.
 """
 
+from apicapi import apic_client
 import mock
 
+from aim.api import resource
 from aim.common import utils as internal_utils
 from aim.tests import base
 from aim import utils
@@ -106,6 +108,60 @@ class TestUtils(base.TestAimDBBase):
              ('vzInTerm', 'intmnl'), ('vzRsFiltAtt', 'p')],
             internal_utils.decompose_dn(type, dn))
 
+    def test_dn_cache(self):
+        internal_utils.clear_dn_caches()
+        dn = 'uni/tn-common/brc-p/subj-p/intmnl/rsfiltAtt-p'
+        type = 'vzRsFiltAtt'
+        expected = internal_utils.decompose_dn(type, dn)
+        result = internal_utils.decompose_dn(type, dn)
+        self.assertEqual(expected, result)
+        # Callers get their own copy
+        result.pop()
+        self.assertEqual(expected, internal_utils.decompose_dn(type, dn))
+        self.assertEqual(
+            {'size': 1, 'hits': 2, 'misses': 1, 'hit_rate': 2.0 / 3},
+            internal_utils.get_dn_cache_stats()['decompose'])
+        self.assertEqual(dn, internal_utils.build_dn(expected))
+        self.assertEqual(dn, internal_utils.build_dn(expected))
+        self.assertEqual(1, internal_utils.get_dn_cache_stats()['build'][
+            'hits'])
+        self.assertEqual(
+            apic_client.ManagedObjectClass('fvBD').dn('t1', 'bd1'),
+            internal_utils.get_aci_dn('fvBD', 't1', 'bd1'))
+        self.assertEqual('BD-bd1',
+                         internal_utils.get_aci_rn('fvBD', 't1', 'bd1'))
+        self.assertEqual('BD-bd1',
+                         internal_utils.get_aci_rn('fvBD', 't1', 'bd1'))
+        self.assertEqual(1, internal_utils.get_dn_cache_stats()['rn'][
+            'hits'])
+        self.assertEqual(['t1', 'bd1'], internal_utils.get_dn_identity(
+            'uni/tn-t1/BD-bd1', 'fvBD'))
+        self.assertEqual(['t1', 'bd1'], internal_utils.get_dn_identity(
+            'uni/tn-t1/BD-bd1', 'fvBD'))
+        self.assertEqual(1, internal_utils.get_dn_cache_stats()['identity'][
+            'hits'])
+        self.assertRaises(apic_client.DNManager.InvalidNameFormat,
+                          internal_utils.get_dn_identity,
+                          'uni/tn-t1/BD-bd1', 'fvCtx')
+        # Failures are not cached
+        self.assertIsNone(internal_utils.decompose_dn(type, 'uni/bogus'))
+        self.assertEqual(1, internal_utils.get_dn_cache_stats()['decompose'][
+            'size'])
+
+    def test_bounded_cache(self):
+        cache = internal_utils.BoundedCache(2)
+        self.assertEqual(1, cache.get('a', lambda: 1))
+        self.assertEqual(2, cache.get('b', lambda: 2))
+        self.assertEqual(1, cache.get('a', lambda: 0))
+        # Least recently used is evicted
+        self.assertEqual(3, cache.get('c', lambda: 3))
+        self.assertEqual(1, cache.get('a', lambda: 0))
+        self.assertEqual(4, cache.get('b', lambda: 4))
+        self.assertEqual({'size': 2, 'hits': 2, 'misses': 4,
+                          'hit_rate': 2.0 / 6}, cache.get_stats())
+        self.assertRaises(ValueError, cache.get, 'd', int, 'nan')
+        self.assertEqual(2, cache.get_stats()['size'])
+
     @internal_utils.rlock('test')
     def locked_func(self):
         with internal_utils.get_rlock('test2'):
@@ -118,3 +174,34 @@ class TestUtils(base.TestAimDBBase):
         self.assertTrue('test' in internal_utils.all_locks)
         self.assertTrue('test2' in internal_utils.all_locks)
         self.assertEqual(2, len(internal_utils.all_locks))
+
+
+class TestDnCacheConversions(base.BaseTestCase):
+    """DN conversions over a tenant worth of objects"""
+
+    OBJECTS = 100
+    ROUNDS = 5
+
+    def _run(self, resources):
+        result = []
+        for x in range(self.ROUNDS):
+            for res in resources:
+                result.append((internal_utils.decompose_dn(res._aci_mo_name,
+                                                           res.dn), res.rn))
+        return result
+
+    def test_dn_cache_conversions(self):
+        resources = []
+        for x in range(self.OBJECTS):
+            resources.append(resource.EndpointGroup(
+                tenant_name='t1', app_profile_name='ap', name='epg%s' % x))
+            resources.append(resource.Subnet(
+                tenant_name='t1', bd_name='bd%s' % x,
+                gw_ip_mask='10.%s.%s.1/28' % (x // 256, x % 256)))
+        internal_utils.clear_dn_caches()
+        with mock.patch.object(internal_utils, '_cacheable',
+                               return_value=False):
+            uncached = self._run(resources)
+        self.assertEqual(uncached, self._run(resources))
+        stats = internal_utils.get_dn_cache_stats()
+        self.assertTrue(stats['decompose']['hit_rate'] > 0.7)
@@ -16,6 +16,7 @@
 import copy
 
 from oslo_log import log as logging
+from sqlalchemy.sql.expression import func
 
 from aim.agent.aid.universes.aci import converter
 from aim.api import status as aim_status
@@ -35,6 +36,10 @@ CONFIG_TREE = tree_res.ConfigTree
 OPERATIONAL_TREE = tree_res.OperationalTree
 MONITORED_TREE = tree_res.MonitoredTree
 SUPPORTED_TREES = [CONFIG_TREE, OPERATIONAL_TREE, MONITORED_TREE]
+CONVERSION_CACHE_SIZE = 100000
+# The same AIM resources are converted to ACI objects over and over (tree
+# updates, reconciliation), while most of them didn't change in between.
+_conversion_cache = utils.BoundedCache(CONVERSION_CACHE_SIZE)
 
 
 class TreeManager(object):
@@ -116,7 +121,7 @@ class TreeManager(object):
                                           if_empty=if_empty)
         except exc.HashTreeNotEmpty:
             LOG.warning("Hashtree not empty for root %s, rolling "
-                        "back deletion." % root_rn)
+                        "back deletion.", root_rn)
 
     @utils.log
     def clean_by_root_rn(self, context, root_rn):
@@ -180,8 +185,100 @@ class TreeManager(object):
 
     @utils.log
     def get_roots(self, context):
+        if 'sql' in context.store.features:
+            # Only fetch the RN column, skipping the joined agent
+            # associations that come with the full model.
+            return [x.root_rn for x in context.store.db_session.query(
+                tree_model.Tree.root_rn)]
         return [x.root_rn for x in self._find_query(context, ROOT_TREE)]
 
+    @utils.log
+    def update_agent_trees(self, context, agent_id, root_rns):
+        """Set the trees served by an agent
+
+        Only the association rows that changed are deleted or inserted,
+        without loading and rewriting the whole Agent object. Roots that
+        don't exist anymore are ignored.
+        Only works with sql store.
+
+        :param agent_id: ID of the agent
+        :param root_rns: list of root RNs the agent is serving
+        :return: True if the association was updated, False if this
+        store doesn't support it.
+        """
+        if 'sql' not in context.store.features:
+            return False
+        db_session = context.store.db_session
+        assoc = tree_model.AgentToHashTreeAssociation
+        root_rns = set(root_rns)
+        with context.store.begin(subtransactions=True):
+            current = set(
+                x.tree_root_rn for x in db_session.query(
+                    assoc.tree_root_rn).filter(assoc.agent_id == agent_id))
+            to_delete = current - root_rns
+            if to_delete:
+                db_session.query(assoc).filter(
+                    assoc.agent_id == agent_id,
+                    assoc.tree_root_rn.in_(to_delete)).delete(
+                    synchronize_session=False)
+            to_add = root_rns - current
+            if to_add:
+                rows = [{'agent_id': agent_id, 'tree_tenant_rn': x.root_rn}
+                        for x in db_session.query(
+                            tree_model.Tree.root_rn).filter(
+                            tree_model.Tree.root_rn.in_(to_add))]
+                if rows:
+                    db_session.execute(assoc.__table__.insert(), rows)
+        return True
+
+    def get_roots_load(self, context):
+        """Load metrics of each root
+
+        :return: dictionary with root RN as key and the size of its stored
+        config tree as value. Only works with sql store, returns an empty
+        dictionary otherwise.
+        """
+        if 'sql' not in context.store.features:
+            return {}
+        db_session = context.store.db_session
+        return dict(
+            (x.root_rn, x.size or 0) for x in db_session.query(
+                tree_model.ConfigTree.root_rn,
+                func.length(tree_model.ConfigTree.tree).label('size')))
+
+    def get_roots_cost(self, context):
+        """Shared snapshot of the root costs
+
+        :return: dictionary with root RN as key and its cost as value. Only
+        works with sql store, returns an empty dictionary otherwise.
+        """
+        if 'sql' not in context.store.features:
+            return {}
+        db_session = context.store.db_session
+        return dict((x.root_rn, x.cost)
+                    for x in db_session.query(tree_model.RootCost))
+
+    def set_roots_cost(self, context, costs):
+        """Replace the shared snapshot of the root costs
+
+        :return: whether the stored snapshot changed. Only works with sql
+        store.
+        """
+        if 'sql' not in context.store.features:
+            return False
+        with context.store.begin(subtransactions=True):
+            if self.get_roots_cost(context) == costs:
+                return False
+            db_session = context.store.db_session
+            db_session.query(tree_model.RootCost).delete(
+                synchronize_session=False)
+            if costs:
+                db_session.execute(
+                    tree_model.RootCost.__table__.insert(),
+                    [{'root_rn': x, 'cost': y}
+                     for x, y in list(costs.items())])
+        return True
+
     @utils.log
     def set_needs_reset_by_root_rn(self, context, root_rn, needs_reset=True):
         db_obj = self._find_query(context, ROOT_TREE, lock_update=True,
@@ -237,6 +334,24 @@ class TreeManager(object):
         return rn,
 
 
+def _freeze(value):
+    # Hashable version of an AIM attribute value, keeping the types apart
+    # (True and 1 don't convert the same way).
+    if isinstance(value, dict):
+        return dict, tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(v) for v in value)
+    return type(value), value
+
+
+def get_conversion_cache_stats():
+    return _conversion_cache.get_stats()
+
+
+def clear_conversion_cache():
+    _conversion_cache.clear()
+
+
 class AimHashTreeMaker(object):
     """Hash Tree Maker
 
@@ -285,7 +400,7 @@ class AimHashTreeMaker(object):
     @staticmethod
     def _extract_root_rn(root_key):
         root_split = root_key[0].split('|')
-        return apic_client.DNManager().build([root_split]).split('/')[-1]
+        return utils.build_dn([root_split]).split('/')[-1]
 
     @staticmethod
     def _extract_root_from_dn(dn):
@@ -309,6 +424,37 @@ class AimHashTreeMaker(object):
         self._clean_related(tree, node)
         return self.aim_res_to_nodes(aim_res)
 
+    @staticmethod
+    def _convert(aim_res):
+        result = []
+        to_aci = converter.AimToAciModelConverter()
+        for obj in to_aci.convert([aim_res]):
+            for mo, v in list(obj.items()):
+                attr = v.get('attributes', {})
+                result.append((mo, attr.pop('dn', None), attr))
+        return result
+
+    @staticmethod
+    def _to_aci_objects(aim_res):
+        """(ACI type, DN, attributes) of the ACI objects of an AIM resource
+
+        Results are cached by the full content of the resource, callers get
+        their own copy of the attributes.
+        """
+        try:
+            key = (type(aim_res), converter.conversion_context(),
+                   _freeze(aim_res.__dict__))
+            hash(key)
+        except TypeError:
+            # Unhashable content
+            key = None
+        if key is None:
+            converted = AimHashTreeMaker._convert(aim_res)
+        else:
+            converted = _conversion_cache.get(
+                key, AimHashTreeMaker._convert, aim_res)
+        return [(mo, dn, dict(attr)) for mo, dn, attr in converted]
+
     @staticmethod
     def aim_res_to_nodes(aim_res):
         result = {}
@@ -317,21 +463,17 @@ class AimHashTreeMaker(object):
         is_monitored = (getattr(aim_res, 'monitored', False) or
                         getattr(aim_res, 'pre_existing', False))
         pending = getattr(aim_res, '_pending', None)
-        to_aci = converter.AimToAciModelConverter()
-        for obj in to_aci.convert([aim_res]):
-            for mo, v in list(obj.items()):
-                attr = v.get('attributes', {})
-                dn = attr.pop('dn', None)
-                key = AimHashTreeMaker._build_hash_tree_key_from_dn(dn, mo)
-                if key:
-                    attr['_metadata'] = {'monitored': is_monitored,
-                                         'attributes': copy.copy(attr)}
-                    if dn != aim_res_dn:
-                        attr['_metadata']['related'] = True
-                    if pending is not None:
-                        attr['_metadata']['pending'] = pending
-                    attr['_error'] = is_error
-                    result[key] = attr
+        for mo, dn, attr in AimHashTreeMaker._to_aci_objects(aim_res):
+            key = AimHashTreeMaker._build_hash_tree_key_from_dn(dn, mo)
+            if key:
+                attr['_metadata'] = {'monitored': is_monitored,
+                                     'attributes': copy.copy(attr)}
+                if dn != aim_res_dn:
+                    attr['_metadata']['related'] = True
+                if pending is not None:
+                    attr['_metadata']['pending'] = pending
+                attr['_error'] = is_error
+                result[key] = attr
         return result
 
     def update(self, tree, updates):
@@ -408,7 +550,7 @@ class AimHashTreeMaker(object):
         """
         splits = key.split('-', 1)
         mo = apic_client.ManagedObjectClass.prefix_to_mos[splits[0]]
-        dn = apic_client.DNManager().build([[mo, splits[-1]]])
+        dn = utils.build_dn([[mo, splits[-1]]])
         return AimHashTreeMaker._build_hash_tree_key_from_dn(dn, mo)
 
 
@@ -438,7 +580,7 @@ class HashTreeBuilder(object):
         eg: {'config': {'tn1': <root hashtree>}}
         :return: tree updates
         """
-        LOG.debug('Builder called with %s %s %s' % (added, updated, deleted))
+        LOG.debug('Builder called with %s %s %s', added, updated, deleted)
         # Segregate updates by root
         updates_by_root = {}
         all_updates = [added, updated, deleted]
@@ -482,12 +624,12 @@ class HashTreeBuilder(object):
                         # status object
                         try:
                             LOG.info("Deleting parentless status object "
-                                     "%s" % res)
+                                     "%s", res)
                             self.aim_manager.delete(aim_ctx, res)
                         except Exception as e:
                             LOG.warning("An exception has occurred while "
                                         "trying to delete status object "
-                                        "%s: %s" % (res, str(e)))
+                                        "%s: %s", res, str(e))
                         continue
                 key = self.tt_maker.get_root_key(res)
                 if not key: